@@ -0,0 +1,58 @@
+from flask import Flask, render_template
+
+def create_app():
+    # Imported here so that importing app.core modules (training, bulk scoring) does not load the web stack
+    from app.api.routes import api_blueprint, lead_scorer, micro_batcher, model_reloader, transcription_queue
+    from app.utils.logging import configure_logging
+    from app.utils.instrumentation import request_instrumentation
+    from app.utils.auth import jwt
+    from app.core.model_training import start_background_training
+    from app.utils.voice import voice_service, start_voice_prewarm
+
+    app = Flask(__name__)
+    app.config.from_object('config.Config')
+    
+    # Initialize extensions
+    configure_logging(app)
+    request_instrumentation.init_app(app)
+    jwt.init_app(app)
+    micro_batcher.init_app(app)
+    voice_service.init_app(app)
+    transcription_queue.init_app(app)
+    if app.config['VOICE_PREWARM_ON_BOOT']:
+        start_voice_prewarm()
+    
+    # Load the latest trained bundle; training only runs on request
+    try:
+        lead_scorer.init_app(app)
+    except ValueError:
+        if app.config['MODEL_TRAIN_IF_MISSING']:
+            app.logger.warning("No model bundle found, training one in the background")
+            start_background_training(app.config['MODEL_TRAINING_DATA'], lead_scorer.registry,
+                                      on_complete=lead_scorer.load_model)
+        else:
+            app.logger.error("No model bundle found. Run `python -m app.core.model_training` to train one.")
+    model_reloader.init_app(app)
+
+    # Register blueprints
+    app.register_blueprint(api_blueprint, url_prefix='/api')
+    
+    # Web routes
+    @app.route('/')
+    def dashboard():
+        return render_template('dashboard.html')
+        
+    @app.route('/feedback')
+    def feedback():
+        return render_template('feedback.html')
+    
+    # Error handlers
+    @app.errorhandler(404)
+    def not_found(error):
+        return render_template('404.html'), 404
+        
+    @app.errorhandler(500)
+    def server_error(error):
+        return render_template('500.html'), 500
+    
+    return app
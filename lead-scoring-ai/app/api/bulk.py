@@ -0,0 +1,325 @@
+import io
+import json
+import zipfile
+from typing import Any, Dict, Iterator, List, Tuple
+import numpy as np
+import pandas as pd
+
+JSON = 'application/json'
+CSV = 'text/csv'
+ARROW = 'application/vnd.apache.arrow.stream'
+NPY = 'application/x-npy'
+NPZ = 'application/x-npz'
+NPY_TYPES = (NPY, NPZ, 'application/octet-stream')
+
+RESULT_COLUMNS = ['prediction_id', 'score', 'prediction', 'needs_human_review', 'confidence', 'error']
+NPY_RESULT_DTYPE = np.dtype([('prediction_id', 'S24'), ('score', '<f8'), ('prediction', '?'),
+                             ('needs_human_review', '?'), ('confidence', '<f8')])
+
+class UnsupportedFormatError(ValueError):
+    """Raised when a bulk payload's format cannot be read"""
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        raise UnsupportedFormatError("Arrow payloads need the pyarrow package installed on the server")
+    return pyarrow
+
+def _chunks(frame: pd.DataFrame, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+def read_columns(columns: Dict[str, List[Any]], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Column-oriented JSON: ``{"company_size": [...], "industry": [...], ...}``"""
+    if not isinstance(columns, dict) or not columns:
+        raise UnsupportedFormatError("'columns' must map column names to equal-length lists")
+    try:
+        frame = pd.DataFrame(columns)
+    except ValueError as e:
+        raise UnsupportedFormatError(f"Invalid columns: {str(e)}")
+    return _chunks(frame, chunk_rows)
+
+def read_csv(stream, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """CSV with a header row, parsed incrementally from the request stream"""
+    return iter(pd.read_csv(stream, chunksize=chunk_rows))
+
+def read_arrow(stream) -> Iterator[pd.DataFrame]:
+    """Arrow IPC stream, one frame per record batch"""
+    pa = _pyarrow()
+    try:
+        reader = pa.ipc.open_stream(stream)
+    except pa.ArrowInvalid as e:
+        raise UnsupportedFormatError(f"Invalid Arrow stream: {str(e)}")
+    return (batch.to_pandas() for batch in reader)
+
+def read_npy(payload: bytes, chunk_rows: int) -> Tuple[int, Iterator[pd.DataFrame]]:
+    """A structured ``.npy`` array or an ``.npz`` of equal-length column arrays, plus its row count"""
+    try:
+        loaded = np.load(io.BytesIO(payload), allow_pickle=False)
+        if isinstance(loaded, np.ndarray):
+            if loaded.dtype.names is None:
+                raise UnsupportedFormatError("NPY payloads must be structured arrays with one field per column")
+            columns = {name: loaded[name] for name in loaded.dtype.names}
+        else:
+            columns = {name: loaded[name] for name in loaded.files}
+    except (ValueError, OSError, EOFError) as e:
+        raise UnsupportedFormatError(f"Invalid NPY payload: {str(e)}")
+    # Byte-string columns hold text, e.g. industries written with dtype 'S'
+    columns = {name: np.char.decode(values, 'utf-8') if values.dtype.kind == 'S' else values
+               for name, values in columns.items()}
+    try:
+        frame = pd.DataFrame(columns)
+    except ValueError as e:
+        raise UnsupportedFormatError(f"Invalid NPY columns: {str(e)}")
+    return len(frame), _chunks(frame, chunk_rows)
+
+def result_frame(results: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Prediction dicts as compact result columns; error rows have a null score"""
+    frame = pd.DataFrame.from_records(results, columns=RESULT_COLUMNS)
+    for column in ('prediction', 'needs_human_review'):
+        frame[column] = frame[column].fillna(column == 'needs_human_review').astype(bool)
+    frame['score'] = frame['score'].astype(float)
+    frame['confidence'] = frame['confidence'].astype(float)
+    return frame
+
+def _json_default(value):
+    return value.item() if hasattr(value, 'item') else str(value)
+
+class RowJsonWriter:
+    """``{"model_version": ..., "results": [{...}, ...]}``, written a chunk at a time"""
+
+    content_type = JSON
+
+    def __init__(self, model_version: str):
+        self.model_version = model_version
+        self._first = True
+
+    def start(self) -> bytes:
+        return f'{{"model_version": {json.dumps(self.model_version)}, "results": ['.encode()
+
+    def write(self, results: List[Dict[str, Any]]) -> bytes:
+        body = ','.join(json.dumps(result, default=_json_default) for result in results)
+        if body and not self._first:
+            body = ',' + body
+        self._first = self._first and not body
+        return body.encode()
+
+    def finish(self) -> bytes:
+        return b']}'
+
+    def fail(self, message: str) -> bytes:
+        """Close the document early with an ``error`` key after the results sent so far"""
+        return f'], "error": {json.dumps(message)}}}'.encode()
+
+class ColumnarJsonWriter(RowJsonWriter):
+    """``{"model_version": ..., "chunks": [{"offset": 0, "score": [...], ...}, ...]}``
+
+    Each chunk holds one list per result column, so key names are sent once
+    per chunk rather than once per lead. Concatenate the chunks in order.
+    """
+
+    def __init__(self, model_version: str):
+        super().__init__(model_version)
+        self._offset = 0
+
+    def start(self) -> bytes:
+        return f'{{"model_version": {json.dumps(self.model_version)}, "chunks": ['.encode()
+
+    def write(self, results: List[Dict[str, Any]]) -> bytes:
+        frame = result_frame(results).astype(object)
+        chunk = {'offset': self._offset}
+        chunk.update({column: frame[column].where(frame[column].notna(), None).tolist()
+                      for column in RESULT_COLUMNS})
+        self._offset += len(results)
+        body = json.dumps(chunk, default=_json_default)
+        if not self._first:
+            body = ',' + body
+        self._first = False
+        return body.encode()
+
+def _failure_row(message: str) -> List[Dict[str, Any]]:
+    return [{'error': message, 'needs_human_review': True}]
+
+class CsvWriter:
+    """Result columns as CSV, one header row.
+
+    If the input turns out to be malformed after the first chunk, the
+    response ends with one extra row that has no prediction ID and
+    describes the failure in ``error``.
+    """
+
+    content_type = CSV
+
+    def __init__(self, model_version: str):
+        self.model_version = model_version
+        self._header = True
+
+    def start(self) -> bytes:
+        return b''
+
+    def write(self, results: List[Dict[str, Any]]) -> bytes:
+        body = result_frame(results).to_csv(index=False, header=self._header)
+        self._header = False
+        return body.encode()
+
+    def finish(self) -> bytes:
+        return b''
+
+    def fail(self, message: str) -> bytes:
+        return self.write(_failure_row(message))
+
+class _StreamSink(io.RawIOBase):
+    """Unseekable write target that hands back what was written since the last drain"""
+
+    def __init__(self):
+        super().__init__()
+        self._parts: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts.clear()
+        return data
+
+class NpzWriter:
+    """An ``.npz`` archive streamed a chunk at a time.
+
+    ``results.npy`` is a structured array with one row per lead; its header
+    is written up front from the known row count. ``errors.npy`` follows at
+    the end with the ``row`` and full ``error`` message of every failed
+    lead, sized to the longest message. Load both with ``np.load``.
+
+    If scoring stops part-way, the rows left are written with no prediction
+    ID and ``needs_human_review`` set, and ``errors.npy`` gets one entry at
+    the first of them describing the failure, so the archive still loads.
+    """
+
+    content_type = NPZ
+
+    def __init__(self, model_version: str, num_rows: int):
+        self.model_version = model_version
+        self.num_rows = num_rows
+        self._sink = _StreamSink()
+        self._zip = None
+        self._results = None
+        self._offset = 0
+        self._errors: List[Tuple[int, str]] = []
+
+    def start(self) -> bytes:
+        self._zip = zipfile.ZipFile(self._sink, 'w')
+        self._results = self._zip.open('results.npy', 'w', force_zip64=True)
+        np.lib.format.write_array_header_1_0(self._results, {
+            'descr': np.lib.format.dtype_to_descr(NPY_RESULT_DTYPE), 'fortran_order': False,
+            'shape': (self.num_rows,)})
+        return self._sink.drain()
+
+    def write(self, results: List[Dict[str, Any]]) -> bytes:
+        frame = result_frame(results)
+        array = np.empty(len(frame), dtype=NPY_RESULT_DTYPE)
+        array['prediction_id'] = frame['prediction_id'].fillna('').str.encode('utf-8').to_numpy()
+        for column in ('score', 'prediction', 'needs_human_review', 'confidence'):
+            array[column] = frame[column].to_numpy()
+        errors = frame['error'].dropna()
+        self._errors.extend(zip((errors.index + self._offset).tolist(), errors.tolist()))
+        self._offset += len(frame)
+        self._results.write(array.tobytes())
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        self._results.close()
+        width = max((len(message) for _, message in self._errors), default=1)
+        errors = np.array(self._errors, dtype=[('row', '<i8'), ('error', f'<U{width}')])
+        with self._zip.open('errors.npy', 'w', force_zip64=True) as f:
+            np.lib.format.write_array(f, errors, allow_pickle=False)
+        self._zip.close()
+        return self._sink.drain()
+
+    def fail(self, message: str) -> bytes:
+        remaining = self.num_rows - self._offset
+        if remaining > 0:
+            self._errors.append((self._offset, f"{message} (rows {self._offset} to {self.num_rows - 1} not scored)"))
+        block = np.zeros(min(remaining, 65536), dtype=NPY_RESULT_DTYPE)
+        block['score'] = block['confidence'] = np.nan
+        block['needs_human_review'] = True
+        while remaining > 0:
+            self._results.write(block[:remaining].tobytes())
+            remaining -= len(block)
+        self._offset = self.num_rows
+        return self.finish()
+
+class ArrowWriter:
+    """Arrow IPC stream, one record batch per chunk"""
+
+    content_type = ARROW
+
+    def __init__(self, model_version: str):
+        pa = _pyarrow()
+        self.model_version = model_version
+        self._pa = pa
+        self._schema = pa.schema([('prediction_id', pa.string()), ('score', pa.float64()),
+                                  ('prediction', pa.bool_()), ('needs_human_review', pa.bool_()),
+                                  ('confidence', pa.float64()), ('error', pa.string())],
+                                 metadata={'model_version': model_version})
+        self._sink = io.BytesIO()
+        self._writer = None
+
+    def _drain(self) -> bytes:
+        data = self._sink.getvalue()
+        self._sink.seek(0)
+        self._sink.truncate()
+        return data
+
+    def start(self) -> bytes:
+        self._writer = self._pa.ipc.new_stream(self._sink, self._schema)
+        return self._drain()
+
+    def write(self, results: List[Dict[str, Any]]) -> bytes:
+        table = self._pa.Table.from_pandas(result_frame(results), schema=self._schema, preserve_index=False)
+        for batch in table.to_batches():
+            self._writer.write_batch(batch)
+        return self._drain()
+
+    def finish(self) -> bytes:
+        self._writer.close()
+        return self._drain()
+
+    def fail(self, message: str) -> bytes:
+        """End the stream with a batch holding one row with no prediction ID and the failure as its error"""
+        return self.write(_failure_row(message)) + self.finish()
+
+def open_request(request, chunk_rows: int, model_version: str) -> Tuple[Iterator[pd.DataFrame], Any, Dict[str, Any]]:
+    """Pick the reader and matching writer for a /batch_predict request.
+
+    Returns the input chunks, the writer and the JSON options
+    (``include_voice``, ``include_explanation``, ``explanation_budget_ms``),
+    which only apply to row-oriented JSON.
+    """
+    mimetype = request.mimetype
+    if mimetype == CSV:
+        return read_csv(request.stream, chunk_rows), CsvWriter(model_version), {}
+    if mimetype == ARROW:
+        return read_arrow(request.stream), ArrowWriter(model_version), {}
+    if mimetype in NPY_TYPES:
+        num_rows, chunks = read_npy(request.get_data(), chunk_rows)
+        return chunks, NpzWriter(model_version, num_rows), {}
+
+    data = request.get_json()
+    if not isinstance(data, dict):
+        raise UnsupportedFormatError("Expected a JSON object with 'leads' or 'columns'")
+    if 'columns' in data:
+        return read_columns(data['columns'], chunk_rows), ColumnarJsonWriter(model_version), {}
+    frame = pd.DataFrame(data['leads'])
+    options = {
+        'include_voice': bool(data.get('include_voice', False)),
+        'include_explanation': bool(data.get('include_explanation', False)),
+        'explanation_budget_ms': data.get('explanation_budget_ms')
+    }
+    return _chunks(frame, chunk_rows), RowJsonWriter(model_version), options
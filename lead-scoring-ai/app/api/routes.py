@@ -1,15 +1,32 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, Response, request, jsonify, send_file, current_app, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.core.prediction import LeadScorer
-from app.utils.voice import generate_voice_response, process_voice_feedback
+from app.core.batching import MicroBatcher
+from app.core.reloader import ModelReloader
+from app.core.storage import StoreOverloadedError
+from app.core.transcription import TranscriptionQueue, InvalidAudioError
+from app.api.bulk import open_request as open_bulk_request
+from app.api.schemas import validate_lead_columns
+from app.utils.voice import voice_service, start_voice_response
 from app.utils.logging import log_request
-from app.utils.auth import validate_feedback_token
+from app.utils.auth import accepts_feedback_token, admin_required, create_feedback_token, feedback_token_prediction_id
+import itertools
+import numpy as np
 import pandas as pd
-import tempfile
-import os
+import re
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
 api_blueprint = Blueprint('api', __name__)
 lead_scorer = LeadScorer()
+micro_batcher = MicroBatcher(lead_scorer)
+model_reloader = ModelReloader(lead_scorer)
+transcription_queue = TranscriptionQueue(voice_service, lead_scorer)
+
+def _attach_voice_response(prediction):
+    """Start synthesis without waiting; clients fetch the audio from voice_response_url"""
+    key, future = start_voice_response(prediction)
+    prediction['voice_response'] = future.result() if future.done() else None
+    prediction['voice_response_url'] = f"/api/voice/responses/{key}"
 
 @api_blueprint.route('/predict', methods=['POST'])
 @jwt_required()
@@ -18,33 +35,113 @@ def predict():
     try:
         data = request.get_json()
         
-        # Make prediction
-        prediction = lead_scorer.predict_lead(data)
+        # Make prediction; explained requests bypass the micro-batcher
+        if request.args.get('explain', '').lower() == 'true':
+            budget_ms = request.args.get('explanation_budget_ms', type=float)
+            prediction = lead_scorer.predict_lead(data, explain=True, budget_ms=budget_ms)
+        else:
+            prediction = micro_batcher.predict_lead(data)
         
         # Generate voice response if requested
-        if request.args.get('voice', '').lower() == 'true':
-            voice_response = generate_voice_response(prediction)
-            prediction['voice_response'] = voice_response
+        if request.args.get('voice', '').lower() == 'true' and 'error' not in prediction:
+            _attach_voice_response(prediction)
         
         return jsonify(prediction), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@api_blueprint.route('/predict/batching', methods=['GET'])
+@jwt_required()
+def batching_stats():
+    return jsonify(micro_batcher.stats()), 200
+
+@api_blueprint.route('/predict/cache', methods=['GET'])
+@jwt_required()
+def cache_stats():
+    return jsonify(lead_scorer.cache.stats()), 200
+
+@api_blueprint.route('/predict/drift', methods=['GET'])
+@jwt_required()
+def drift_report():
+    return jsonify(lead_scorer.drift_report()), 200
+
+@api_blueprint.route('/predict/shadow', methods=['GET'])
+@jwt_required()
+def shadow_report():
+    limit = min(request.args.get('limit', 5000, type=int), 20000)
+    return jsonify(lead_scorer.shadow_report(limit)), 200
+
+@api_blueprint.route('/dashboard/stats', methods=['GET'])
+@jwt_required()
+def dashboard_stats():
+    try:
+        stats = lead_scorer.dashboard_stats(request.args.get('resolution', 'hour'),
+                                            request.args.get('periods', type=int))
+        return jsonify(stats), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@api_blueprint.route('/predictions/recent', methods=['GET'])
+@jwt_required()
+def recent_predictions():
+    try:
+        limit = min(request.args.get('limit', 50, type=int), 500)
+        cursor = request.args.get('cursor')
+        before = None
+        if cursor:
+            created_at, prediction_id = cursor.split(':', 1)
+            before = (float(created_at), prediction_id)
+        review = request.args.get('needs_human_review')
+        needs_human_review = None if review is None else review.lower() == 'true'
+
+        predictions, next_cursor = lead_scorer.prediction_log.recent(limit, before, needs_human_review)
+        feedback = lead_scorer.feedback_store.latest_for_predictions([p['prediction_id'] for p in predictions])
+        for prediction in predictions:
+            prediction['id'] = prediction['prediction_id']
+            latest = feedback.get(prediction['prediction_id'], {})
+            prediction['actual_outcome'] = latest.get('actual_outcome')
+            prediction['feedback_notes'] = latest.get('feedback_notes')
+
+        return jsonify({
+            'predictions': predictions,
+            'next_cursor': f"{next_cursor[0]!r}:{next_cursor[1]}" if next_cursor else None
+        }), 200
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@api_blueprint.route('/predictions/<prediction_id>', methods=['GET'])
+@jwt_required()
+def get_prediction(prediction_id):
+    prediction = lead_scorer.prediction_log.get(prediction_id)
+    if prediction is None:
+        return jsonify({'error': 'Prediction not found'}), 404
+    prediction['feedback'] = lead_scorer.feedback_store.get_by_prediction(prediction_id)
+    return jsonify(prediction), 200
+
 @api_blueprint.route('/feedback', methods=['POST'])
+@accepts_feedback_token
 @jwt_required()
 @log_request
 def feedback():
     try:
         data = request.get_json()
+        scoped_to = feedback_token_prediction_id()
+        if scoped_to is not None and data.get('prediction_id') != scoped_to:
+            return jsonify({'error': 'Token not valid for this prediction'}), 403
         user_id = get_jwt_identity()
         data['user_id'] = user_id
         lead_scorer.process_feedback(data)
         return jsonify({'status': 'feedback received'}), 200
+    except StoreOverloadedError as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 @api_blueprint.route('/feedback/voice', methods=['POST'])
+@accepts_feedback_token
 @jwt_required()
 @log_request
 def voice_feedback():
@@ -53,36 +150,40 @@ def voice_feedback():
         audio_file = request.files.get('audio')
         prediction_id = request.form.get('prediction_id')
         user_id = get_jwt_identity()
-        
+
         if not audio_file or not prediction_id:
             return jsonify({'error': 'Missing required data'}), 400
+        scoped_to = feedback_token_prediction_id()
+        if scoped_to is not None and prediction_id != scoped_to:
+            return jsonify({'error': 'Token not valid for this prediction'}), 403
 
-        # Save temp file
-        temp_path = os.path.join(tempfile.gettempdir(), f"voice_feedback_{user_id}.wav")
-        audio_file.save(temp_path)
-        
-        # Process voice feedback
-        feedback_text = process_voice_feedback(temp_path)
-        
-        # Store feedback
-        feedback_data = {
-            'prediction_id': prediction_id,
-            'feedback_text': feedback_text,
-            'user_id': user_id,
-            'voice_feedback_path': temp_path
-        }
-        lead_scorer.process_feedback(feedback_data)
-        
+        max_bytes = current_app.config.get('VOICE_FEEDBACK_MAX_BYTES', 16 * 1024 * 1024)
+        audio = audio_file.read(max_bytes + 1)
+        if len(audio) > max_bytes:
+            return jsonify({'error': 'Audio file too large'}), 413
+
+        # Validate from the WAV header and transcribe in the background
+        job = transcription_queue.submit(audio, prediction_id, user_id)
         return jsonify({
             'status': 'voice feedback received',
-            'transcription': feedback_text
-        }), 200
-        
+            'job_id': job['job_id'],
+            'status_url': f"/api/feedback/voice/{job['job_id']}"
+        }), 202
+
+    except InvalidAudioError as e:
+        return jsonify({'error': str(e)}), 400
+    except StoreOverloadedError as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 400
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+
+@api_blueprint.route('/feedback/voice/<job_id>', methods=['GET'])
+@jwt_required()
+def voice_feedback_status(job_id):
+    job = transcription_queue.get(job_id)
+    if job is None or job['user_id'] != get_jwt_identity():
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job), 200
 
 @api_blueprint.route('/voice/prediction', methods=['POST'])
 @jwt_required()
@@ -91,10 +192,18 @@ def prediction_voice():
     try:
         data = request.get_json()
         prediction = lead_scorer.predict_lead(data)
-        
-        # Generate voice file
-        voice_file = generate_voice_response(prediction)
-        
+        if 'error' in prediction:
+            return jsonify(prediction), 400
+
+        # Generate voice file, releasing the request thread if synthesis is slow
+        key, future = start_voice_response(prediction)
+        try:
+            voice_file = future.result(timeout=current_app.config.get('VOICE_RESPONSE_WAIT_SECONDS', 2.0))
+        except FutureTimeoutError:
+            return jsonify({'status': 'pending', 'voice_response_url': f"/api/voice/responses/{key}"}), 202
+        if voice_file is None:
+            return jsonify({'error': 'Voice synthesis failed'}), 502
+
         return send_file(
             voice_file,
             mimetype='audio/wav',
@@ -104,32 +213,121 @@ def prediction_voice():
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@api_blueprint.route('/voice/responses/<key>', methods=['GET'])
+@jwt_required()
+def voice_response(key):
+    if not re.fullmatch(r'[0-9a-f]{32}', key):
+        return jsonify({'error': 'Invalid voice response key'}), 400
+    voice_file = voice_service.audio_path(key)
+    if voice_file is not None:
+        return send_file(voice_file, mimetype='audio/wav', as_attachment=True, download_name='prediction.wav')
+    if voice_service.is_pending(key):
+        return jsonify({'status': 'pending'}), 202
+    return jsonify({'error': 'Voice response not found'}), 404
+
+def _score_bulk_chunk(chunk: pd.DataFrame, bundle, options: dict) -> list:
+    """Validate a chunk column-wise, score its valid rows and merge the errors back in order"""
+    leads, errors = validate_lead_columns(chunk)
+    results = [None] * len(leads)
+    for i, error in errors.dropna().items():
+        results[i] = {'error': error, 'needs_human_review': True, 'model_version': bundle.version}
+    valid_rows = np.flatnonzero(errors.isna().to_numpy())
+    if len(valid_rows):
+        scored = lead_scorer.predict_batch(leads.iloc[valid_rows], bundle=bundle,
+                                           include_explanation=options.get('include_explanation', False),
+                                           budget_ms=options.get('explanation_budget_ms'))
+        for i, prediction in zip(valid_rows, scored):
+            results[i] = prediction
+    if options.get('include_voice'):
+        for prediction in results:
+            if 'error' not in prediction:
+                _attach_voice_response(prediction)
+    return results
+
 @api_blueprint.route('/batch_predict', methods=['POST'])
 @jwt_required()
 @log_request
 def batch_predict():
+    """Score leads in bulk.
+
+    Accepts row JSON (``{"leads": [...]}``), column JSON
+    (``{"columns": {...}}``), CSV (``text/csv``), Arrow IPC streams and
+    NPY/NPZ column arrays, and answers in the matching format (an NPZ
+    archive for NPY/NPZ input). Input is validated and scored a chunk at a
+    time and the response is streamed. If a later chunk cannot be read, the
+    response ends with an error marker: an ``error`` key for JSON, and a
+    last row without a prediction ID for CSV and Arrow.
+    """
     try:
-        data = request.get_json()
-        leads = pd.DataFrame(data['leads'])
-        results = []
-        
-        for _, lead in leads.iterrows():
-            prediction = lead_scorer.predict_lead(lead.to_dict())
-            results.append(prediction)
-            
-        return jsonify({'results': results}), 200
-        
+        bundle = lead_scorer.bundle
+        if bundle is None:
+            lead_scorer.load_model()
+            bundle = lead_scorer.bundle
+        chunk_rows = current_app.config.get('BATCH_PREDICT_CHUNK_ROWS', 10000)
+        chunks, writer, options = open_bulk_request(request, chunk_rows, bundle.version)
+        # Read the first chunk now, so malformed input still gets a 400
+        first = next(chunks, None)
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+    def generate():
+        yield writer.start()
+        try:
+            if first is not None:
+                for chunk in itertools.chain([first], chunks):
+                    yield writer.write(_score_bulk_chunk(chunk, bundle, options))
+        except Exception as e:
+            # The 200 status is already sent; mark the body as incomplete instead
+            current_app.logger.error(f"Bulk scoring stopped mid-stream: {str(e)}")
+            yield writer.fail(str(e))
+            return
+        yield writer.finish()
+
+    response = Response(stream_with_context(generate()), mimetype=writer.content_type)
+    response.headers['X-Model-Version'] = bundle.version
+    return response, 200
+
 @api_blueprint.route('/feedback/token', methods=['GET'])
+@jwt_required()
 def generate_feedback_token():
+    """Issue a token that can only submit feedback on one logged prediction"""
     try:
         prediction_id = request.args.get('prediction_id')
         if not prediction_id:
             return jsonify({'error': 'prediction_id required'}), 400
-            
-        token = validate_feedback_token(prediction_id)
+        if lead_scorer.prediction_log.get(prediction_id) is None:
+            return jsonify({'error': 'Prediction not found'}), 404
+
+        token = create_feedback_token(prediction_id)
         return jsonify({'token': token}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 400
+
+@api_blueprint.route('/admin/model', methods=['GET'])
+@admin_required
+def model_info():
+    bundle = lead_scorer.bundle
+    return jsonify({
+        'model_version': bundle.version if bundle else None,
+        'metadata': bundle.metadata if bundle else None,
+        'latest_version': lead_scorer.registry.latest_version(),
+        'versions': lead_scorer.registry.list_versions()
+    }), 200
+
+@api_blueprint.route('/admin/model/reload', methods=['POST'])
+@admin_required
+def reload_model():
+    try:
+        version = (request.get_json(silent=True) or {}).get('version')
+        if version:
+            # Promote the version so every worker's watcher converges on it
+            lead_scorer.registry.set_latest(version)
+
+        target = model_reloader.request_reload(version)
+        return jsonify({
+            'status': 'reloading' if target else 'up to date',
+            'model_version': lead_scorer.model_version,
+            'target_version': target
+        }), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
@@ -1,5 +1,8 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional, List
+from typing import Optional, List, Tuple
+import pandas as pd
+
+VALID_INDUSTRIES = ['logistics', 'manufacturing', 'retail', 'technology', 'finance']
 
 class LeadInput(BaseModel):
     company_name: str
@@ -14,9 +17,8 @@ class LeadInput(BaseModel):
 
     @validator('industry')
     def validate_industry(cls, v):
-        valid_industries = ['logistics', 'manufacturing', 'retail', 'technology', 'finance']
-        if v.lower() not in valid_industries:
-            raise ValueError(f"Industry must be one of: {', '.join(valid_industries)}")
+        if v.lower() not in VALID_INDUSTRIES:
+            raise ValueError(f"Industry must be one of: {', '.join(VALID_INDUSTRIES)}")
         return v.lower()
 
 class LeadPredictionOutput(BaseModel):
@@ -26,6 +28,7 @@ class LeadPredictionOutput(BaseModel):
     confidence: float = Field(..., ge=0, le=1)
     voice_response: Optional[str] = None
     explanation: Optional[dict] = None
+    model_version: Optional[str] = None
 
 class FeedbackInput(BaseModel):
     lead_id: str
@@ -37,4 +40,46 @@ class FeedbackInput(BaseModel):
 class BatchPredictionInput(BaseModel):
     leads: List[LeadInput]
     include_voice: bool = False
-    include_explanation: bool = False
\ No newline at end of file
+    include_explanation: bool = False
+    explanation_budget_ms: Optional[float] = Field(None, gt=0)
+
+def validate_lead_columns(leads: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+    """Apply the LeadInput rules to whole columns instead of one lead at a time.
+
+    Returns a copy with the numeric columns coerced, industry lower-cased and
+    past_interactions defaulted to 0, plus a Series holding each row's first
+    error (None when the row is valid).
+    """
+    leads = leads.reset_index(drop=True).copy()
+    errors = pd.Series([None] * len(leads), index=leads.index, dtype=object)
+
+    def fail(mask, message):
+        errors[mask & errors.isna()] = message
+
+    def column(name):
+        return leads[name] if name in leads.columns else pd.Series([None] * len(leads), index=leads.index)
+
+    def numeric(name, allow_zero=False):
+        raw = column(name)
+        values = pd.to_numeric(raw, errors='coerce')
+        fail(raw.isna(), f"{name}: field required")
+        fail(values.isna() & raw.notna(), f"{name}: value is not a valid number")
+        if allow_zero:
+            fail(values < 0, f"{name}: ensure this value is greater than or equal to 0")
+        else:
+            fail(values <= 0, f"{name}: ensure this value is greater than 0")
+        leads[name] = values.astype(float)
+
+    # Same order as the LeadInput fields, so each row reports the same first error
+    fail(column('company_name').isna(), "company_name: field required")
+    for name in ('company_size', 'annual_revenue', 'num_employees'):
+        numeric(name)
+    industry = column('industry')
+    fail(industry.isna(), "industry: field required")
+    leads['industry'] = industry.where(industry.isna(), industry.astype(str).str.lower())
+    fail(leads['industry'].notna() & ~leads['industry'].isin(VALID_INDUSTRIES),
+         f"industry: Industry must be one of: {', '.join(VALID_INDUSTRIES)}")
+    fail(column('lead_source').isna(), "lead_source: field required")
+    leads['past_interactions'] = column('past_interactions').fillna(0)
+    numeric('past_interactions', allow_zero=True)
+    return leads, errors
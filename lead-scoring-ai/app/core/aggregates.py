@@ -0,0 +1,340 @@
+import atexit
+import collections
+import json
+import logging
+import math
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, List, Optional
+from .process_snapshots import SnapshotFiles, process_alive
+
+# Layout of every counter list; the score histogram takes the last SCORE_BINS slots
+PREDICTIONS, REVIEWS, SCORE_SUM, FEEDBACK, OUTCOMES, CONVERSIONS, LABELLED_SCORE_SUM, HISTOGRAM = range(8)
+SCORE_BINS = 10
+N_COUNTERS = HISTOGRAM + SCORE_BINS
+
+# Bucket width and how many buckets are kept
+RESOLUTIONS = {'minute': (60, 120), 'hour': (3600, 48), 'day': (86400, 90)}
+
+def _summary(counters: Optional[List[float]]) -> Dict[str, Any]:
+    counters = counters or [0] * N_COUNTERS
+    predictions, outcomes = counters[PREDICTIONS], counters[OUTCOMES]
+    return {
+        'predictions': int(predictions),
+        'mean_score': counters[SCORE_SUM] / predictions if predictions else None,
+        'review_rate': counters[REVIEWS] / predictions if predictions else None,
+        'feedback': int(counters[FEEDBACK]),
+        'labelled': int(outcomes),
+        'conversion_rate': counters[CONVERSIONS] / outcomes if outcomes else None,
+        'mean_labelled_score': counters[LABELLED_SCORE_SUM] / outcomes if outcomes else None,
+        'score_histogram': [int(count) for count in counters[HISTOGRAM:]]
+    }
+
+class DashboardAggregates:
+    """Prediction and feedback counters per time bucket and segment, kept up to date as they arrive.
+
+    Every minute, hour and day bucket (see ``RESOLUTIONS``) holds one list
+    of counters and running sums per segment: all leads, and each
+    ``industry`` and ``lead_source`` value, at most ``MAX_SEGMENT_VALUES``
+    per dimension before the rest are folded into ``(other)``. Old buckets
+    are dropped as new ones open, so a stats query reads a bounded number
+    of buckets however long the service has run. Feedback is counted in
+    the bucket it arrives in, under the segment of the prediction it rates.
+
+    Request threads only append what they scored to a deque; an aggregator
+    thread picks it up every ``APPLY_INTERVAL`` seconds, turns it into
+    per-segment sums and applies them under one lock, so the request path
+    pays for an append. At most ``max_queue`` records wait; the rest are
+    dropped and counted in ``dropped``.
+
+    With ``snapshot_dir`` set, each process writes its buckets to
+    ``aggregates-<pid>.json`` every ``snapshot_interval`` seconds and on
+    exit, and queries add up every snapshot there. A process starting up
+    claims the snapshots of processes that are gone (renaming them, so only
+    one claimer wins) and merges them into its own, which carries the
+    history across restarts without counting it twice.
+    """
+
+    DIMENSIONS = ('industry', 'lead_source')
+    MAX_SEGMENT_VALUES = 50
+    APPLY_INTERVAL = 0.05
+
+    def __init__(self, snapshot_dir: Optional[str] = None, snapshot_interval: float = 30.0,
+                 max_queue: int = 10000):
+        self.max_queue = max_queue
+        self.logger = logging.getLogger(__name__)
+        self.dropped = 0
+        self._pending: collections.deque = collections.deque()
+        self._applying = False
+        self._buckets: Dict[str, Dict[int, Dict[str, List[float]]]] = {name: {} for name in RESOLUTIONS}
+        self._lock = threading.Lock()
+        self._files = SnapshotFiles(snapshot_dir, 'aggregates', self.flush, snapshot_interval) if snapshot_dir else None
+        self._pid = None
+        atexit.register(self._flush_at_exit)
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self) -> None:
+        # The parent's aggregator may have held the lock when it forked
+        self._lock = threading.Lock()
+
+    def _ensure_process(self) -> None:
+        """On first use in a process, start from a clean slate and adopt orphaned snapshots"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._buckets = {name: {} for name in RESOLUTIONS}  # Forked: the parent's counts are not ours
+            self._pending = collections.deque()
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='aggregates', daemon=True).start()
+        if self._files is None:
+            return
+        try:
+            self._adopt_orphans()
+        except Exception as e:
+            self.logger.warning(f"Failed to restore dashboard aggregates: {str(e)}")
+        self._files.ensure_flusher()
+
+    def _adopt_orphans(self) -> None:
+        claimed = []
+        for pid, path in self._files.paths():
+            # A file with our own pid was left by an earlier process that had the same pid
+            if pid != os.getpid() and process_alive(pid):
+                continue
+            claim = path.with_name(f".{path.name}.claimed-{os.getpid()}")
+            try:
+                os.rename(path, claim)
+            except FileNotFoundError:  # Another process claimed it first
+                continue
+            with open(claim) as f:
+                buckets = json.load(f)['buckets']
+            with self._lock:
+                self._merge_into(self._buckets, buckets)
+            claimed.append(claim)
+        if claimed:
+            self.flush()
+            for claim in claimed:
+                claim.unlink(missing_ok=True)
+            self.logger.info(f"Restored dashboard aggregates from {len(claimed)} snapshot(s)")
+
+    @staticmethod
+    def _merge_into(target: Dict[str, Dict[int, Dict[str, List[float]]]], buckets: Dict[str, Any]) -> None:
+        for name, (width, retention) in RESOLUTIONS.items():
+            oldest = int(time.time() // width) - retention + 1
+            for index, segments in buckets.get(name, {}).items():
+                index = int(index)
+                if index < oldest:
+                    continue
+                bucket = target[name].setdefault(index, {})
+                for key, counters in segments.items():
+                    current = bucket.get(key)
+                    bucket[key] = list(counters) if current is None else [a + b for a, b in zip(current, counters)]
+
+    def _capped_key(self, bucket: Dict[str, List[float]], key: str) -> str:
+        """A new segment's key, or its dimension's ``(other)`` once the bucket holds enough values"""
+        if key == 'all':
+            return key
+        prefix = key.split('=', 1)[0] + '='
+        if sum(1 for existing in bucket if existing.startswith(prefix)) >= self.MAX_SEGMENT_VALUES:
+            return f"{prefix}(other)"
+        return key
+
+    def _add(self, timestamp: float, deltas: Dict[str, Dict[int, float]]) -> None:
+        """Apply sparse counter deltas, keyed by ``all`` or ``<dimension>=<value>``, to every resolution"""
+        with self._lock:
+            for name, (width, retention) in RESOLUTIONS.items():
+                index = int(timestamp // width)
+                buckets = self._buckets[name]
+                bucket = buckets.get(index)
+                if bucket is None:
+                    bucket = buckets[index] = {}
+                    for old in [old for old in buckets if old <= index - retention]:
+                        del buckets[old]
+                for key, delta in deltas.items():
+                    counters = bucket.get(key)
+                    if counters is None:
+                        counters = bucket.setdefault(self._capped_key(bucket, key), [0] * N_COUNTERS)
+                    for i, value in delta.items():
+                        counters[i] += value
+
+    def _segment_keys(self, record: Dict[str, Any]) -> List[str]:
+        keys = ['all']
+        for dimension in self.DIMENSIONS:
+            value = record.get(dimension)
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                value = '(missing)'
+            keys.append(f"{dimension}={value}")
+        return keys
+
+    def _submit(self, count, *args) -> None:
+        self._ensure_process()
+        if len(self._pending) >= self.max_queue:
+            self.dropped += 1
+            return
+        self._pending.append((time.time(), count, args))
+
+    def _run(self) -> None:
+        pending = self._pending
+        while True:
+            if not pending:
+                time.sleep(self.APPLY_INTERVAL)
+                continue
+            self._applying = True
+            try:
+                while pending:
+                    timestamp, count, args = pending.popleft()
+                    try:
+                        self._add(timestamp, count(*args))
+                    except Exception as e:
+                        self.logger.error(f"Failed to update dashboard aggregates: {str(e)}")
+            finally:
+                self._applying = False
+
+    def wait(self, timeout: float = 10.0) -> bool:
+        """Wait until every queued record has been counted"""
+        deadline = time.monotonic() + timeout
+        while self._pending or self._applying:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def record_predictions(self, leads, results: List[Dict[str, Any]]) -> None:
+        """Queue the scored leads of a list of lead dicts or a DataFrame for counting"""
+        self._submit(self._prediction_deltas, leads, results)
+
+    def _prediction_deltas(self, leads, results: List[Dict[str, Any]]) -> Dict[str, Dict[int, float]]:
+        rows = [i for i, result in enumerate(results) if 'score' in result]
+        if not rows:
+            return {}
+        if isinstance(leads, pd.DataFrame):
+            return self._frame_deltas(leads.iloc[rows], [results[i] for i in rows])
+        deltas: Dict[str, Dict[int, float]] = {}
+        for i in rows:
+            score = results[i]['score']
+            update = ((PREDICTIONS, 1), (REVIEWS, int(results[i]['needs_human_review'])), (SCORE_SUM, score),
+                      (HISTOGRAM + min(int(score * SCORE_BINS), SCORE_BINS - 1), 1))
+            for key in self._segment_keys(leads[i]):
+                delta = deltas.get(key)
+                if delta is None:
+                    deltas[key] = dict(update)
+                else:
+                    for index, value in update:
+                        delta[index] = delta.get(index, 0) + value
+        return deltas
+
+    def _frame_deltas(self, frame: pd.DataFrame, results: List[Dict[str, Any]]) -> Dict[str, Dict[int, float]]:
+        """Sum a scored frame per segment with one factorize and a few bincounts per dimension"""
+        scores = np.array([result['score'] for result in results], dtype=np.float64)
+        reviews = np.array([result['needs_human_review'] for result in results], dtype=np.float64)
+        bins = np.minimum((scores * SCORE_BINS).astype(np.intp), SCORE_BINS - 1)
+        groupings = [(np.zeros(len(scores), dtype=np.intp), ['all'])]
+        for dimension in self.DIMENSIONS:
+            if dimension not in frame.columns:
+                groupings.append((np.zeros(len(scores), dtype=np.intp), [f"{dimension}=(missing)"]))
+                continue
+            codes, values = pd.factorize(frame[dimension])
+            keys = [f"{dimension}={value}" for value in values] + [f"{dimension}=(missing)"]
+            groupings.append((np.where(codes < 0, len(values), codes), keys))
+
+        deltas: Dict[str, Dict[int, float]] = {}
+        for codes, keys in groupings:
+            sizes = np.bincount(codes, minlength=len(keys))
+            review_sums = np.bincount(codes, weights=reviews, minlength=len(keys))
+            score_sums = np.bincount(codes, weights=scores, minlength=len(keys))
+            histograms = np.bincount(codes * SCORE_BINS + bins, minlength=len(keys) * SCORE_BINS)
+            for code in np.flatnonzero(sizes).tolist():
+                delta = {PREDICTIONS: int(sizes[code]), REVIEWS: int(review_sums[code]),
+                         SCORE_SUM: float(score_sums[code])}
+                histogram = histograms[code * SCORE_BINS:(code + 1) * SCORE_BINS]
+                for i in np.flatnonzero(histogram).tolist():
+                    delta[HISTOGRAM + i] = int(histogram[i])
+                deltas[keys[code]] = delta
+        return deltas
+
+    def record_feedback(self, feedback: Dict[str, Any], features: Optional[Dict[str, Any]] = None,
+                        score: Optional[float] = None) -> None:
+        """Queue one feedback record for counting under the segment of the prediction it is about"""
+        self._submit(self._feedback_deltas, feedback, features, score)
+
+    def _feedback_deltas(self, feedback: Dict[str, Any], features: Optional[Dict[str, Any]],
+                         score: Optional[float]) -> Dict[str, Dict[int, float]]:
+        outcome = feedback.get('actual_outcome')
+        if isinstance(outcome, str):
+            outcome = outcome.lower() in ('true', '1', 'yes', 'converted')
+        delta = {FEEDBACK: 1}
+        if outcome is not None:
+            delta.update({OUTCOMES: 1, CONVERSIONS: int(bool(outcome))})
+            if score is not None:
+                delta[LABELLED_SCORE_SUM] = float(score)
+        record = dict(features or {}, **{dimension: feedback[dimension] for dimension in self.DIMENSIONS
+                                         if dimension in feedback})
+        return {key: delta for key in self._segment_keys(record)}
+
+    def _flush_at_exit(self) -> None:
+        if self._pid == os.getpid():
+            try:
+                self.wait(5.0)
+                self.flush()
+            except Exception as e:
+                self.logger.warning(f"Failed to write dashboard aggregates snapshot: {str(e)}")
+
+    def _copy(self, resolutions=RESOLUTIONS) -> Dict[str, Dict[int, Dict[str, List[float]]]]:
+        with self._lock:
+            return {name: {index: {key: list(counters) for key, counters in bucket.items()}
+                           for index, bucket in self._buckets[name].items()}
+                    for name in resolutions}
+
+    def flush(self) -> None:
+        """Write this process's buckets as a compact snapshot"""
+        if self._files is None:
+            return
+        buckets = {name: {str(index): bucket for index, bucket in resolution.items()}
+                   for name, resolution in self._copy().items()}
+        self._files.write({'written_at': time.time(), 'buckets': buckets})
+
+    def _other_snapshots(self) -> List[Dict[str, Any]]:
+        """Buckets written by every other process, including exited ones not adopted yet"""
+        if self._files is None:
+            return []
+        return [snapshot['buckets'] for snapshot in self._files.read_others(remove_dead=False)]
+
+    def stats(self, resolution: str = 'hour', periods: Optional[int] = None) -> Dict[str, Any]:
+        """Totals per segment and an overall series for the last ``periods`` buckets"""
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        width, retention = RESOLUTIONS[resolution]
+        periods = min(periods or retention, retention)
+        self._ensure_process()
+        buckets = {name: {} for name in RESOLUTIONS}
+        self._merge_into(buckets, self._copy([resolution]))
+        for snapshot in self._other_snapshots():
+            self._merge_into(buckets, {resolution: snapshot.get(resolution, {})})
+
+        current = int(time.time() // width)
+        indices = range(current - periods + 1, current + 1)
+        totals: Dict[str, List[float]] = {}
+        for index in indices:
+            for key, counters in buckets[resolution].get(index, {}).items():
+                total = totals.get(key)
+                totals[key] = list(counters) if total is None else [a + b for a, b in zip(total, counters)]
+
+        segments: Dict[str, Dict[str, Any]] = {dimension: {} for dimension in self.DIMENSIONS}
+        for key, counters in totals.items():
+            if key != 'all':
+                dimension, value = key.split('=', 1)
+                segments.setdefault(dimension, {})[value] = _summary(counters)
+        return {
+            'resolution': resolution,
+            'periods': periods,
+            'since': indices[0] * width,
+            'totals': _summary(totals.get('all')),
+            'segments': segments,
+            'dropped': self.dropped,
+            'series': [dict(_summary(buckets[resolution].get(index, {}).get('all')), start=index * width)
+                       for index in indices]
+        }
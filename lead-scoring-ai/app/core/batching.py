@@ -0,0 +1,167 @@
+import os
+import queue
+import threading
+import time
+import logging
+from typing import Dict, Any, List, Optional
+from .prediction import LeadScorer
+
+class _PendingPrediction:
+    __slots__ = ('lead_data', 'result', 'done', 'abandoned', 'taken')
+
+    def __init__(self, lead_data: Dict[str, Any]):
+        self.lead_data = lead_data
+        self.result = None
+        self.done = threading.Event()
+        self.abandoned = False  # The caller gave up and scores the lead itself
+        self.taken = False  # A batch is scoring the lead; the caller must wait for it
+
+class MicroBatcher:
+    """Coalesce concurrent single-lead predictions into one model call.
+
+    Request threads enqueue their lead and block until a background thread
+    has scored it together with whatever else arrived in the same window.
+    The batching window only opens while the previous batch held more than
+    one lead, so an idle service scores each request immediately. Callers
+    whose lead is still queued after ``max_wait_ms + result_timeout_ms``
+    fall back to scoring on their own thread, and the batch thread skips
+    it. A lead a batch has already taken is waited for instead, so no lead
+    is scored and logged twice.
+    """
+
+    BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+    def __init__(self, scorer: Optional[LeadScorer] = None, max_batch_size: int = 64,
+                 max_wait_ms: float = 2.0, result_timeout_ms: float = 50.0):
+        self.scorer = scorer or LeadScorer()
+        self.enabled = False
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.result_timeout = result_timeout_ms / 1000.0
+        self.logger = logging.getLogger(__name__)
+
+        self._queue: 'queue.Queue[_PendingPrediction]' = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._reset_stats()
+
+    def init_app(self, app) -> None:
+        """Configure the batcher from the Flask app config"""
+        self.enabled = app.config.get('PREDICT_MICROBATCH_ENABLED', False)
+        self.max_batch_size = app.config.get('PREDICT_MICROBATCH_MAX_SIZE', self.max_batch_size)
+        self.max_wait = app.config.get('PREDICT_MICROBATCH_WAIT_MS', self.max_wait * 1000.0) / 1000.0
+        self.result_timeout = app.config.get(
+            'PREDICT_MICROBATCH_TIMEOUT_MS', self.result_timeout * 1000.0) / 1000.0
+
+    def predict_lead(self, lead_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Score a single lead, coalescing it with concurrent requests when enabled"""
+        if not self.enabled:
+            return self.scorer.predict_lead(lead_data)
+
+        self._ensure_worker()
+        pending = _PendingPrediction(lead_data)
+        self._queue.put(pending)
+        if pending.done.wait(self.max_wait + self.result_timeout):
+            return pending.result
+
+        with self._lock:
+            if not pending.taken:
+                pending.abandoned = True
+                self._fallbacks += 1
+        if pending.taken:
+            # Already in a batch being scored; scoring it here too would log it twice
+            pending.done.wait()
+            return pending.result
+        # The batch thread is saturated, do not let this caller wait any longer
+        return self.scorer.predict_lead(lead_data)
+
+    def _ensure_worker(self) -> None:
+        """Start the batching thread, restarting it in forked worker processes"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='lead-microbatcher', daemon=True)
+                self._thread.start()
+
+    def _collect(self, last_batch_size: int) -> List[_PendingPrediction]:
+        """Block for the first request, then gather the rest of the batch"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + (self.max_wait if last_batch_size > 1 else 0.0)
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _take(self, batch: List[_PendingPrediction]) -> List[_PendingPrediction]:
+        """Claim the leads whose callers are still waiting"""
+        with self._lock:
+            batch = [p for p in batch if not p.abandoned]
+            for pending in batch:
+                pending.taken = True
+        return batch
+
+    def _run(self) -> None:
+        last_batch_size = 0
+        while True:
+            batch = self._take(self._collect(last_batch_size))
+            last_batch_size = len(batch)
+            if not batch:
+                continue
+
+            try:
+                results = self.scorer.predict_leads([p.lead_data for p in batch])
+            except Exception as e:
+                self.logger.error(f"Micro-batch scoring failed: {str(e)}")
+                results = [{'error': str(e), 'needs_human_review': True}] * len(batch)
+
+            for pending, result in zip(batch, results):
+                pending.result = result
+                pending.done.set()
+            self._record_batch(len(batch))
+
+    def _reset_stats(self) -> None:
+        self._batches = 0
+        self._requests = 0
+        self._fallbacks = 0
+        self._max_queue_depth = 0
+        self._batch_size_counts = [0] * (len(self.BATCH_SIZE_BUCKETS) + 1)
+
+    def _record_batch(self, size: int) -> None:
+        depth = self._queue.qsize()
+        bucket = next((i for i, bound in enumerate(self.BATCH_SIZE_BUCKETS) if size <= bound),
+                      len(self.BATCH_SIZE_BUCKETS))
+        with self._lock:
+            self._batches += 1
+            self._requests += size
+            self._max_queue_depth = max(self._max_queue_depth, depth)
+            self._batch_size_counts[bucket] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Get queue depth and batch size statistics"""
+        with self._lock:
+            labels = [f"<={bound}" for bound in self.BATCH_SIZE_BUCKETS] + [f">{self.BATCH_SIZE_BUCKETS[-1]}"]
+            return {
+                'enabled': self.enabled,
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._max_queue_depth,
+                'batches': self._batches,
+                'requests': self._requests,
+                'fallbacks': self._fallbacks,
+                'mean_batch_size': self._requests / self._batches if self._batches else 0.0,
+                'batch_size_histogram': dict(zip(labels, self._batch_size_counts))
+            }
@@ -0,0 +1,288 @@
+import argparse
+import io
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from .model_registry import ModelRegistry
+
+PASSTHROUGH_COLUMNS = ['lead_id', 'company_name']
+_SCAN_BYTES = 16 * 1024 * 1024  # CSV bytes read at a time while finding chunk boundaries
+RESULT_COLUMNS = ['score', 'prediction', 'needs_human_review', 'confidence', 'error']
+
+# Per-process scoring state, set up once by _init_worker
+_worker: Dict[str, Any] = {}
+
+def _init_worker(registry_dir: str, version: str, explain: bool,
+                 vocabularies: Optional[Dict[str, List[str]]]) -> None:
+    """Load the bundle once per process, memory-mapping its (compact) model arrays, and use one thread"""
+    from threadpoolctl import threadpool_limits
+    from .explanation import ExplanationEngine
+
+    _worker['thread_limits'] = threadpool_limits(limits=1)
+    bundle = ModelRegistry(registry_dir).load(version, mmap_mode='r', compact=True)
+    if hasattr(bundle.model, 'get_params') and 'n_jobs' in bundle.model.get_params():
+        bundle.model.set_params(n_jobs=1)
+    if explain:
+        bundle.explanations = ExplanationEngine(bundle.full_model, bundle.data_processor,
+                                                bundle.metadata.get('feature_means'), cache_size=0)
+    _worker.update(bundle=bundle, explain=explain, vocabularies=vocabularies or {})
+
+def _read_csv_rows(path: str, start: int, stop: int) -> pd.DataFrame:
+    """Whole lines in bytes [start, stop) of a CSV, parsed with the file's header"""
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(start)
+        data = f.read(stop - start)
+    return pd.read_csv(io.BytesIO(header + data))
+
+def _read_npy_rows(shard_dir: str, start: int, stop: int, vocabularies: Dict[str, List[str]]) -> pd.DataFrame:
+    """Rows of a synthetic-generator shard, decoding vocabulary codes back to strings"""
+    columns = {}
+    for name in os.listdir(shard_dir):
+        if name.endswith('.npy'):
+            column = name[:-4]
+            values = np.load(os.path.join(shard_dir, name), mmap_mode='r')[start:stop]
+            if column in vocabularies:
+                values = np.asarray(vocabularies[column], dtype=object)[values]
+            columns[column] = np.asarray(values)
+    return pd.DataFrame(columns)
+
+def _score_task(task: tuple) -> Tuple[int, int, bytes, Optional[int]]:
+    """Score one chunk; returns its index, row count, CSV rows (no header) and input offset after it"""
+    from app.api.schemas import validate_lead_columns
+    from .prediction import score_frame
+
+    index, first_row, (kind, *location), input_offset = task
+    if kind == 'csv':
+        frame = _read_csv_rows(*location)
+    else:
+        frame = _read_npy_rows(*location, _worker['vocabularies'])
+    bundle, explain = _worker['bundle'], _worker['explain']
+
+    # Same rules as /api/batch_predict, then one scoring call over the valid rows
+    leads, errors = validate_lead_columns(frame)
+    results: List[Dict[str, Any]] = [{'error': error, 'needs_human_review': True} for error in errors]
+    valid_rows = np.flatnonzero(errors.isna().to_numpy())
+    if len(valid_rows):
+        scored = score_frame(bundle, leads.iloc[valid_rows], include_explanation=explain)
+        for i, result in zip(valid_rows, scored):
+            results[i] = result
+
+    output = pd.DataFrame.from_records(results, columns=RESULT_COLUMNS + (['explanation'] if explain else []))
+    if explain:
+        output['explanation'] = [json.dumps(value) if isinstance(value, dict) else None
+                                 for value in output['explanation']]
+    output.insert(0, 'row', np.arange(first_row, first_row + len(frame)))
+    for offset, column in enumerate(c for c in PASSTHROUGH_COLUMNS if c in frame.columns):
+        output.insert(1 + offset, column, frame[column].to_numpy())
+    buffer = io.StringIO()
+    output.to_csv(buffer, index=False, header=False)
+    return index, len(frame), buffer.getvalue().encode(), input_offset
+
+class BulkScorer:
+    """Offline scoring of a lead file of any size on a process pool.
+
+    The input (a CSV file, or a directory of ``.npy`` column shards written
+    by the synthetic lead generator) is scored ``chunk_rows`` at a time.
+    Each pool worker is spawned with one thread, loads the bundle once with
+    its arrays memory-mapped, and reads, parses and scores the chunks it is
+    handed as CSV byte ranges or npy row ranges. The parent only finds
+    chunk boundaries and appends finished chunks in order, keeping at most
+    a few chunks per worker in flight. CSV chunks are whole lines, so
+    quoted values must not contain newlines. After every chunk the output
+    is flushed and ``<output>.progress`` records how many chunks and rows
+    are done, how many output bytes they take and, for CSV, the input byte
+    offset after them, so an interrupted run seeks straight back to where
+    it stopped.
+    """
+
+    def __init__(self, registry: Optional[ModelRegistry] = None, version: Optional[str] = None,
+                 workers: Optional[int] = None, chunk_rows: int = 50000, explain: bool = False,
+                 report_seconds: float = 10.0):
+        self.registry = registry or ModelRegistry()
+        self.version = version
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_rows = chunk_rows
+        self.explain = explain
+        self.report_seconds = report_seconds
+        self.logger = logging.getLogger(__name__)
+
+    def _npy_manifest(self, input_path: str) -> Optional[Dict[str, Any]]:
+        manifest_path = os.path.join(input_path, 'manifest.json')
+        if not os.path.isdir(input_path):
+            return None
+        if not os.path.exists(manifest_path):
+            raise ValueError(f"{input_path} is a directory without a manifest.json")
+        with open(manifest_path) as f:
+            return json.load(f)
+
+    def _tasks(self, input_path: str, manifest: Optional[Dict[str, Any]],
+               progress: Dict[str, Any]) -> Iterator[tuple]:
+        """(chunk index, first row, CSV byte range or npy slice, CSV offset after it) for every chunk not yet done"""
+        if manifest is None:
+            yield from self._csv_tasks(input_path, progress['chunks_done'], progress['rows_done'],
+                                       progress.get('input_offset'))
+            return
+
+        index, first_row = 0, 0
+        shards = sorted(name for name in os.listdir(input_path) if name.startswith('shard-'))
+        for shard in shards:
+            shard_dir = os.path.join(input_path, shard)
+            first_column = next(name for name in sorted(os.listdir(shard_dir)) if name.endswith('.npy'))
+            shard_rows = len(np.load(os.path.join(shard_dir, first_column), mmap_mode='r'))
+            for start in range(0, shard_rows, self.chunk_rows):
+                stop = min(start + self.chunk_rows, shard_rows)
+                if index >= progress['chunks_done']:
+                    yield index, first_row, ('npy', shard_dir, start, stop), None
+                index += 1
+                first_row += stop - start
+
+    def _csv_tasks(self, input_path: str, index: int, first_row: int,
+                   input_offset: Optional[int]) -> Iterator[tuple]:
+        """Byte ranges of ``chunk_rows`` lines, from ``input_offset`` (default: after the header)"""
+        with open(input_path, 'rb') as f:
+            start = input_offset or len(f.readline())
+            f.seek(start)
+            position, lines = start, 0
+            while True:
+                block = f.read(_SCAN_BYTES)
+                if not block:
+                    break
+                newlines = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == ord('\n'))
+                while lines + len(newlines) >= self.chunk_rows:
+                    take = self.chunk_rows - lines
+                    end = position + int(newlines[take - 1]) + 1
+                    yield index, first_row, ('csv', input_path, start, end), end
+                    index, first_row, start, lines = index + 1, first_row + self.chunk_rows, end, 0
+                    newlines = newlines[take:]
+                lines += len(newlines)
+                position += len(block)
+        if position > start:
+            yield index, first_row, ('csv', input_path, start, position), position
+
+    def _load_progress(self, progress_path: str, expected: Dict[str, Any]) -> Dict[str, Any]:
+        if not os.path.exists(progress_path):
+            return dict(expected, chunks_done=0, rows_done=0, output_bytes=0, input_offset=None)
+        with open(progress_path) as f:
+            progress = json.load(f)
+        changed = [key for key, value in expected.items() if progress.get(key) != value]
+        if changed:
+            raise ValueError(f"Cannot resume: {', '.join(changed)} changed since the interrupted run. "
+                             f"Delete {progress_path} and the output to start over.")
+        return progress
+
+    @staticmethod
+    def _save_progress(progress_path: str, progress: Dict[str, Any]) -> None:
+        tmp_path = f"{progress_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(progress, f)
+        os.replace(tmp_path, progress_path)
+
+    def run(self, input_path: str, output_path: str) -> Dict[str, Any]:
+        """Score ``input_path`` into ``output_path``, resuming an interrupted run"""
+        version = self.version or self.registry.latest_version()
+        if version is None:
+            raise ValueError(f"No model bundle found in {self.registry.root}")
+        manifest = self._npy_manifest(input_path)
+        stat = os.stat(os.path.join(input_path, 'manifest.json') if manifest else input_path)
+        expected = {'input': os.path.abspath(input_path), 'input_size': stat.st_size,
+                    'input_mtime': stat.st_mtime, 'model_version': version,
+                    'chunk_rows': self.chunk_rows, 'explain': self.explain}
+        progress_path = f"{output_path}.progress"
+        progress = self._load_progress(progress_path, expected)
+        if progress.get('complete'):
+            self.logger.info(f"{output_path} is already complete")
+            return progress
+
+        header = ','.join(['row'] + self._passthrough_columns(input_path, manifest) + RESULT_COLUMNS +
+                          (['explanation'] if self.explain else [])) + '\n'
+        mode = 'r+b' if progress['output_bytes'] else 'wb'
+        if progress['chunks_done']:
+            self.logger.info(f"Resuming after {progress['rows_done']} rows")
+        vocabularies = manifest.get('vocabularies') if manifest else None
+        init_args = (str(self.registry.root), version, self.explain, vocabularies)
+
+        started = time.perf_counter()
+        resumed_rows = progress['rows_done']
+        last_report = started
+        with open(output_path, mode) as out:
+            # Drop anything written after the last recorded chunk
+            out.truncate(progress['output_bytes'])
+            out.seek(progress['output_bytes'])
+            if not progress['output_bytes']:
+                out.write(header.encode())
+            for _, rows, body, input_offset in self._score_chunks(self._tasks(input_path, manifest, progress),
+                                                                  init_args):
+                out.write(body)
+                out.flush()
+                os.fsync(out.fileno())
+                progress.update(chunks_done=progress['chunks_done'] + 1, rows_done=progress['rows_done'] + rows,
+                                output_bytes=out.tell(), input_offset=input_offset)
+                self._save_progress(progress_path, progress)
+
+                now = time.perf_counter()
+                if now - last_report >= self.report_seconds:
+                    last_report = now
+                    rate = (progress['rows_done'] - resumed_rows) / (now - started)
+                    self.logger.info(f"Scored {progress['rows_done']} rows ({rate:,.0f} rows/s)")
+
+        elapsed = time.perf_counter() - started
+        progress.update(complete=True, seconds=round(elapsed, 3),
+                        rows_per_second=round((progress['rows_done'] - resumed_rows) / max(elapsed, 1e-9), 1))
+        self._save_progress(progress_path, progress)
+        return progress
+
+    def _passthrough_columns(self, input_path: str, manifest: Optional[Dict[str, Any]]) -> List[str]:
+        if manifest is None:
+            columns = pd.read_csv(input_path, nrows=0).columns
+        else:
+            shard_dir = os.path.join(input_path, 'shard-00000')
+            columns = [name[:-4] for name in os.listdir(shard_dir) if name.endswith('.npy')]
+        return [column for column in PASSTHROUGH_COLUMNS if column in columns]
+
+    def _score_chunks(self, tasks: Iterator[tuple], init_args: tuple) -> Iterator[tuple]:
+        """Results in input order, from a bounded window of in-flight chunks"""
+        if self.workers <= 1:
+            _init_worker(*init_args)
+            for task in tasks:
+                yield _score_task(task)
+            return
+
+        # Spawned, not forked: forking after the bundle's thread pools start can deadlock
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=init_args) as pool:
+            pending = deque()
+            for task in tasks:
+                pending.append(pool.submit(_score_task, task))
+                if len(pending) >= self.workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Score a lead file offline with the latest model bundle')
+    parser.add_argument('input', help='CSV file, or a directory of .npy shards from the synthetic generator')
+    parser.add_argument('output', help='Output CSV; rerun the same command to resume an interrupted run')
+    parser.add_argument('--registry', default='models/registry', help='Model registry directory')
+    parser.add_argument('--version', help='Bundle version (default: the latest)')
+    parser.add_argument('--workers', type=int, help='Scoring processes (default: one per CPU)')
+    parser.add_argument('--chunk-rows', type=int, default=50000, help='Rows per chunk')
+    parser.add_argument('--explain', action='store_true', help='Add a JSON explanation column')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    scorer = BulkScorer(ModelRegistry(args.registry), version=args.version, workers=args.workers,
+                        chunk_rows=args.chunk_rows, explain=args.explain)
+    try:
+        summary = scorer.run(args.input, args.output)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Scored {summary['rows_done']} rows with {summary['model_version']} "
+          f"at {summary.get('rows_per_second', 0):,.0f} rows/s")
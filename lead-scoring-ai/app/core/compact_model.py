@@ -0,0 +1,258 @@
+import argparse
+import json
+import logging
+import numpy as np
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+# Largest probability difference from the original model accepted at export time
+EXPORT_TOLERANCE = 1e-4
+
+class CompactTreeEnsemble:
+    """A tree ensemble flattened into contiguous node arrays.
+
+    Every tree's nodes are stored back to back and ``roots`` holds the index
+    of each tree's first node. Rows are compared as float32, like both
+    sklearn and XGBoost do: a row goes left when ``x <= threshold`` (NaN
+    follows ``missing_left``) and its next node is
+    ``children[2 * node + went_left]``. Leaves point back at themselves, so
+    all rows walk all trees together for exactly ``depth`` steps. The
+    probability is ``link(base + scale * sum(leaf values))``, i.e. the mean
+    leaf class fraction for RandomForest and the logistic of the summed
+    margins for XGBoost.
+    """
+
+    kind = 'tree_ensemble'
+    ARRAYS = ('feature', 'threshold', 'children', 'missing_left', 'value', 'roots')
+    BLOCK_NODES = 32768  # Rows x trees walked at a time, so the working arrays stay in cache
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, children: np.ndarray,
+                 missing_left: np.ndarray, value: np.ndarray, roots: np.ndarray, depth: int,
+                 base: float = 0.0, scale: float = 1.0, link: str = 'identity', source: str = ''):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.depth = int(depth)
+        self.base = float(base)
+        self.scale = float(scale)
+        self.link = link
+        self.source = source
+
+    @classmethod
+    def from_trees(cls, trees: List[Dict[str, np.ndarray]], **params) -> 'CompactTreeEnsemble':
+        """Concatenate per-tree node arrays (children < 0 mark leaves), making child indices absolute"""
+        arrays = {name: [] for name in cls.ARRAYS if name != 'roots'}
+        roots, offset, depth = [], 0, 0
+        for tree in trees:
+            left, right = np.asarray(tree['left']), np.asarray(tree['right'])
+            nodes = np.arange(len(left))
+            leaf = left < 0
+            arrays['feature'].append(np.where(leaf, 0, tree['feature']))
+            arrays['threshold'].append(np.where(leaf, 0.0, tree['threshold']))
+            arrays['children'].append(np.column_stack([np.where(leaf, nodes, right),
+                                                       np.where(leaf, nodes, left)]).ravel() + offset)
+            arrays['missing_left'].append(tree['missing_left'])
+            arrays['value'].append(np.where(leaf, tree['value'], 0.0))
+            roots.append(offset)
+            offset += len(left)
+            depth = max(depth, cls._tree_depth(left, right))
+
+        # Node indices are stored as intp, which NumPy would otherwise convert to on every gather
+        dtypes = {'feature': np.int32, 'threshold': np.float32, 'children': np.intp,
+                  'missing_left': bool, 'value': np.float64}
+        arrays = {name: np.concatenate(values).astype(dtypes[name]) for name, values in arrays.items()}
+        return cls(roots=np.asarray(roots, dtype=np.intp), depth=depth, **arrays, **params)
+
+    @staticmethod
+    def _tree_depth(left: np.ndarray, right: np.ndarray) -> int:
+        depths = np.zeros(len(left), dtype=np.int64)
+        # Both libraries number children after their parents
+        for node in range(len(left)):
+            if left[node] >= 0:
+                depths[left[node]] = depths[right[node]] = depths[node] + 1
+        return int(depths.max())
+
+    def leaves(self, X: np.ndarray) -> np.ndarray:
+        """Node index of the leaf every row reaches in every tree, shape (rows, trees)"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        has_missing = bool(np.isnan(X).any())
+        block_rows = max(1, self.BLOCK_NODES // len(self.roots))
+        if len(X) <= block_rows:
+            return self._walk(X, has_missing)
+        nodes = np.empty((len(X), len(self.roots)), dtype=np.intp)
+        for start in range(0, len(X), block_rows):
+            nodes[start:start + block_rows] = self._walk(X[start:start + block_rows], has_missing)
+        return nodes
+
+    def _walk(self, X: np.ndarray, has_missing: bool) -> np.ndarray:
+        flat = X.ravel()
+        row_offsets = (np.arange(len(X), dtype=np.intp) * X.shape[1])[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.depth):
+            x = flat[row_offsets + self.feature[nodes]]
+            go_left = x <= self.threshold[nodes]
+            if has_missing:
+                go_left = np.where(np.isnan(x), self.missing_left[nodes], go_left)
+            nodes = self.children[2 * nodes + go_left]
+        return nodes
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        output = self.base + self.scale * self.value[self.leaves(X)].sum(axis=1)
+        if self.link == 'logistic':
+            output = 1.0 / (1.0 + np.exp(-output))
+        return np.column_stack([1.0 - output, output])
+
+    def params(self) -> Dict[str, Any]:
+        return {'depth': self.depth, 'base': self.base, 'scale': self.scale, 'link': self.link,
+                'source': self.source}
+
+class CompactLinearModel:
+    """LogisticRegression as a coefficient vector and an intercept"""
+
+    kind = 'linear'
+    ARRAYS = ('coef',)
+
+    def __init__(self, coef: np.ndarray, intercept: float = 0.0, source: str = ''):
+        self.coef = coef
+        self.intercept = float(intercept)
+        self.source = source
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        output = 1.0 / (1.0 + np.exp(-(np.asarray(X, dtype=np.float64) @ self.coef + self.intercept)))
+        return np.column_stack([1.0 - output, output])
+
+    def params(self) -> Dict[str, Any]:
+        return {'intercept': self.intercept, 'source': self.source}
+
+_KINDS = {cls.kind: cls for cls in (CompactTreeEnsemble, CompactLinearModel)}
+
+def _float32_at_most(threshold: np.ndarray) -> np.ndarray:
+    """Largest float32 <= each threshold, so ``x <= t`` keeps its result for float32 rows"""
+    rounded = np.asarray(threshold).astype(np.float32)
+    return np.where(rounded > threshold, np.nextafter(rounded, np.float32(-np.inf)), rounded)
+
+def _compile_forest(model) -> CompactTreeEnsemble:
+    trees = []
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        counts = tree.value[:, 0, :]
+        missing_left = getattr(tree, 'missing_go_to_left', None)
+        trees.append({
+            'feature': tree.feature,
+            'threshold': _float32_at_most(tree.threshold),
+            'left': tree.children_left,
+            'right': tree.children_right,
+            'missing_left': (np.asarray(missing_left, dtype=bool) if missing_left is not None
+                             else np.zeros(tree.node_count, dtype=bool)),
+            'value': counts[:, 1] / counts.sum(axis=1)
+        })
+    return CompactTreeEnsemble.from_trees(trees, scale=1.0 / len(trees), source=type(model).__name__)
+
+def _compile_xgboost(model) -> CompactTreeEnsemble:
+    learner = json.loads(model.get_booster().save_raw('json'))['learner']
+    booster = learner['gradient_booster']
+    if learner['objective']['name'] != 'binary:logistic' or booster['name'] != 'gbtree':
+        raise ValueError(f"Unsupported XGBoost model: {learner['objective']['name']} {booster['name']}")
+
+    # predict_proba only uses the trees up to the best iteration of an early-stopped model
+    tree_list = booster['model']['trees']
+    best_iteration = getattr(model, 'best_iteration', None)
+    if best_iteration is not None:
+        tree_list = tree_list[:booster['model']['iteration_indptr'][best_iteration + 1]]
+
+    trees = []
+    for tree in tree_list:
+        if tree['categories_nodes']:
+            raise ValueError("Categorical XGBoost splits are not supported")
+        conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+        left = np.asarray(tree['left_children'])
+        trees.append({
+            'feature': np.asarray(tree['split_indices']),
+            # XGBoost goes left on x < t, which for float32 x is x <= the next float32 below t
+            'threshold': np.nextafter(conditions, np.float32(-np.inf)),
+            'left': left,
+            'right': np.asarray(tree['right_children']),
+            'missing_left': np.asarray(tree['default_left'], dtype=bool),
+            'value': conditions.astype(np.float64)  # Leaves keep their weight in split_conditions
+        })
+
+    base_score = float(str(learner['learner_model_param']['base_score']).strip('[]'))
+    return CompactTreeEnsemble.from_trees(trees, base=np.log(base_score / (1.0 - base_score)),
+                                          link='logistic', source=type(model).__name__)
+
+def _compile_linear(model) -> CompactLinearModel:
+    coef = np.asarray(model.coef_, dtype=np.float64)
+    if coef.shape[0] != 1:
+        raise ValueError("Only binary logistic models are supported")
+    return CompactLinearModel(coef[0].copy(), float(np.asarray(model.intercept_)[0]), source=type(model).__name__)
+
+def compile_model(model):
+    """Turn a trained XGBoost, RandomForest/ExtraTrees or LogisticRegression into its compact form"""
+    model_name = type(model).__name__
+    if hasattr(model, 'get_booster'):
+        return _compile_xgboost(model)
+    if model_name in ('RandomForestClassifier', 'ExtraTreesClassifier'):
+        return _compile_forest(model)
+    if model_name == 'LogisticRegression':
+        return _compile_linear(model)
+    raise ValueError(f"No compact form for {model_name}")
+
+def max_difference(compact, model, X: np.ndarray) -> float:
+    """Largest absolute probability difference between the compact and original model on X"""
+    if len(X) == 0:
+        return 0.0
+    return float(np.max(np.abs(compact.predict_proba(X)[:, 1] - model.predict_proba(X)[:, 1])))
+
+def save_compact_model(compact, path) -> None:
+    """Write one ``.npy`` file per array plus ``model.json`` into a new directory"""
+    path = Path(path)
+    path.mkdir()
+    for name in compact.ARRAYS:
+        np.save(path / f"{name}.npy", getattr(compact, name))
+    with open(path / 'model.json', 'w') as f:
+        json.dump(dict(compact.params(), kind=compact.kind), f, indent=2)
+
+def load_compact_model(path, mmap_mode: Optional[str] = None):
+    """Load a compact model; with ``mmap_mode='r'`` its arrays stay in the page cache"""
+    path = Path(path)
+    with open(path / 'model.json') as f:
+        params = json.load(f)
+    cls = _KINDS[params.pop('kind')]
+    arrays = {name: np.load(path / f"{name}.npy", mmap_mode=mmap_mode) for name in cls.ARRAYS}
+    return cls(**arrays, **params)
+
+def verification_rows(data_processor, n_rows: int = 2000, seed: int = 42) -> np.ndarray:
+    """Random transformed rows: standardised numerics and one category per one-hot group"""
+    encoder = data_processor.encoder
+    if encoder is None:
+        raise ValueError("The preprocessor has no compiled encoder")
+    rng = np.random.default_rng(seed)
+    X = np.zeros((n_rows, encoder.n_features))
+    X[:, :len(encoder.numeric_features)] = rng.normal(scale=2.0, size=(n_rows, len(encoder.numeric_features)))
+    for columns in encoder.category_columns:
+        indices = np.fromiter(columns.values(), dtype=np.int64)
+        X[np.arange(n_rows), rng.choice(indices, size=n_rows)] = 1.0
+    return X
+
+if __name__ == '__main__':
+    from .model_registry import ModelRegistry
+
+    parser = argparse.ArgumentParser(description='Export the compact form of a stored model bundle')
+    parser.add_argument('--registry', default='models/registry', help='Model registry directory')
+    parser.add_argument('--version', help='Bundle version (default: the latest)')
+    parser.add_argument('--rows', type=int, default=2000, help='Random rows the export is checked on')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    registry = ModelRegistry(args.registry)
+    bundle = registry.load(args.version)
+    compact = compile_model(bundle.model)
+    difference = max_difference(compact, bundle.model, verification_rows(bundle.data_processor, args.rows))
+    if difference > EXPORT_TOLERANCE:
+        raise SystemExit(f"Compact model differs from {bundle.version} by {difference:.2e}, not exported")
+    registry.save_compact(bundle.version, compact)
+    print(f"Exported {compact.source} of {bundle.version} as {compact.kind} "
+          f"(max probability difference {difference:.2e})")
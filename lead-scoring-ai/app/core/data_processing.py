@@ -4,14 +4,18 @@ from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from sklearn.impute import SimpleImputer
-import joblib
 import logging
-from typing import Dict, Any
-import shap
+import math
+from typing import Dict, Any, Tuple
+from .feature_encoder import CompiledFeatureEncoder
+
+# NaN categories are imputed while None is encoded as unknown, so keep them apart
+_MISSING_CATEGORY = ('missing',)
 
 class DataProcessor:
     def __init__(self):
         self.preprocessor = None
+        self.encoder = None
         self.feature_columns = [
             'company_size',
             'annual_revenue',
@@ -20,6 +24,8 @@ class DataProcessor:
             'lead_source',
             'past_interactions'
         ]
+        self.numeric_columns = ['company_size', 'annual_revenue', 'num_employees', 'past_interactions']
+        self.categorical_columns = ['industry', 'lead_source']
         self.logger = logging.getLogger(__name__)
         self.feature_importance = {}
         
@@ -36,7 +42,42 @@ class DataProcessor:
             return False
             
         return True
-        
+
+    def validate_batch(self, data: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+        """Validate a batch of leads row by row.
+
+        Returns the feature frame with numeric columns coerced to floats and a
+        Series holding an error message for each invalid row (None when valid).
+        """
+        errors = pd.Series([None] * len(data), index=data.index, dtype=object)
+        missing = [col for col in self.feature_columns if col not in data.columns]
+        if missing:
+            errors[:] = f"Missing required columns: {set(missing)}"
+            return data, errors
+
+        features = data[self.feature_columns].copy()
+        for col in self.numeric_columns:
+            coerced = pd.to_numeric(features[col], errors='coerce')
+            invalid = coerced.isna() & features[col].notna()
+            errors[invalid & errors.isna()] = f"Invalid numeric value for {col}"
+            features[col] = coerced.astype(float)
+
+        return features, errors
+
+    def feature_key(self, lead_data: Dict[str, Any]) -> tuple:
+        """Canonical hashable form of a lead's feature values, ignoring all other fields"""
+        key = []
+        for column in self.feature_columns:
+            value = lead_data[column]
+            if column in self.numeric_columns:
+                value = None if value is None else float(value)
+                if value is not None and math.isnan(value):
+                    value = None
+            elif isinstance(value, float) and math.isnan(value):
+                value = _MISSING_CATEGORY
+            key.append(value)
+        return tuple(key)
+
     def create_preprocessor(self) -> None:
         """Create the data preprocessing pipeline with missing value handling"""
         numeric_features = ['company_size', 'annual_revenue', 'num_employees']
@@ -68,28 +109,45 @@ class DataProcessor:
             
         self.logger.info("Fitting preprocessor on training data")
         self.preprocessor.fit(data[self.feature_columns])
+        self.compile_encoder()
         
         # Calculate initial feature importance
         self._calculate_feature_importance(data)
-        joblib.dump(self.preprocessor, 'models/preprocessor.joblib')
         
     def transform_data(self, data: pd.DataFrame) -> np.ndarray:
         """Transform input data using fitted preprocessor"""
         if not self.validate_data(data):
             raise ValueError("Invalid input data")
             
-        if self.preprocessor is None:
-            try:
-                self.preprocessor = joblib.load('models/preprocessor.joblib')
-            except FileNotFoundError:
-                raise ValueError("Preprocessor not fitted yet")
-                
-        self.logger.info("Transforming input data")
+        self._ensure_preprocessor()
+        self.logger.debug("Transforming input data")
         return self.preprocessor.transform(data[self.feature_columns])
+
+    def encode_lead(self, lead_data: Dict[str, Any]) -> np.ndarray:
+        """Transform a single lead dict, using the compiled encoder when available"""
+        self._ensure_preprocessor()
+        if self.encoder is None:
+            return self.transform_data(pd.DataFrame([lead_data]))
+        return self.encoder.encode(lead_data)
+
+    def compile_encoder(self) -> None:
+        """Build the pandas-free encoder from the fitted preprocessor"""
+        try:
+            self.encoder = CompiledFeatureEncoder.from_preprocessor(self.preprocessor, self.feature_columns)
+        except (AttributeError, KeyError, ValueError) as e:
+            self.logger.warning(f"Falling back to ColumnTransformer, encoder not compiled: {str(e)}")
+            self.encoder = None
+
+    def _ensure_preprocessor(self) -> None:
+        """Fail clearly until a preprocessor is fitted or loaded with its registry bundle"""
+        if self.preprocessor is None:
+            raise ValueError("Preprocessor not fitted yet")
         
     def _calculate_feature_importance(self, data: pd.DataFrame) -> None:
         """Calculate and store initial feature importance using SHAP values"""
         try:
+            import shap
+
             # Sample data for initial importance calculation
             sample_data = data.sample(min(100, len(data)))
             transformed = self.preprocessor.transform(sample_data)
@@ -0,0 +1,412 @@
+import argparse
+import logging
+import math
+import time
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from .process_snapshots import SnapshotFiles, ThreadShards
+
+SCORE_BINS = 20
+# Population stability index bands: below WARN is stable, above ALERT is drift
+PSI_WARN = 0.1
+PSI_ALERT = 0.25
+_PSI_FLOOR = 1e-4  # Share given to empty bins, so one empty bin cannot make the index infinite
+
+def _score_counts(scores: np.ndarray) -> List[int]:
+    bins = np.minimum((np.asarray(scores, dtype=np.float64) * SCORE_BINS).astype(np.intp), SCORE_BINS - 1)
+    return np.bincount(bins, minlength=SCORE_BINS).tolist()
+
+class QuantileSketch:
+    """Mergeable quantile sketch of a non-negative feature in a fixed set of log-spaced buckets.
+
+    Bucket ``i`` counts the values whose ``log1p`` falls in
+    ``((i - 1) * step, i * step]``, so zero gets a bucket of its own and any
+    quantile read back is within ``RELATIVE_ACCURACY`` of ``1 + value``.
+    Every sketch shares the same buckets, so merging is adding counts and
+    the memory is the same after ten leads or ten billion. Negative values
+    count as zero and values above ``MAX_VALUE`` land in the last bucket.
+    """
+
+    RELATIVE_ACCURACY = 0.01
+    MAX_VALUE = 1e12
+    STEP = math.log((1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY))
+    N_BUCKETS = math.ceil(math.log1p(MAX_VALUE) / STEP) + 1
+
+    def __init__(self, counts: Optional[List[int]] = None, missing: int = 0):
+        # A list, because incrementing one element is several times cheaper than on a NumPy array
+        self.counts = counts if counts is not None else [0] * self.N_BUCKETS
+        self.missing = int(missing)
+
+    def add(self, value: Any) -> None:
+        if value is None:
+            self.missing += 1
+            return
+        value = float(value)
+        if value > 0:
+            bucket = math.ceil(math.log1p(value) / self.STEP)
+            self.counts[bucket if bucket < self.N_BUCKETS else self.N_BUCKETS - 1] += 1
+        elif value == value:
+            self.counts[0] += 1
+        else:
+            self.missing += 1
+
+    def add_many(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        missing = np.isnan(values)
+        self.missing += int(missing.sum())
+        buckets = np.ceil(np.log1p(np.maximum(values[~missing], 0.0)) / self.STEP)
+        added = np.bincount(np.minimum(buckets, self.N_BUCKETS - 1).astype(np.intp), minlength=self.N_BUCKETS)
+        for bucket in np.flatnonzero(added).tolist():
+            self.counts[bucket] += int(added[bucket])
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.missing += other.missing
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def quantiles(self, qs: Sequence[float]) -> List[Optional[float]]:
+        """Approximate values at each quantile in ``qs``, None when the sketch is empty"""
+        total = self.count
+        if total == 0:
+            return [None] * len(qs)
+        buckets = np.searchsorted(np.cumsum(self.counts), np.asarray(qs) * total)
+        return [0.0 if bucket == 0 else float(np.expm1((bucket - 0.5) * self.STEP)) for bucket in buckets]
+
+    def to_dict(self) -> Dict[str, Any]:
+        buckets = [bucket for bucket, count in enumerate(self.counts) if count]
+        return {'buckets': buckets, 'counts': [self.counts[bucket] for bucket in buckets], 'missing': self.missing}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'QuantileSketch':
+        sketch = cls(missing=data['missing'])
+        for bucket, count in zip(data['buckets'], data['counts']):
+            sketch.counts[bucket] = count
+        return sketch
+
+class CategoryCounts:
+    """Exact counts of the first ``MAX_VALUES`` distinct values of a categorical feature.
+
+    Further distinct values are only counted in ``other``, which bounds the
+    memory when a column starts receiving free text.
+    """
+
+    MAX_VALUES = 64
+
+    def __init__(self, counts: Optional[Dict[str, int]] = None, other: int = 0, missing: int = 0):
+        self.counts = counts if counts is not None else {}
+        self.other = int(other)
+        self.missing = int(missing)
+
+    def add(self, value: Any, amount: int = 1) -> None:
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            self.missing += amount
+            return
+        key = str(value)
+        if key in self.counts:
+            self.counts[key] += amount
+        elif len(self.counts) < self.MAX_VALUES:
+            self.counts[key] = amount
+        else:
+            self.other += amount
+
+    def add_many(self, values: pd.Series) -> None:
+        self.missing += int(values.isna().sum())
+        # Most frequent first, so a full table keeps the values that matter
+        for value, count in values.dropna().astype(str).value_counts().items():
+            self.add(value, int(count))
+
+    def merge(self, other: 'CategoryCounts') -> None:
+        for key, count in list(other.counts.items()):
+            self.add(key, count)
+        self.other += other.other
+        self.missing += other.missing
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts.values()) + self.other
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'counts': dict(self.counts), 'other': self.other, 'missing': self.missing}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CategoryCounts':
+        return cls(dict(data['counts']), data['other'], data['missing'])
+
+class DriftSketches:
+    """Sketches of every model feature plus a histogram of the scores, for one stream of leads.
+
+    The snapshot saved with a model bundle is one of these, built from the
+    training rows and the holdout scores; the monitor keeps live ones per
+    model version and time window and compares the two.
+    """
+
+    def __init__(self, numeric_columns: Sequence[str], categorical_columns: Sequence[str]):
+        self.numeric = {column: QuantileSketch() for column in numeric_columns}
+        self.categorical = {column: CategoryCounts() for column in categorical_columns}
+        self.scores = [0] * SCORE_BINS
+        self.leads = 0
+
+    def add(self, lead: Dict[str, Any], score: float) -> None:
+        """Count one scored lead"""
+        for column, sketch in self.numeric.items():
+            sketch.add(lead.get(column))
+        for column, counts in self.categorical.items():
+            counts.add(lead.get(column))
+        self.scores[min(int(score * SCORE_BINS), SCORE_BINS - 1)] += 1
+        self.leads += 1
+
+    def add_frame(self, frame: pd.DataFrame, scores: np.ndarray) -> None:
+        """Count a frame of scored leads, one vectorized update per column"""
+        for column, sketch in self.numeric.items():
+            sketch.add_many(pd.to_numeric(frame[column], errors='coerce').to_numpy(dtype=np.float64))
+        for column, counts in self.categorical.items():
+            counts.add_many(frame[column])
+        self.scores = [a + b for a, b in zip(self.scores, _score_counts(scores))]
+        self.leads += len(frame)
+
+    def merge(self, other: 'DriftSketches') -> None:
+        for column, sketch in other.numeric.items():
+            self.numeric.setdefault(column, QuantileSketch()).merge(sketch)
+        for column, counts in other.categorical.items():
+            self.categorical.setdefault(column, CategoryCounts()).merge(counts)
+        self.scores = [a + b for a, b in zip(self.scores, other.scores)]
+        self.leads += other.leads
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'leads': self.leads,
+            'numeric': {column: sketch.to_dict() for column, sketch in self.numeric.items()},
+            'categorical': {column: counts.to_dict() for column, counts in self.categorical.items()},
+            'scores': list(self.scores)
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'DriftSketches':
+        sketches = cls([], [])
+        sketches.numeric = {column: QuantileSketch.from_dict(d) for column, d in data['numeric'].items()}
+        sketches.categorical = {column: CategoryCounts.from_dict(d) for column, d in data['categorical'].items()}
+        sketches.scores = list(data['scores'])
+        sketches.leads = int(data['leads'])
+        return sketches
+
+def build_reference(data_processor, X: pd.DataFrame, scores: np.ndarray) -> DriftSketches:
+    """Snapshot of the training feature distribution and the model's holdout scores"""
+    reference = DriftSketches(data_processor.numeric_columns, data_processor.categorical_columns)
+    reference.add_frame(X, np.asarray([]))  # Scores come from the holdout, not from every training row
+    reference.scores = _score_counts(scores)
+    return reference
+
+def psi(expected: np.ndarray, actual: np.ndarray) -> Optional[float]:
+    """Population stability index between two count vectors over the same bins"""
+    expected, actual = np.asarray(expected, dtype=np.float64), np.asarray(actual, dtype=np.float64)
+    if expected.sum() == 0 or actual.sum() == 0:
+        return None
+    p = np.maximum(expected / expected.sum(), _PSI_FLOOR)
+    q = np.maximum(actual / actual.sum(), _PSI_FLOOR)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+def ks_statistic(expected: np.ndarray, actual: np.ndarray) -> Optional[float]:
+    """Largest distance between the two binned CDFs (two-sample Kolmogorov-Smirnov statistic)"""
+    expected, actual = np.asarray(expected, dtype=np.float64), np.asarray(actual, dtype=np.float64)
+    if expected.sum() == 0 or actual.sum() == 0:
+        return None
+    return float(np.max(np.abs(np.cumsum(expected) / expected.sum() - np.cumsum(actual) / actual.sum())))
+
+def _status(value: Optional[float]) -> str:
+    if value is None:
+        return 'insufficient_data'
+    return 'stable' if value < PSI_WARN else 'moderate' if value < PSI_ALERT else 'drift'
+
+def _rounded(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 4)
+
+def _compare_numeric(reference: QuantileSketch, live: QuantileSketch) -> Dict[str, Any]:
+    """PSI over the reference deciles plus a missing bin, KS over every bucket"""
+    reference_counts, live_counts = np.asarray(reference.counts), np.asarray(live.counts)
+    total = reference_counts.sum()
+    if total:
+        edges = np.searchsorted(np.cumsum(reference_counts), np.arange(1, 10) * total / 10)
+        starts = np.unique(np.concatenate([[0], edges + 1]))
+        starts = starts[starts < QuantileSketch.N_BUCKETS]
+        reference_bins = np.append(np.add.reduceat(reference_counts, starts), reference.missing)
+        live_bins = np.append(np.add.reduceat(live_counts, starts), live.missing)
+    else:
+        reference_bins, live_bins = np.array([0, reference.missing]), np.array([live.count, live.missing])
+    quantiles = (0.5, 0.9, 0.99)
+    live_total = live.count + live.missing
+    return {
+        'psi': _rounded(psi(reference_bins, live_bins)),
+        'ks': _rounded(ks_statistic(reference_counts, live_counts)),
+        'missing_rate': _rounded(live.missing / live_total) if live_total else None,
+        'quantiles': dict(zip(('p50', 'p90', 'p99'), live.quantiles(quantiles))),
+        'reference_quantiles': dict(zip(('p50', 'p90', 'p99'), reference.quantiles(quantiles)))
+    }
+
+def _compare_categorical(reference: CategoryCounts, live: CategoryCounts, top: int = 10) -> Dict[str, Any]:
+    """PSI over the training categories plus one bin for unseen values and one for missing"""
+    known = sorted(reference.counts)
+    unseen = {key: count for key, count in live.counts.items() if key not in reference.counts}
+    unseen_total = sum(unseen.values()) + live.other
+    reference_bins = [reference.counts[key] for key in known] + [reference.other, reference.missing]
+    live_bins = [live.counts.get(key, 0) for key in known] + [unseen_total, live.missing]
+    live_total = live.count + live.missing
+    return {
+        'psi': _rounded(psi(reference_bins, live_bins)),
+        'missing_rate': _rounded(live.missing / live_total) if live_total else None,
+        'unseen_rate': _rounded(unseen_total / live_total) if live_total else None,
+        'unseen': dict(sorted(unseen.items(), key=lambda item: -item[1])[:top]),
+        'unseen_other': live.other
+    }
+
+def compare(reference: DriftSketches, live: DriftSketches, min_leads: int = 100) -> Dict[str, Any]:
+    """Per-feature and score drift of ``live`` against ``reference``"""
+    features = {}
+    for column, sketch in reference.numeric.items():
+        features[column] = _compare_numeric(sketch, live.numeric.get(column, QuantileSketch()))
+    for column, counts in reference.categorical.items():
+        features[column] = _compare_categorical(counts, live.categorical.get(column, CategoryCounts()))
+    score = {
+        'psi': _rounded(psi(reference.scores, live.scores)),
+        'ks': _rounded(ks_statistic(reference.scores, live.scores)),
+        'histogram': list(live.scores),
+        'reference_histogram': list(reference.scores)
+    }
+
+    enough = live.leads >= min_leads
+    for entry in list(features.values()) + [score]:
+        entry['status'] = _status(entry['psi']) if enough else 'insufficient_data'
+    statuses = [entry['status'] for entry in list(features.values()) + [score]]
+    status = next((s for s in ('drift', 'moderate', 'stable') if s in statuses), 'insufficient_data')
+    return {'status': status, 'leads': live.leads, 'reference_leads': reference.leads,
+            'features': features, 'score': score}
+
+class DriftMonitor:
+    """Compares live traffic with the feature and score snapshot saved with the model.
+
+    Every scored lead updates fixed-size sketches (see ``DriftSketches``),
+    a constant amount of work per lead. Like ``MetricsRegistry``, each
+    thread updates its own sketches without a lock (see ``ThreadShards``)
+    and they are merged when a report is asked for; with ``drift_dir`` set
+    each process also writes its sketches to ``drift-<pid>.json`` there, so
+    a report from any worker covers them all. Sketches are kept per model version and per
+    ``window_seconds`` window of wall-clock time, and only the current and
+    previous windows are kept, so memory stays bounded however much traffic
+    passes; reports cover those two windows.
+    """
+
+    def __init__(self, window_seconds: float = 3600.0, min_leads: int = 100, drift_dir: Optional[str] = None,
+                 flush_interval: float = 5.0, enabled: bool = True):
+        self.window_seconds = window_seconds
+        self.min_leads = min_leads
+        self.enabled = enabled
+        self._shards = ThreadShards(self._fold, on_new_thread=self._ensure_flusher)
+        self._files = SnapshotFiles(drift_dir, 'drift', self.flush, flush_interval) if drift_dir else None
+
+    def _window(self) -> int:
+        return int(time.time() // self.window_seconds)
+
+    def _ensure_flusher(self) -> None:
+        if self._files is not None:
+            self._files.ensure_flusher()
+
+    def _fold(self, retired: dict, state: dict) -> None:
+        """Merge an exited thread's sketches into ``retired``, dropping windows too old to report"""
+        oldest = self._window() - 1
+        for key in [key for key in retired if key[1] < oldest]:
+            del retired[key]
+        for key, sketches in list(state.items()):
+            if key[1] >= oldest:
+                merged = DriftSketches([], [])  # A fresh object, as a report may be reading the old one
+                for part in (retired.get(key), sketches):
+                    if part is not None:
+                        merged.merge(part)
+                retired[key] = merged
+
+    def _sketches(self, bundle) -> DriftSketches:
+        state = self._shards.local()
+        window = self._window()
+        key = (bundle.version, window)
+        sketches = state.get(key)
+        if sketches is None:
+            for old in [old for old in state if old[1] < window - 1]:
+                del state[old]
+            processor = bundle.data_processor
+            sketches = state[key] = DriftSketches(processor.numeric_columns, processor.categorical_columns)
+        return sketches
+
+    def observe(self, bundle, leads, results: List[Dict[str, Any]]) -> None:
+        """Count the successfully scored leads of a list of lead dicts or a DataFrame"""
+        if not self.enabled:
+            return
+        sketches = self._sketches(bundle)
+        if isinstance(leads, pd.DataFrame):
+            rows = [i for i, result in enumerate(results) if 'error' not in result]
+            if rows:
+                sketches.add_frame(leads.iloc[rows], np.array([results[i]['score'] for i in rows]))
+        else:
+            for lead, result in zip(leads, results):
+                if 'error' not in result:
+                    sketches.add(lead, result['score'])
+
+    def snapshot(self) -> Dict[Tuple[str, int], DriftSketches]:
+        """Merge this process's per-thread sketches of the current and previous windows"""
+        oldest = self._window() - 1
+        totals: Dict[Tuple[str, int], DriftSketches] = {}
+        for state in self._shards.shards():
+            for key, sketches in list(state.items()):
+                if key[1] >= oldest:
+                    totals.setdefault(key, DriftSketches([], [])).merge(sketches)
+        return totals
+
+    def flush(self) -> None:
+        """Write this process's sketches for other workers to merge"""
+        if self._files is not None:
+            self._files.write([[version, window, sketches.to_dict()]
+                               for (version, window), sketches in self.snapshot().items()])
+
+    def _collect(self, version: str) -> DriftSketches:
+        oldest = self._window() - 1
+        live = DriftSketches([], [])
+        for (entry_version, _), sketches in self.snapshot().items():
+            if entry_version == version:
+                live.merge(sketches)
+        if self._files is not None:
+            for entries in self._files.read_others():
+                for entry_version, window, data in entries:
+                    if entry_version == version and window >= oldest:
+                        live.merge(DriftSketches.from_dict(data))
+        return live
+
+    def report(self, bundle) -> Dict[str, Any]:
+        """Drift of the current and previous windows' traffic for a bundle against its snapshot"""
+        live = self._collect(bundle.version)
+        window_start = (self._window() - 1) * self.window_seconds
+        report = {'model_version': bundle.version, 'since': window_start, 'window_seconds': self.window_seconds}
+        if bundle.drift_reference is None:
+            return dict(report, status='no_reference', leads=live.leads)
+        return dict(report, **compare(bundle.drift_reference, live, self.min_leads))
+
+if __name__ == '__main__':
+    from .model_registry import ModelRegistry
+
+    parser = argparse.ArgumentParser(description='Save a drift snapshot for a stored model bundle')
+    parser.add_argument('--registry', default='models/registry', help='Model registry directory')
+    parser.add_argument('--version', help='Bundle version (default: the latest)')
+    parser.add_argument('--data', default='data/leads.csv', help='CSV of the leads the bundle was trained on')
+    parser.add_argument('--rows', type=int, default=100000, help='Rows the snapshot scores are computed on')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    registry = ModelRegistry(args.registry)
+    bundle = registry.load(args.version, compact=True)
+    processor = bundle.data_processor
+    X = pd.read_csv(args.data, usecols=processor.feature_columns)
+    sample = X.sample(min(args.rows, len(X)), random_state=42)
+    scores = bundle.model.predict_proba(processor.transform_data(sample))[:, 1]
+    reference = build_reference(processor, X, scores)
+    registry.save_drift_reference(bundle.version, reference)
+    print(f"Saved drift snapshot of {bundle.version}: {reference.leads} leads, {len(scores)} scores")
@@ -0,0 +1,146 @@
+import logging
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Any, List, Optional, Sequence
+from .cache import PredictionCache
+from .data_processing import DataProcessor
+
+class ExplanationEngine:
+    """Batched SHAP attributions for a trained lead model.
+
+    XGBoost uses the booster's native TreeSHAP (``pred_contribs``),
+    RandomForest uses ``shap.TreeExplainer`` and LogisticRegression uses
+    the closed-form linear SHAP values ``coef * (x - E[x])``. Attributions
+    over one-hot columns are summed back onto the original lead features.
+    When ``model`` is None, ``model_loader`` supplies it on the first
+    explanation, so bundles scoring with a compact model only load the
+    original estimator if something is explained.
+    """
+
+    def __init__(self, model, data_processor: DataProcessor, feature_means: Optional[Sequence[float]] = None,
+                 top_k: int = 3, cache_size: int = 10000, max_workers: int = 2,
+                 model_loader: Optional[Callable[[], Any]] = None):
+        self.model = model
+        self.model_loader = model_loader
+        self.data_processor = data_processor
+        self.feature_means = feature_means
+        self.top_k = top_k
+        self.cache = PredictionCache(cache_size, ttl_seconds=float('inf'))
+        self.logger = logging.getLogger(__name__)
+        self._attribute = None
+        self._fold_matrix = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='explainer')
+
+    def _build(self) -> None:
+        """Pick the SHAP algorithm for the model type and the one-hot folding matrix"""
+        if self.model is None:
+            self.model = self.model_loader()
+        model_name = type(self.model).__name__
+        if hasattr(self.model, 'get_booster'):
+            from xgboost import DMatrix
+
+            booster = self.model.get_booster()
+            # Early-stopped models predict with the trees up to the best iteration only
+            best_iteration = getattr(self.model, 'best_iteration', None)
+            iteration_range = (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+            self._attribute = lambda X: booster.predict(DMatrix(X), pred_contribs=True,
+                                                        iteration_range=iteration_range)[:, :-1]
+        elif model_name in ('RandomForestClassifier', 'ExtraTreesClassifier', 'GradientBoostingClassifier'):
+            import shap
+
+            explainer = shap.TreeExplainer(self.model)
+            self._attribute = lambda X: self._positive_class(explainer.shap_values(X, check_additivity=False))
+        elif hasattr(self.model, 'coef_'):
+            coef = np.asarray(self.model.coef_)[0]
+            means = (np.asarray(self.feature_means) if self.feature_means is not None
+                     else self._default_means(len(coef)))
+            self._attribute = lambda X: (X - means) * coef
+        else:
+            raise ValueError(f"No SHAP algorithm available for {model_name}")
+
+        # Transformed column -> original feature, so attributions fold with one matmul
+        original = self.data_processor.feature_columns
+        transformed = self.data_processor._get_feature_names()
+        fold = np.zeros((len(transformed), len(original)))
+        for i, name in enumerate(transformed):
+            owner = next(j for j, column in enumerate(original)
+                         if name == column or name.startswith(column + '_'))
+            fold[i, owner] = 1.0
+        self._fold_matrix = fold
+
+    @staticmethod
+    def _positive_class(shap_values) -> np.ndarray:
+        if isinstance(shap_values, list):  # Older shap returns one array per class
+            return shap_values[1]
+        shap_values = np.asarray(shap_values)
+        return shap_values[:, :, 1] if shap_values.ndim == 3 else shap_values
+
+    def _default_means(self, n_features: int) -> np.ndarray:
+        """Background when training means were not saved: scaled numerics at 0, uniform categories"""
+        means = np.zeros(n_features)
+        encoder = self.data_processor.encoder
+        if encoder is not None:
+            for columns in encoder.category_columns:
+                for index in columns.values():
+                    means[index] = 1.0 / len(columns)
+        return means
+
+    def _compute(self, X: np.ndarray, keys: List[Optional[tuple]]) -> List[Dict[str, Any]]:
+        if self._attribute is None:
+            self._build()
+
+        folded = self._attribute(X) @ self._fold_matrix
+        names = self.data_processor.feature_columns
+        explanations = []
+        for row, key in zip(folded, keys):
+            order = np.argsort(-np.abs(row))[:self.top_k]
+            explanation = {
+                'contributions': {name: float(value) for name, value in zip(names, row)},
+                'top_features': [{'feature': names[i], 'contribution': float(row[i])} for i in order]
+            }
+            if key is not None:
+                self.cache.put(key, explanation)
+            explanations.append(explanation)
+        return explanations
+
+    def explain(self, X: np.ndarray, keys: Optional[List[Optional[tuple]]] = None,
+                budget_ms: Optional[float] = None) -> List[Optional[Dict[str, Any]]]:
+        """Explain the rows of a transformed matrix.
+
+        Cached rows are served from ``keys``. When ``budget_ms`` elapses
+        before the rest are computed, those rows come back as None; the
+        computation still finishes in the background and fills the cache.
+        """
+        keys = keys if keys is not None else [None] * len(X)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(X)
+        missing = []
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key) if key is not None else None
+            if cached is not None:
+                results[i] = cached
+            else:
+                missing.append(i)
+        if not missing:
+            return results
+
+        start = time.perf_counter()
+        try:
+            # Raises RuntimeError once a model reload has shut this engine down
+            future = self._executor.submit(self._compute, X[missing], [keys[i] for i in missing])
+            computed = future.result(timeout=budget_ms / 1000.0 if budget_ms else None)
+        except FutureTimeoutError:
+            self.logger.warning(f"Explanation budget of {budget_ms}ms exceeded for {len(missing)} rows")
+            return results
+        except Exception as e:
+            self.logger.warning(f"Failed to explain batch: {str(e)}")
+            return results
+
+        for i, explanation in zip(missing, computed):
+            results[i] = explanation
+        self.logger.debug(f"Explained {len(missing)} rows in {(time.perf_counter() - start) * 1000:.1f}ms")
+        return results
+
+    def shutdown(self) -> None:
+        """Let the queued explanations finish, then stop the worker threads; later calls explain nothing"""
+        self._executor.shutdown(wait=False)
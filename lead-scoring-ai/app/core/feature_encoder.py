@@ -0,0 +1,93 @@
+import math
+import numpy as np
+from typing import Dict, Any, List, Sequence
+
+class CompiledFeatureEncoder:
+    """Encode lead dicts straight into model rows without pandas.
+
+    Built from a fitted DataProcessor preprocessor: the numeric imputer
+    medians and scaler mean/scale, and the categorical imputer fill values
+    and one-hot category tables. The output matches
+    ``ColumnTransformer.transform`` exactly.
+    """
+
+    def __init__(self, numeric_features: List[str], medians: np.ndarray,
+                 means: np.ndarray, scales: np.ndarray,
+                 categorical_features: List[str], fill_values: List[Any],
+                 category_columns: List[Dict[Any, int]], required_columns: Sequence[str]):
+        self.numeric_features = list(numeric_features)
+        self.medians = [float(v) for v in medians]
+        self.means = [float(v) for v in means]
+        self.scales = [float(v) for v in scales]
+        self.categorical_features = list(categorical_features)
+        self.fill_values = list(fill_values)
+        self.category_columns = category_columns
+        self.required_columns = tuple(required_columns)
+        self.n_features = len(self.numeric_features) + sum(len(c) for c in category_columns)
+
+    @classmethod
+    def from_preprocessor(cls, preprocessor, required_columns: Sequence[str]) -> 'CompiledFeatureEncoder':
+        """Compile the fitted ColumnTransformer built by DataProcessor.create_preprocessor"""
+        transformers = {name: (pipeline, list(columns))
+                        for name, pipeline, columns in preprocessor.transformers_}
+        if set(transformers) - {'num', 'cat', 'remainder'} or preprocessor.remainder != 'drop':
+            raise ValueError("Unsupported preprocessor layout")
+
+        num_pipeline, numeric_features = transformers['num']
+        imputer = num_pipeline.named_steps['imputer']
+        scaler = num_pipeline.named_steps['scaler']
+        means = scaler.mean_ if scaler.with_mean else np.zeros(len(numeric_features))
+        scales = scaler.scale_ if scaler.with_std else np.ones(len(numeric_features))
+
+        cat_pipeline, categorical_features = transformers['cat']
+        cat_imputer = cat_pipeline.named_steps['imputer']
+        onehot = cat_pipeline.named_steps['onehot']
+        if onehot.drop is not None or onehot.handle_unknown != 'ignore':
+            raise ValueError("Unsupported one-hot encoder settings")
+
+        # Absolute output column of every known category
+        offset = len(numeric_features)
+        category_columns = []
+        for categories in onehot.categories_:
+            category_columns.append({value: offset + i for i, value in enumerate(categories.tolist())})
+            offset += len(categories)
+
+        return cls(numeric_features, imputer.statistics_, means, scales,
+                   categorical_features, cat_imputer.statistics_.tolist(),
+                   category_columns, required_columns)
+
+    @staticmethod
+    def _is_missing_number(value: Any) -> bool:
+        return value is None or (isinstance(value, float) and math.isnan(value))
+
+    def _fill_row(self, row: np.ndarray, lead: Dict[str, Any]) -> None:
+        for column in self.required_columns:
+            if column not in lead:
+                raise ValueError("Invalid input data")
+
+        for i, column in enumerate(self.numeric_features):
+            value = lead[column]
+            value = self.medians[i] if self._is_missing_number(value) else float(value)
+            row[i] = (value - self.means[i]) / self.scales[i]
+
+        for i, column in enumerate(self.categorical_features):
+            value = lead[column]
+            # Only NaN is imputed here, None passes through as an unknown category
+            if isinstance(value, float) and math.isnan(value):
+                value = self.fill_values[i]
+            index = self.category_columns[i].get(value)
+            if index is not None:  # Unknown categories encode as all zeros
+                row[index] = 1.0
+
+    def encode(self, lead: Dict[str, Any]) -> np.ndarray:
+        """Encode a single lead into a (1, n_features) matrix"""
+        X = np.zeros((1, self.n_features))
+        self._fill_row(X[0], lead)
+        return X
+
+    def encode_many(self, leads: List[Dict[str, Any]]) -> np.ndarray:
+        """Encode several leads into a (len(leads), n_features) matrix"""
+        X = np.zeros((len(leads), self.n_features))
+        for row, lead in zip(X, leads):
+            self._fill_row(row, lead)
+        return X
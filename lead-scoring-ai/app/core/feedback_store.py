@@ -0,0 +1,135 @@
+import json
+import time
+import pandas as pd
+from typing import Dict, Any, List
+from .storage import BatchWriter, ReadConnections
+
+FEATURE_COLUMNS = ['company_size', 'annual_revenue', 'num_employees', 'industry', 'lead_source', 'past_interactions']
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS feedback (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        received_at REAL NOT NULL,
+        lead_id TEXT,
+        prediction_id TEXT,
+        user_id TEXT,
+        actual_outcome INTEGER,
+        prediction_score REAL,
+        accuracy_rating INTEGER,
+        feedback_notes TEXT,
+        feedback_text TEXT,
+        company_size REAL,
+        annual_revenue REAL,
+        num_employees REAL,
+        industry TEXT,
+        lead_source TEXT,
+        past_interactions REAL,
+        payload TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_feedback_lead_id ON feedback (lead_id)",
+    "CREATE INDEX IF NOT EXISTS idx_feedback_prediction_id ON feedback (prediction_id)"
+]
+
+_COLUMNS = ['received_at', 'lead_id', 'prediction_id', 'user_id', 'actual_outcome', 'prediction_score',
+            'accuracy_rating', 'feedback_notes', 'feedback_text'] + FEATURE_COLUMNS + ['payload']
+
+_INSERT = f"INSERT INTO feedback ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})"
+
+class FeedbackStore:
+    """Append-only store of human feedback, kept for model retraining.
+
+    Writes go through a group-committing BatchWriter into a SQLite database
+    in WAL mode, indexed by ``lead_id`` and ``prediction_id``.
+    """
+
+    def __init__(self, db_path: str = 'data/feedback.db', max_queue: int = 10000,
+                 batch_size: int = 500, put_timeout: float = 0.1):
+        self.db_path = db_path
+        self._writer = BatchWriter(db_path, _INSERT, _SCHEMA, max_queue=max_queue,
+                                   batch_size=batch_size, put_timeout=put_timeout)
+        self._reads = ReadConnections(db_path)
+        self._schema_ready = False
+
+    @staticmethod
+    def _to_row(feedback: Dict[str, Any]) -> tuple:
+        outcome = feedback.get('actual_outcome')
+        if isinstance(outcome, str):
+            outcome = outcome.lower() in ('true', '1', 'yes', 'converted')
+        values = {
+            'received_at': time.time(),
+            'lead_id': feedback.get('lead_id'),
+            'prediction_id': feedback.get('prediction_id'),
+            'user_id': feedback.get('user_id'),
+            'actual_outcome': None if outcome is None else int(bool(outcome)),
+            'prediction_score': feedback.get('prediction_score'),
+            'accuracy_rating': feedback.get('accuracy_rating'),
+            'feedback_notes': feedback.get('feedback_notes'),
+            'feedback_text': feedback.get('feedback_text'),
+            'payload': json.dumps(feedback, default=str)
+        }
+        for column in FEATURE_COLUMNS:
+            values[column] = feedback.get(column)
+        return tuple(values[column] for column in _COLUMNS)
+
+    def add(self, feedback: Dict[str, Any]) -> None:
+        """Queue a feedback record; raises StoreOverloadedError under sustained overload"""
+        self._writer.submit(self._to_row(feedback))
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        return self._writer.flush(timeout)
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        if not self._schema_ready:
+            self._writer.ensure_schema()
+            self._schema_ready = True
+        return [dict(row) for row in self._reads.query(sql, params)]
+
+    def get_by_lead(self, lead_id: str) -> List[Dict[str, Any]]:
+        return self._query("SELECT * FROM feedback WHERE lead_id = ? ORDER BY id", (lead_id,))
+
+    def get_by_prediction(self, prediction_id: str) -> List[Dict[str, Any]]:
+        return self._query("SELECT * FROM feedback WHERE prediction_id = ? ORDER BY id", (prediction_id,))
+
+    def latest_for_predictions(self, prediction_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Newest outcome and notes per prediction ID, for joining feedback onto logged predictions"""
+        if not prediction_ids:
+            return {}
+        placeholders = ', '.join('?' * len(prediction_ids))
+        rows = self._query(f"SELECT prediction_id, actual_outcome, feedback_notes FROM feedback "
+                           f"WHERE id IN (SELECT MAX(id) FROM feedback WHERE prediction_id IN ({placeholders}) "
+                           f"GROUP BY prediction_id)", tuple(prediction_ids))
+        return {row['prediction_id']: row for row in rows}
+
+    def recent_outcomes(self, limit: int = 5000) -> Dict[str, int]:
+        """Latest outcome of the most recently labelled predictions, by prediction ID"""
+        rows = self._query("SELECT prediction_id, actual_outcome FROM feedback "
+                           "WHERE prediction_id IS NOT NULL AND actual_outcome IS NOT NULL "
+                           "ORDER BY id DESC LIMIT ?", (limit,))
+        outcomes: Dict[str, int] = {}
+        for row in rows:
+            outcomes.setdefault(row['prediction_id'], row['actual_outcome'])
+        return outcomes
+
+    def export_training_frame(self, since_id: int = 0) -> pd.DataFrame:
+        """Labelled feedback with complete features, in ModelTrainer's training layout.
+
+        A prediction contributes only its newest label, so resubmitting
+        feedback corrects it rather than adding weight to it.
+        """
+        if not self._schema_ready:
+            self._writer.ensure_schema()
+            self._schema_ready = True
+        usable = (f"actual_outcome IS NOT NULL "
+                  f"AND {' AND '.join(f'{column} IS NOT NULL' for column in FEATURE_COLUMNS)}")
+        sql = (f"SELECT {', '.join(FEATURE_COLUMNS)}, actual_outcome AS converted FROM feedback "
+               f"WHERE id > ? AND {usable} AND (prediction_id IS NULL OR id IN "
+               f"(SELECT MAX(id) FROM feedback WHERE prediction_id IS NOT NULL AND {usable} "
+               f"GROUP BY prediction_id)) ORDER BY id")
+        return pd.read_sql_query(sql, self._reads.get(), params=(since_id,))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'queue_depth': self._writer.queue_depth,
+            'written': self._writer.written,
+            'dropped': self._writer.dropped
+        }
@@ -0,0 +1,162 @@
+import time
+from bisect import bisect_left
+from typing import Dict, Any, Optional, Sequence, Tuple
+from .process_snapshots import SnapshotFiles, ThreadShards
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _add_values(totals: dict, values: dict) -> None:
+    """Add counter values and histogram bucket lists into ``totals``"""
+    for key, value in list(values.items()):
+        total = totals.get(key)
+        if isinstance(value, list):
+            totals[key] = list(value) if total is None else [a + b for a, b in zip(total, value)]
+        else:
+            totals[key] = (total or 0.0) + value
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram: 'Histogram', labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> '_Timer':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+class Counter:
+    def __init__(self, registry: 'MetricsRegistry', name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        values = self.registry._shards.local()
+        key = (self.name, labels)
+        values[key] = values.get(key, 0.0) + amount
+
+class Histogram:
+    def __init__(self, registry: 'MetricsRegistry', name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str) -> None:
+        values = self.registry._shards.local()
+        key = (self.name, labels)
+        entry = values.get(key)
+        if entry is None:
+            # One count per bucket, then +Inf, then the running sum
+            entry = values[key] = [0.0] * (len(self.buckets) + 2)
+        entry[bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def time(self, *labels: str) -> _Timer:
+        return _Timer(self, labels)
+
+class MetricsRegistry:
+    """Counters and fixed-bucket histograms in Prometheus text format.
+
+    Every thread updates its own dict (see ``ThreadShards``), so the hot
+    path takes no lock; the per-thread values are only summed when the
+    metrics are rendered. With ``metrics_dir`` set, each process
+    periodically writes its totals to ``metrics-<pid>.json`` there and
+    rendering sums every file, so any gunicorn worker can serve the whole
+    service's metrics. Files of exited processes are removed; Prometheus
+    treats the drop as a counter reset.
+    """
+
+    def __init__(self, metrics_dir: Optional[str] = None, flush_interval: float = 5.0):
+        self.flush_interval = flush_interval
+        self._metrics: Dict[str, Any] = {}
+        self._shards = ThreadShards(_add_values, on_new_thread=self._ensure_flusher)
+        self._files = SnapshotFiles(metrics_dir, 'metrics', self.flush, flush_interval) if metrics_dir else None
+
+    def init_app(self, app) -> None:
+        metrics_dir = app.config.get('METRICS_DIR')
+        self.flush_interval = app.config.get('METRICS_FLUSH_SECONDS', self.flush_interval)
+        self._files = SnapshotFiles(metrics_dir, 'metrics', self.flush, self.flush_interval) if metrics_dir else None
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, help_text, label_names))
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, help_text, label_names, buckets))
+
+    def _register(self, metric):
+        self._metrics.setdefault(metric.name, metric)
+        return self._metrics[metric.name]
+
+    def _ensure_flusher(self) -> None:
+        if self._files is not None:
+            self._files.ensure_flusher()
+
+    def snapshot(self) -> Dict[Tuple[str, Tuple[str, ...]], Any]:
+        """Sum this process's per-thread values"""
+        totals = {}
+        for values in self._shards.shards():
+            _add_values(totals, values)
+        return totals
+
+    def flush(self) -> None:
+        """Write this process's totals for other workers to aggregate"""
+        if self._files is not None:
+            self._files.write([[name, list(labels), value] for (name, labels), value in self.snapshot().items()])
+
+    def _collect(self) -> Dict[Tuple[str, Tuple[str, ...]], Any]:
+        totals = self.snapshot()
+        if self._files is not None:
+            for entries in self._files.read_others():
+                _add_values(totals, {(name, tuple(labels)): value for name, labels, value in entries})
+        return totals
+
+    @staticmethod
+    def _labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+        pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        totals = self._collect()
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            series = sorted((labels, value) for (series_name, labels), value in totals.items() if series_name == name)
+            if isinstance(metric, Histogram):
+                lines += [f"# HELP {name} {metric.help}", f"# TYPE {name} histogram"]
+                for labels, value in series:
+                    cumulative = 0.0
+                    for bound, count in zip(metric.buckets + (float('inf'),), value[:-1]):
+                        cumulative += count
+                        le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+                        lines.append(f"{name}_bucket{self._labels(metric.label_names, labels, le)} {cumulative:g}")
+                    lines.append(f"{name}_sum{self._labels(metric.label_names, labels)} {value[-1]!r}")
+                    lines.append(f"{name}_count{self._labels(metric.label_names, labels)} {cumulative:g}")
+            else:
+                lines += [f"# HELP {name} {metric.help}", f"# TYPE {name} counter"]
+                for labels, value in series:
+                    lines.append(f"{name}{self._labels(metric.label_names, labels)} {value:g}")
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram('lead_scoring_stage_seconds', 'Time spent in each scoring stage', ('stage',))
+REQUEST_SECONDS = metrics.histogram('lead_scoring_request_seconds', 'API request latency', ('endpoint',))
+REQUESTS = metrics.counter('lead_scoring_requests_total', 'API requests by endpoint and status',
+                           ('endpoint', 'status'))
+PREDICTIONS = metrics.counter('lead_scoring_predictions_total', 'Leads scored', ('source',))
+PREDICTION_ERRORS = metrics.counter('lead_scoring_prediction_errors_total', 'Leads that failed to score',
+                                    ('source',))
+HUMAN_REVIEW = metrics.counter('lead_scoring_needs_human_review_total', 'Scored leads flagged for human review',
+                               ('source',))
+CACHE_LOOKUPS = metrics.counter('lead_scoring_prediction_cache_total', 'Prediction cache lookups', ('result',))
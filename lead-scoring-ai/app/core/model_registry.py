@@ -0,0 +1,221 @@
+import os
+import json
+import shutil
+import uuid
+import logging
+import joblib
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+from .data_processing import DataProcessor
+from .compact_model import load_compact_model, save_compact_model
+from .drift import DriftSketches
+
+class ModelBundle:
+    """A trained model together with the preprocessor it was fitted with.
+
+    ``model`` is what scores; it is the compact model when the bundle was
+    loaded with ``compact=True``. ``full_model`` is the original estimator,
+    which SHAP explanations need, loaded from ``model_path`` on first use.
+    ``drift_reference`` is the training distribution snapshot the drift
+    monitor compares live traffic with, if the bundle has one.
+    ``challengers`` holds the candidates that lost the selection, by name,
+    when they were asked for; they take the same transformed features.
+    """
+
+    def __init__(self, version: str, data_processor: DataProcessor, model, metadata: Dict[str, Any],
+                 model_path: Optional[Path] = None, full_model=None, mmap_mode: Optional[str] = None):
+        self.version = version
+        self.data_processor = data_processor
+        self.model = model
+        self.metadata = metadata
+        self.model_path = model_path
+        self.mmap_mode = mmap_mode
+        self._full_model = full_model
+        self.drift_reference: Optional[DriftSketches] = None
+        self.challengers: Dict[str, Any] = {}
+        self.explanations = None  # ExplanationEngine, attached by LeadScorer
+
+    @property
+    def full_model(self):
+        if self._full_model is None:
+            self._full_model = joblib.load(self.model_path, mmap_mode=self.mmap_mode)
+        return self._full_model
+
+    def sample_lead(self) -> Dict[str, Any]:
+        """A representative lead built from the fitted imputer statistics"""
+        lead = {column: 0 for column in self.data_processor.feature_columns}
+        encoder = self.data_processor.encoder
+        if encoder is not None:
+            lead.update(zip(encoder.numeric_features, encoder.medians))
+            lead.update(zip(encoder.categorical_features, encoder.fill_values))
+        return lead
+
+class ModelRegistry:
+    """Directory of versioned model bundles.
+
+    Each version lives in its own directory holding ``preprocessor.joblib``,
+    ``model.joblib``, ``metadata.json``, ``drift_reference.json`` and, when
+    the model could be exported, a ``compact/`` directory of plain NumPy
+    arrays. The candidates that lost the selection are kept under
+    ``challengers/<name>/`` in the same layout. Bundles are written to a
+    temporary directory and renamed into place, and the ``LATEST`` pointer
+    is replaced atomically, so readers never see a partially written bundle.
+    """
+
+    LATEST_FILE = 'LATEST'
+    COMPACT_DIR = 'compact'
+    DRIFT_REFERENCE_FILE = 'drift_reference.json'
+    CHALLENGERS_DIR = 'challengers'
+
+    def __init__(self, root: str = 'models/registry'):
+        self.root = Path(root)
+        self.logger = logging.getLogger(__name__)
+
+    def save(self, preprocessor, model, metadata: Dict[str, Any], compact_model=None,
+             drift_reference: Optional[DriftSketches] = None,
+             challengers: Optional[Dict[str, Tuple[Any, Any]]] = None) -> str:
+        """Write a new bundle with its optional compact model, drift snapshot and challengers; mark it latest
+
+        ``challengers`` maps a name to a fitted model and its compact form
+        (or None); they must take the features ``preprocessor`` produces.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        version = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        if metadata.get('training_data_hash'):
+            version = f"{version}-{metadata['training_data_hash'][:8]}"
+
+        staging = self.root / f".staging-{uuid.uuid4().hex}"
+        staging.mkdir()
+        try:
+            joblib.dump(preprocessor, staging / 'preprocessor.joblib')
+            joblib.dump(model, staging / 'model.joblib')
+            if compact_model is not None:
+                save_compact_model(compact_model, staging / self.COMPACT_DIR)
+            if drift_reference is not None:
+                with open(staging / self.DRIFT_REFERENCE_FILE, 'w') as f:
+                    json.dump(drift_reference.to_dict(), f)
+            for name, (challenger, challenger_compact) in (challengers or {}).items():
+                challenger_dir = staging / self.CHALLENGERS_DIR / name
+                challenger_dir.mkdir(parents=True)
+                joblib.dump(challenger, challenger_dir / 'model.joblib')
+                if challenger_compact is not None:
+                    save_compact_model(challenger_compact, challenger_dir / self.COMPACT_DIR)
+            metadata = dict(metadata, version=version)
+            with open(staging / 'metadata.json', 'w') as f:
+                json.dump(metadata, f, indent=2, default=str)
+            os.rename(staging, self.root / version)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        self.set_latest(version)
+        self.logger.info(f"Saved model bundle {version}")
+        return version
+
+    def save_compact(self, version: str, compact_model) -> None:
+        """Add or replace the compact form of a stored version's model"""
+        path = self.root / version
+        if not path.is_dir():
+            raise ValueError(f"Unknown model version: {version}")
+        staging = path / f".{self.COMPACT_DIR}-{uuid.uuid4().hex}"
+        try:
+            save_compact_model(compact_model, staging)
+            shutil.rmtree(path / self.COMPACT_DIR, ignore_errors=True)
+            os.rename(staging, path / self.COMPACT_DIR)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    def save_drift_reference(self, version: str, reference: DriftSketches) -> None:
+        """Add or replace the drift snapshot of a stored version"""
+        path = self.root / version
+        if not path.is_dir():
+            raise ValueError(f"Unknown model version: {version}")
+        tmp_path = path / f".{self.DRIFT_REFERENCE_FILE}.{uuid.uuid4().hex}"
+        with open(tmp_path, 'w') as f:
+            json.dump(reference.to_dict(), f)
+        os.replace(tmp_path, path / self.DRIFT_REFERENCE_FILE)
+
+    def load_drift_reference(self, version: str) -> Optional[DriftSketches]:
+        """Read a version's drift snapshot, None for bundles saved without one"""
+        try:
+            with open(self.root / version / self.DRIFT_REFERENCE_FILE) as f:
+                return DriftSketches.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+
+    def load_challengers(self, version: str, mmap_mode: Optional[str] = None,
+                         compact: bool = False) -> Dict[str, Any]:
+        """A version's challenger models by name, compact where available if ``compact``"""
+        challengers_dir = self.root / version / self.CHALLENGERS_DIR
+        if not challengers_dir.is_dir():
+            return {}
+        challengers = {}
+        for path in sorted(p for p in challengers_dir.iterdir() if p.is_dir()):
+            if compact and (path / self.COMPACT_DIR).is_dir():
+                challengers[path.name] = load_compact_model(path / self.COMPACT_DIR, mmap_mode=mmap_mode)
+            else:
+                challengers[path.name] = joblib.load(path / 'model.joblib', mmap_mode=mmap_mode)
+        return challengers
+
+    def set_latest(self, version: str) -> None:
+        """Point LATEST at an existing version"""
+        if not (self.root / version).is_dir():
+            raise ValueError(f"Unknown model version: {version}")
+        tmp_path = self.root / f".{self.LATEST_FILE}.{uuid.uuid4().hex}"
+        tmp_path.write_text(version)
+        os.replace(tmp_path, self.root / self.LATEST_FILE)
+
+    def list_versions(self) -> List[str]:
+        """List stored versions, oldest first"""
+        if not self.root.is_dir():
+            return []
+        return sorted(p.name for p in self.root.iterdir()
+                      if p.is_dir() and not p.name.startswith('.'))
+
+    def latest_version(self) -> Optional[str]:
+        """Get the version LATEST points at, or the newest stored one"""
+        try:
+            version = (self.root / self.LATEST_FILE).read_text().strip()
+            if (self.root / version).is_dir():
+                return version
+        except FileNotFoundError:
+            pass
+        versions = self.list_versions()
+        return versions[-1] if versions else None
+
+    def get_metadata(self, version: str) -> Dict[str, Any]:
+        """Read the metadata stored with a version"""
+        with open(self.root / version / 'metadata.json') as f:
+            return json.load(f)
+
+    def load(self, version: Optional[str] = None, mmap_mode: Optional[str] = None,
+             compact: bool = False, challengers: bool = False) -> ModelBundle:
+        """Load a bundle, defaulting to the latest version.
+
+        With ``mmap_mode='r'`` the NumPy arrays stored in the bundle are
+        memory-mapped from the page cache instead of copied into each process.
+        With ``compact=True`` the bundle scores with its compact model when it
+        has one, and the original model is only loaded if explanations ask for it.
+        With ``challengers=True`` the losing candidates are loaded too.
+        """
+        version = version or self.latest_version()
+        if version is None or not (self.root / version).is_dir():
+            raise FileNotFoundError(f"No model bundle found in {self.root}")
+
+        path = self.root / version
+        data_processor = DataProcessor()
+        data_processor.preprocessor = joblib.load(path / 'preprocessor.joblib', mmap_mode=mmap_mode)
+        data_processor.compile_encoder()
+        metadata = self.get_metadata(version)
+        if compact and (path / self.COMPACT_DIR).is_dir():
+            model = load_compact_model(path / self.COMPACT_DIR, mmap_mode=mmap_mode)
+            bundle = ModelBundle(version, data_processor, model, metadata, path / 'model.joblib', mmap_mode=mmap_mode)
+        else:
+            model = joblib.load(path / 'model.joblib', mmap_mode=mmap_mode)
+            bundle = ModelBundle(version, data_processor, model, metadata, path / 'model.joblib', model, mmap_mode)
+        bundle.drift_reference = self.load_drift_reference(version)
+        if challengers:
+            bundle.challengers = self.load_challengers(version, mmap_mode, compact)
+        return bundle
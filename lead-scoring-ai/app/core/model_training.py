@@ -1,57 +1,253 @@
+import argparse
+import hashlib
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
-from xgboost import XGBClassifier
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.linear_model import LogisticRegression
-import joblib
-import shap
+from typing import Callable, Dict, Any, Optional, Tuple
 from .data_processing import DataProcessor
+from .model_registry import ModelRegistry
+from .explanation import ExplanationEngine
+from .compact_model import EXPORT_TOLERANCE, compile_model, max_difference
+from .drift import build_reference
+from .feedback_store import FeedbackStore
+from .training_data import TrainingDataCache
+
+def _build_models() -> dict:
+    """Create the candidate models, importing xgboost only when training"""
+    from xgboost import XGBClassifier
+
+    return {
+        'xgboost': XGBClassifier(n_estimators=500, early_stopping_rounds=20, eval_metric='logloss'),
+        'random_forest': RandomForestClassifier(random_state=42),
+        'logistic_regression': LogisticRegression(max_iter=1000)
+    }
+
+def _fit_candidate(name: str, model, X, y: np.ndarray, train_rows: np.ndarray, holdout_rows: np.ndarray,
+                   n_threads: int) -> Tuple[str, Any, float, float]:
+    """Fit one candidate on the training rows and score it on the holdout rows.
+
+    ``X`` is either the feature matrix or the path of a ``.npy`` file that is
+    memory-mapped, so pool workers share one copy of the matrix. Returns the
+    fitted model, its holdout ROC-AUC and the wall-clock fit time.
+    """
+    from threadpoolctl import threadpool_limits
+
+    if isinstance(X, str):
+        X = np.load(X, mmap_mode='r')
+    started = time.perf_counter()
+    with threadpool_limits(limits=n_threads):
+        if getattr(model, 'early_stopping_rounds', None):
+            # Early stopping watches a slice of the training rows, never the selection holdout
+            try:
+                fit_rows, stop_rows = train_test_split(train_rows, test_size=0.1, random_state=42,
+                                                       stratify=y[train_rows])
+            except ValueError:
+                fit_rows, stop_rows = train_test_split(train_rows, test_size=0.1, random_state=42)
+            model.fit(X[fit_rows], y[fit_rows], eval_set=[(X[stop_rows], y[stop_rows])], verbose=False)
+        else:
+            model.fit(X[train_rows], y[train_rows])
+        try:
+            score = roc_auc_score(y[holdout_rows], model.predict_proba(X[holdout_rows])[:, 1])
+        except ValueError:  # Holdout holds a single class
+            score = float('nan')
+    return name, model, float(score), time.perf_counter() - started
 
 class ModelTrainer:
-    def __init__(self):
+    def __init__(self, registry: Optional[ModelRegistry] = None, max_workers: Optional[int] = None,
+                 holdout_fraction: float = 0.2, cache_dir: str = 'data/cache', fit_sample_rows: int = 100000,
+                 chunk_rows: int = 100000):
         self.data_processor = DataProcessor()
-        self.models = {
-            'xgboost': XGBClassifier(),
-            'random_forest': RandomForestClassifier(),
-            'logistic_regression': LogisticRegression()
-        }
+        self.registry = registry or ModelRegistry()
+        self.max_workers = max_workers
+        self.holdout_fraction = holdout_fraction
+        self.cache_dir = cache_dir
+        self.fit_sample_rows = fit_sample_rows  # Rows the preprocessor is fitted on
+        self.chunk_rows = chunk_rows  # Rows transformed per preprocessor call
+        self.candidate_metrics: Dict[str, Dict[str, float]] = {}
+        self._models = None
         self.best_model = None
+        self.best_model_name = None
         self.explainer = None
+        self.feature_means = None
+        self.version = None
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def models(self) -> dict:
+        if self._models is None:
+            self._models = _build_models()
+        return self._models
 
     def load_data(self, data_path):
-        """Load and preprocess the data"""
-        data = pd.read_csv(data_path)
+        """Load the feature columns and label through the incremental columnar cache"""
+        numeric_columns = self.data_processor.numeric_columns
+        cache = TrainingDataCache(data_path, self.cache_dir, numeric_columns=numeric_columns,
+                                  categorical_columns=[c for c in self.data_processor.feature_columns
+                                                       if c not in numeric_columns],
+                                  chunk_size=self.chunk_rows)
+        cache.refresh()
+        return cache.frame(), cache.labels()
+
+    def load_feedback_data(self, feedback_store: FeedbackStore, since_id: int = 0):
+        """Load labelled feedback in the same layout as load_data"""
+        data = feedback_store.export_training_frame(since_id)
         X = data.drop('converted', axis=1)
         y = data['converted']
         return X, y
 
     def train_models(self, X_train, y_train):
-        """Train multiple models and select the best one"""
-        self.data_processor.fit_preprocessor(X_train)
-        X_train_processed = self.data_processor.transform_data(X_train)
-        
-        best_score = 0
-        for name, model in self.models.items():
-            model.fit(X_train_processed, y_train)
-            score = model.score(X_train_processed, y_train)
+        """Train the candidates in parallel, select on holdout ROC-AUC and publish the winner.
+
+        The features are transformed once and shared by every candidate. Each
+        pool worker gets an equal share of the CPUs as its thread budget. The
+        other candidates are saved in the bundle as challengers, which the
+        scorer can shadow-score live traffic with.
+        """
+        self.data_processor.fit_preprocessor(self._fit_sample(X_train))
+        X_train_processed = self._transform_in_chunks(X_train)
+        y = np.asarray(y_train)
+
+        rows = np.arange(len(y))
+        try:
+            train_rows, holdout_rows = train_test_split(rows, test_size=self.holdout_fraction,
+                                                        random_state=42, stratify=y)
+        except ValueError:  # Too few rows of a class to stratify
+            train_rows, holdout_rows = train_test_split(rows, test_size=self.holdout_fraction, random_state=42)
+
+        results = self._fit_candidates(X_train_processed, y, train_rows, holdout_rows)
+        self.candidate_metrics = {}
+        best_score = -1.0
+        self.best_model, self.best_model_name = None, None
+        for name, model, score, seconds in results:
+            self.candidate_metrics[name] = {'holdout_roc_auc': score, 'fit_seconds': round(seconds, 3)}
+            self.logger.info(f"Candidate {name}: holdout ROC-AUC {score:.4f}, fitted in {seconds:.2f}s")
             if score > best_score:
                 best_score = score
                 self.best_model = model
-                joblib.dump(model, f'models/{name}_model.joblib')
-        
-        # Create SHAP explainer
-        self.explainer = shap.Explainer(self.best_model)
-        joblib.dump(self.explainer, 'models/shap_explainer.joblib')
-        
+                self.best_model_name = name
+        if self.best_model is None:
+            raise ValueError("No candidate could be scored on the holdout rows; "
+                             "the training data needs both converted and unconverted leads")
+
+        # Background expectation for linear SHAP explanations
+        self.feature_means = X_train_processed.mean(axis=0).tolist()
+        self.explainer = None
+        compact_model, compact_difference = self._compile_compact(self.best_model, X_train_processed[holdout_rows])
+        challengers = {name: (model, self._compile_compact(model, X_train_processed[holdout_rows])[0])
+                       for name, model, _, _ in results if name != self.best_model_name}
+        # What the drift monitor compares live traffic with
+        drift_reference = build_reference(self.data_processor, X_train,
+                                          self.best_model.predict_proba(X_train_processed[holdout_rows])[:, 1])
+
+        metadata = {
+            'model_name': self.best_model_name,
+            'trained_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'training_data_hash': self._hash_training_data(X_train, y_train),
+            'n_samples': int(len(X_train)),
+            'feature_columns': self.data_processor.feature_columns,
+            'feature_means': self.feature_means,
+            'metrics': {
+                'holdout_roc_auc': float(best_score),
+                'holdout_fraction': self.holdout_fraction,
+                'candidates': self.candidate_metrics
+            },
+            'challengers': sorted(challengers),
+            'compact_model': None if compact_model is None else {
+                'kind': compact_model.kind,
+                'holdout_max_difference': compact_difference
+            }
+        }
+        self.version = self.registry.save(self.data_processor.preprocessor, self.best_model, metadata,
+                                          compact_model=compact_model, drift_reference=drift_reference,
+                                          challengers=challengers)
+
         return self.best_model
 
+    def _compile_compact(self, model, X_check: np.ndarray) -> Tuple[Any, Optional[float]]:
+        """Array-backed form of a model, kept only if it reproduces the holdout probabilities"""
+        try:
+            compact_model = compile_model(model)
+        except ValueError as e:
+            self.logger.warning(f"No compact {type(model).__name__} exported: {str(e)}")
+            return None, None
+        difference = max_difference(compact_model, model, X_check)
+        if difference > EXPORT_TOLERANCE:
+            self.logger.warning(f"No compact {type(model).__name__} exported: "
+                                f"probabilities differ by up to {difference:.2e}")
+            return None, None
+        return compact_model, difference
+
+    def _fit_sample(self, X: pd.DataFrame) -> pd.DataFrame:
+        """Bounded random sample to fit the preprocessor on, holding every category at least once"""
+        if len(X) <= self.fit_sample_rows:
+            return X
+        rows = np.random.default_rng(42).choice(len(X), size=self.fit_sample_rows, replace=False)
+        for column in self.data_processor.feature_columns:
+            if column not in self.data_processor.numeric_columns:
+                first_rows = X[column].reset_index(drop=True).drop_duplicates().index.to_numpy()
+                rows = np.union1d(rows, first_rows)
+        return X.iloc[np.sort(rows)]
+
+    def _transform_in_chunks(self, X: pd.DataFrame) -> np.ndarray:
+        """Transform into one preallocated matrix, so only a chunk of intermediates is alive at a time"""
+        if len(X) <= self.chunk_rows:
+            return self.data_processor.transform_data(X)
+        first = self.data_processor.transform_data(X.iloc[:self.chunk_rows])
+        X_processed = np.empty((len(X), first.shape[1]), dtype=first.dtype)
+        X_processed[:self.chunk_rows] = first
+        for start in range(self.chunk_rows, len(X), self.chunk_rows):
+            X_processed[start:start + self.chunk_rows] = self.data_processor.transform_data(
+                X.iloc[start:start + self.chunk_rows])
+        return X_processed
+
+    def _fit_candidates(self, X: np.ndarray, y: np.ndarray, train_rows: np.ndarray,
+                        holdout_rows: np.ndarray) -> list:
+        """Fit every candidate, in a process pool when more than one worker is available"""
+        cpus = os.cpu_count() or 1
+        workers = self.max_workers or min(len(self.models), cpus)
+        n_threads = max(1, cpus // workers)
+        for model in self.models.values():
+            if 'n_jobs' in model.get_params():
+                model.set_params(n_jobs=n_threads)
+
+        if workers <= 1:
+            return [_fit_candidate(name, model, X, y, train_rows, holdout_rows, n_threads)
+                    for name, model in self.models.items()]
+
+        # Spawned workers memory-map one copy of the matrix; forking a threaded app is unsafe
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            matrix_path = os.path.join(tmp_dir, 'features.npy')
+            np.save(matrix_path, X)
+            with ProcessPoolExecutor(max_workers=workers,
+                                     mp_context=multiprocessing.get_context('spawn')) as pool:
+                futures = [pool.submit(_fit_candidate, name, model, matrix_path, y, train_rows, holdout_rows,
+                                       n_threads)
+                           for name, model in self.models.items()]
+                return [future.result() for future in futures]
+
+    def _hash_training_data(self, X: pd.DataFrame, y: pd.Series) -> str:
+        """Fingerprint the training frame so bundles can be traced to their data"""
+        digest = hashlib.sha256()
+        digest.update(pd.util.hash_pandas_object(X[self.data_processor.feature_columns], index=False).values.tobytes())
+        digest.update(pd.util.hash_pandas_object(y, index=False).values.tobytes())
+        return digest.hexdigest()
+
     def evaluate_model(self, X_test, y_test):
         """Evaluate model performance on test set"""
         X_test_processed = self.data_processor.transform_data(X_test)
         y_pred = self.best_model.predict(X_test_processed)
         y_proba = self.best_model.predict_proba(X_test_processed)[:, 1]
-        
+
         metrics = {
             'accuracy': accuracy_score(y_test, y_pred),
             'precision': precision_score(y_test, y_pred),
@@ -59,14 +255,52 @@ class ModelTrainer:
             'f1': f1_score(y_test, y_pred),
             'roc_auc': roc_auc_score(y_test, y_proba)
         }
-        
+
         return metrics
 
     def explain_prediction(self, X_sample):
-        """Generate SHAP explanation for a single prediction"""
+        """Generate SHAP explanations for the rows of X_sample"""
         if self.explainer is None:
-            self.explainer = joblib.load('models/shap_explainer.joblib')
-            
+            self.explainer = ExplanationEngine(self.best_model, self.data_processor, self.feature_means)
+
         X_processed = self.data_processor.transform_data(X_sample)
-        shap_values = self.explainer(X_processed)
-        return shap_values
\ No newline at end of file
+        return self.explainer.explain(X_processed)
+
+def start_background_training(data_path: str, registry: Optional[ModelRegistry] = None,
+                              on_complete: Optional[Callable[[str], None]] = None) -> threading.Thread:
+    """Train a new bundle on a daemon thread and report its version when done"""
+    def run():
+        trainer = ModelTrainer(registry)
+        try:
+            X, y = trainer.load_data(data_path)
+            trainer.train_models(X, y)
+        except Exception as e:
+            trainer.logger.error(f"Background model training failed: {e}")
+            return
+        if on_complete is not None:
+            on_complete(trainer.version)
+
+    thread = threading.Thread(target=run, name='model-training', daemon=True)
+    thread.start()
+    return thread
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train the lead scoring models and publish a registry bundle')
+    parser.add_argument('--data', default='data/leads.csv', help='Training CSV file')
+    parser.add_argument('--registry', default='models/registry', help='Model registry directory')
+    parser.add_argument('--feedback-db', help='Also train on labelled feedback from this store')
+    parser.add_argument('--cache-dir', default='data/cache', help='Columnar cache of the training CSV')
+    parser.add_argument('--workers', type=int, help='Candidates trained in parallel (default: one per CPU)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    trainer = ModelTrainer(ModelRegistry(args.registry), max_workers=args.workers, cache_dir=args.cache_dir)
+    X, y = trainer.load_data(args.data)
+    if args.feedback_db:
+        X_feedback, y_feedback = trainer.load_feedback_data(FeedbackStore(args.feedback_db))
+        X = pd.concat([X, X_feedback], ignore_index=True)
+        y = pd.concat([y, y_feedback], ignore_index=True)
+    trainer.train_models(X, y)
+    for name, metrics in trainer.candidate_metrics.items():
+        print(f"{name}: holdout ROC-AUC {metrics['holdout_roc_auc']:.4f} in {metrics['fit_seconds']:.2f}s")
+    print(f"Published model bundle {trainer.version} ({trainer.best_model_name})")
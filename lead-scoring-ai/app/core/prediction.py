@@ -1,53 +1,416 @@
 import pandas as pd
-import joblib
-from typing import Dict, Any
-from .data_processing import DataProcessor
+import numpy as np
+import logging
+import threading
+import time
+from typing import Dict, Any, List, Optional
+from .model_registry import ModelRegistry, ModelBundle
+from .aggregates import DashboardAggregates
+from .cache import PredictionCache
+from .drift import DriftMonitor
+from .explanation import ExplanationEngine
+from .feedback_store import FeedbackStore
+from .prediction_log import PredictionLog
+from .shadow import ShadowScorer, compare_with_outcomes
+from .metrics import CACHE_LOOKUPS, HUMAN_REVIEW, PREDICTION_ERRORS, PREDICTIONS, STAGE_SECONDS
+
+def build_result(probability: float, version: str, confidence_threshold: float = 0.7) -> Dict[str, Any]:
+    """Turn a conversion probability into the prediction payload"""
+    probability = float(probability)
+    needs_review = not (probability > confidence_threshold or
+                        probability < (1 - confidence_threshold))
+
+    return {
+        'score': probability,
+        'prediction': probability > 0.5,
+        'needs_human_review': needs_review,
+        'confidence': abs(probability - 0.5) * 2,  # Normalized to 0-1
+        'model_version': version
+    }
+
+def feature_key(bundle: ModelBundle, lead_data: Dict[str, Any]) -> Optional[tuple]:
+    """Canonical feature tuple of a lead, or None when it cannot be built"""
+    try:
+        return bundle.data_processor.feature_key(lead_data)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def score_frame(bundle: ModelBundle, leads: pd.DataFrame, include_explanation: bool = False,
+                chunk_size: int = 10000, budget_ms: Optional[float] = None, confidence_threshold: float = 0.7,
+                shadow: Optional[list] = None) -> List[Dict[str, Any]]:
+    """Score a DataFrame of leads with one bundle, one transform per chunk.
+
+    Invalid rows get an error entry; results are in input order. Nothing is
+    cached, counted or logged, so offline scorers can call this with just a
+    loaded bundle. Explanations need ``bundle.explanations``. The
+    ``(matrix, rows)`` of each scored chunk are appended to ``shadow`` if
+    given.
+    """
+    leads = leads.reset_index(drop=True)
+    stage_started = time.perf_counter()
+    features, row_errors = bundle.data_processor.validate_batch(leads)
+    STAGE_SECONDS.observe(time.perf_counter() - stage_started, 'validation')
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(leads)
+    for i, error in row_errors.dropna().items():
+        results[i] = {'error': error, 'needs_human_review': True, 'model_version': bundle.version}
+
+    valid_rows = np.flatnonzero(row_errors.isna().to_numpy())
+    for start in range(0, len(valid_rows), chunk_size):
+        rows = valid_rows[start:start + chunk_size]
+        try:
+            stage_started = time.perf_counter()
+            processed_data = bundle.data_processor.transform_data(features.iloc[rows])
+            STAGE_SECONDS.observe(time.perf_counter() - stage_started, 'preprocessing')
+            stage_started = time.perf_counter()
+            probabilities = bundle.model.predict_proba(processed_data)[:, 1]
+            STAGE_SECONDS.observe(time.perf_counter() - stage_started, 'inference')
+        except Exception as e:
+            for i in rows:
+                results[i] = {'error': str(e), 'needs_human_review': True, 'model_version': bundle.version}
+            continue
+        if shadow is not None:
+            shadow.append((processed_data, rows))
+
+        explanations = None
+        if include_explanation:
+            keys = [feature_key(bundle, lead) for lead in features.iloc[rows].to_dict('records')]
+            with STAGE_SECONDS.time('explanation'):
+                explanations = bundle.explanations.explain(processed_data, keys, budget_ms)
+        for j, i in enumerate(rows):
+            result = build_result(probabilities[j], bundle.version, confidence_threshold)
+            if explanations is not None:
+                result['explanation'] = explanations[j]
+            results[i] = result
+
+    return results
 
 class LeadScorer:
-    def __init__(self):
-        self.data_processor = DataProcessor()
-        self.model = None
+    def __init__(self, registry: Optional[ModelRegistry] = None, feedback_store: Optional[FeedbackStore] = None,
+                 prediction_log: Optional[PredictionLog] = None):
+        self.registry = registry or ModelRegistry()
+        self.feedback_store = feedback_store or FeedbackStore()
+        self.prediction_log = prediction_log or PredictionLog()
+        self.bundle: Optional[ModelBundle] = None
         self.confidence_threshold = 0.7  # Threshold for automatic decisions
+        self.batch_chunk_size = 10000  # Rows transformed and scored per call
+        self.cache = PredictionCache()
+        self.drift = DriftMonitor()
+        self.aggregates = DashboardAggregates()
+        self.shadow = ShadowScorer(self.prediction_log)
+        self.explanation_top_k = 3
+        self.explanation_cache_size = 10000
+        self.explanation_budget_ms: Optional[float] = None  # None waits for every explanation
+        self.compact_model = True  # Score with the bundle's array-backed model when it has one
+        self.mmap_model = True  # Map bundle arrays from the page cache, shared by every worker process
+        self.model_threads: Optional[int] = None  # n_jobs for models with their own thread pool
+        self.logger = logging.getLogger(__name__)
+        self._reload_lock = threading.Lock()
 
-    def load_model(self, model_path: str = 'models/xgboost_model.joblib'):
-        """Load a trained model from disk"""
-        try:
-            self.model = joblib.load(model_path)
-        except FileNotFoundError:
-            raise ValueError("Model not found. Please train the model first.")
+    @property
+    def model(self):
+        return self.bundle.model if self.bundle is not None else None
+
+    @property
+    def data_processor(self):
+        return self.bundle.data_processor if self.bundle is not None else None
 
-    def predict_lead(self, lead_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Make a prediction for a single lead"""
-        if self.model is None:
+    @property
+    def model_version(self) -> Optional[str]:
+        return self.bundle.version if self.bundle is not None else None
+
+    def init_app(self, app) -> None:
+        """Point the scorer at the configured registry and load the latest bundle"""
+        self.registry = ModelRegistry(app.config.get('MODEL_REGISTRY_DIR', 'models/registry'))
+        self.cache = PredictionCache(app.config.get('PREDICTION_CACHE_SIZE', 10000),
+                                     app.config.get('PREDICTION_CACHE_TTL_SECONDS', 300.0))
+        self.explanation_top_k = app.config.get('EXPLANATION_TOP_K', self.explanation_top_k)
+        self.explanation_cache_size = app.config.get('EXPLANATION_CACHE_SIZE', self.explanation_cache_size)
+        self.explanation_budget_ms = app.config.get('EXPLANATION_BUDGET_MS', self.explanation_budget_ms)
+        self.compact_model = app.config.get('COMPACT_MODEL', self.compact_model)
+        self.mmap_model = app.config.get('MODEL_MMAP', self.mmap_model)
+        self.model_threads = app.config.get('MODEL_THREADS', self.model_threads)
+        self.drift = DriftMonitor(app.config.get('DRIFT_WINDOW_SECONDS', 3600.0),
+                                  app.config.get('DRIFT_MIN_LEADS', 100),
+                                  app.config.get('DRIFT_DIR'),
+                                  app.config.get('DRIFT_FLUSH_SECONDS', 5.0),
+                                  enabled=app.config.get('DRIFT_ENABLED', True))
+        self.aggregates = DashboardAggregates(app.config.get('DASHBOARD_STATS_DIR'),
+                                              app.config.get('DASHBOARD_SNAPSHOT_SECONDS', 30.0))
+        self.feedback_store = FeedbackStore(app.config.get('FEEDBACK_DB_PATH', 'data/feedback.db'),
+                                            max_queue=app.config.get('FEEDBACK_QUEUE_SIZE', 10000))
+        self.prediction_log = PredictionLog(app.config.get('PREDICTION_LOG_PATH', 'data/predictions.db'),
+                                            ring_size=app.config.get('PREDICTION_LOG_RING_SIZE', 1000),
+                                            max_queue=app.config.get('PREDICTION_LOG_QUEUE_SIZE', 10000))
+        self.shadow = ShadowScorer(self.prediction_log, app.config.get('SHADOW_SAMPLE_RATE', 0.0),
+                                   app.config.get('SHADOW_WORKERS', 1), app.config.get('SHADOW_QUEUE_SIZE', 1000),
+                                   app.config.get('SHADOW_MAX_OVERHEAD', 0.25))
+        self.load_model()
+
+    def load_model(self, version: Optional[str] = None) -> str:
+        """Load a bundle from the registry, warm it up and swap it in atomically.
+
+        The model and preprocessor are replaced together by rebinding
+        ``self.bundle``; requests already holding the previous bundle finish
+        scoring with it. The previous bundle's explanation threads exit once
+        the work queued on them is done.
+        """
+        with self._reload_lock:
+            try:
+                bundle = self.registry.load(version, mmap_mode='r' if self.mmap_model else None,
+                                            compact=self.compact_model, challengers=self.shadow.enabled)
+            except FileNotFoundError:
+                raise ValueError("Model not found. Please train the model first.")
+            if self.model_threads and hasattr(bundle.model, 'get_params') and 'n_jobs' in bundle.model.get_params():
+                bundle.model.set_params(n_jobs=self.model_threads)
+            for challenger in bundle.challengers.values():
+                if hasattr(challenger, 'get_params') and 'n_jobs' in challenger.get_params():
+                    challenger.set_params(n_jobs=1)  # Shadow scoring stays on its own thread
+
+            bundle.explanations = ExplanationEngine(None, bundle.data_processor,
+                                                    bundle.metadata.get('feature_means'),
+                                                    top_k=self.explanation_top_k,
+                                                    cache_size=self.explanation_cache_size,
+                                                    model_loader=lambda: bundle.full_model)
+            self._warm_up(bundle)
+            previous = self.bundle
+            self.bundle = bundle
+            # Keys include the version, clearing just frees the old entries early
+            self.cache.clear()
+            if previous is not None and previous.explanations is not None:
+                previous.explanations.shutdown()
+
+        self.logger.info(f"Loaded model bundle {bundle.version} ({bundle.metadata.get('model_name')}, "
+                         f"{type(bundle.model).__name__}), replacing {previous.version if previous else None}")
+        return bundle.version
+
+    def _warm_up(self, bundle: ModelBundle) -> None:
+        """Score sample leads with a new bundle before it takes traffic"""
+        sample_lead = bundle.sample_lead()
+        self._predict_with(bundle, [sample_lead], use_cache=False)
+        self._predict_with(bundle, [sample_lead] * 32, use_cache=False)
+        self._score_frame(bundle, pd.DataFrame([sample_lead] * 32))
+        for challenger in bundle.challengers.values():
+            challenger.predict_proba(bundle.data_processor.encode_lead(sample_lead))
+
+    def _get_bundle(self) -> ModelBundle:
+        bundle = self.bundle
+        if bundle is None:
             self.load_model()
+            bundle = self.bundle
+        return bundle
+
+    def _build_result(self, probability: float, version: str) -> Dict[str, Any]:
+        return build_result(probability, version, self.confidence_threshold)
+
+    def _cache_key(self, bundle: ModelBundle, lead_data: Dict[str, Any]) -> Optional[tuple]:
+        """Prediction cache key for a lead, or None when it cannot be cached"""
+        if not self.cache.enabled:
+            return None
+        key = feature_key(bundle, lead_data)
+        return (bundle.version,) + key if key is not None else None
+
+    def predict_lead(self, lead_data: Dict[str, Any], explain: bool = False,
+                     budget_ms: Optional[float] = None) -> Dict[str, Any]:
+        """Make a prediction for a single lead, optionally with its SHAP explanation"""
+        started = time.perf_counter()
+        bundle = self._get_bundle()
+        key = self._cache_key(bundle, lead_data)
+        if key is not None and not explain:
+            cached = self.cache.get(key)
+            CACHE_LOOKUPS.inc('miss' if cached is None else 'hit')
+            if cached is not None:
+                result = dict(cached)
+                self._log([lead_data], [result], started, 'single', bundle)
+                return result
 
-        # Convert input to DataFrame for processing
-        lead_df = pd.DataFrame([lead_data])
-        
         try:
             # Process the input data
-            processed_data = self.data_processor.transform_data(lead_df)
-            
+            stage_started = time.perf_counter()
+            processed_data = bundle.data_processor.encode_lead(lead_data)
+            STAGE_SECONDS.observe(time.perf_counter() - stage_started, 'preprocessing')
+
             # Make prediction
-            probability = self.model.predict_proba(processed_data)[0][1]
-            needs_review = not (probability > self.confidence_threshold or 
-                              probability < (1 - self.confidence_threshold))
-            
-            return {
-                'score': float(probability),
-                'prediction': probability > 0.5,
-                'needs_human_review': needs_review,
-                'confidence': abs(probability - 0.5) * 2  # Normalized to 0-1
-            }
-            
+            stage_started = time.perf_counter()
+            probability = bundle.model.predict_proba(processed_data)[0][1]
+            STAGE_SECONDS.observe(time.perf_counter() - stage_started, 'inference')
+            result = self._build_result(probability, bundle.version)
+            if key is not None:
+                self.cache.put(key, result)
+            result = dict(result)
+            if explain:
+                keys = [feature_key(bundle, lead_data)]
+                result['explanation'] = self._explain(bundle, processed_data, keys, budget_ms)[0]
+            shadow = [(processed_data, [0])] if self.shadow.active(bundle) else None
+            self._log([lead_data], [result], started, 'single', bundle, shadow)
+            return result
+
         except Exception as e:
+            PREDICTION_ERRORS.inc('single')
             return {
                 'error': str(e),
-                'needs_human_review': True
+                'needs_human_review': True,
+                'model_version': bundle.version
             }
 
+    def predict_leads(self, leads: List[Dict[str, Any]], source: str = 'single') -> List[Dict[str, Any]]:
+        """Make predictions for several lead dicts with a single model call"""
+        started = time.perf_counter()
+        bundle = self._get_bundle()
+        shadow = [] if self.shadow.active(bundle) else None
+        results = self._predict_with(bundle, leads, shadow=shadow)
+        self._log(leads, results, started, source, bundle, shadow)
+        return results
+
+    def _predict_with(self, bundle: ModelBundle, leads: List[Dict[str, Any]],
+                      use_cache: bool = True, shadow: Optional[list] = None) -> List[Dict[str, Any]]:
+        """Score lead dicts, appending ``(matrix, rows)`` of the freshly scored ones to ``shadow`` if given"""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(leads)
+        keys: List[Optional[tuple]] = [None] * len(leads)
+        rows, encoded = [], []
+        stage_started = time.perf_counter()
+        for i, lead_data in enumerate(leads):
+            keys[i] = self._cache_key(bundle, lead_data) if use_cache else None
+            if keys[i] is not None:
+                cached = self.cache.get(keys[i])
+                CACHE_LOOKUPS.inc('miss' if cached is None else 'hit')
+                if cached is not None:
+                    results[i] = dict(cached)
+                    continue
+            try:
+                encoded.append(bundle.data_processor.encode_lead(lead_data))
+                rows.append(i)
+            except Exception as e:
+                results[i] = {'error': str(e), 'needs_human_review': True, 'model_version': bundle.version}
+
+        STAGE_SECONDS.observe(time.perf_counter() - stage_started, 'preprocessing')
+
+        if rows:
+            try:
+                stage_started = time.perf_counter()
+                matrix = np.vstack(encoded)
+                probabilities = bundle.model.predict_proba(matrix)[:, 1]
+                STAGE_SECONDS.observe(time.perf_counter() - stage_started, 'inference')
+                if shadow is not None:
+                    shadow.append((matrix, rows))
+                for i, probability in zip(rows, probabilities):
+                    result = self._build_result(probability, bundle.version)
+                    if keys[i] is not None:
+                        self.cache.put(keys[i], result)
+                    results[i] = dict(result)
+            except Exception as e:
+                for i in rows:
+                    results[i] = {'error': str(e), 'needs_human_review': True, 'model_version': bundle.version}
+
+        return results
+
+    def predict_batch(self, leads: pd.DataFrame, include_explanation: bool = False,
+                      chunk_size: Optional[int] = None, budget_ms: Optional[float] = None,
+                      bundle: Optional[ModelBundle] = None) -> List[Dict[str, Any]]:
+        """Make predictions for a batch of leads, one transform per chunk.
+
+        Invalid rows get an error entry instead of failing the whole batch.
+        Results are returned in the same order as the input rows. Pass
+        ``bundle`` to keep scoring a multi-call request with one model
+        version across reloads.
+        """
+        started = time.perf_counter()
+        bundle = bundle or self._get_bundle()
+        shadow = [] if self.shadow.active(bundle) else None
+        results = self._score_frame(bundle, leads, include_explanation, chunk_size, budget_ms, shadow)
+        self._log(leads, results, started, 'batch', bundle, shadow)
+        return results
+
+    def _score_frame(self, bundle: ModelBundle, leads: pd.DataFrame, include_explanation: bool = False,
+                     chunk_size: Optional[int] = None, budget_ms: Optional[float] = None,
+                     shadow: Optional[list] = None) -> List[Dict[str, Any]]:
+        return score_frame(bundle, leads, include_explanation, chunk_size or self.batch_chunk_size,
+                           budget_ms if budget_ms is not None else self.explanation_budget_ms,
+                           self.confidence_threshold, shadow)
+
+    def _log(self, leads, results: List[Dict[str, Any]], started: float, source: str, bundle: ModelBundle,
+             shadow: Optional[list] = None) -> None:
+        """Assign prediction IDs, update the drift sketches and aggregates and queue the results for the log.
+
+        ``shadow`` holds the ``(matrix, rows)`` the scoring call collected for
+        shadow scoring; it is submitted once the results have their IDs.
+        """
+        latency_ms = (time.perf_counter() - started) * 1000
+        self._count(results, source)
+        try:
+            self.drift.observe(bundle, leads, results)
+        except Exception as e:
+            self.logger.error(f"Failed to update drift sketches: {str(e)}")
+        try:
+            self.aggregates.record_predictions(leads, results)
+        except Exception as e:
+            self.logger.error(f"Failed to update dashboard aggregates: {str(e)}")
+        try:
+            self.prediction_log.record(leads, results, latency_ms, source)
+        except Exception as e:
+            self.logger.error(f"Failed to log predictions: {str(e)}")
+        if shadow:
+            try:
+                self.shadow.submit(bundle, shadow, results, latency_ms / 1000)
+            except Exception as e:
+                self.logger.error(f"Failed to queue shadow scoring: {str(e)}")
+
+    @staticmethod
+    def _count(results: List[Dict[str, Any]], source: str) -> None:
+        """Update the prediction, error and human review counters"""
+        errors = sum(1 for result in results if 'error' in result)
+        review = sum(1 for result in results if 'error' not in result and result.get('needs_human_review'))
+        PREDICTIONS.inc(source, amount=len(results) - errors)
+        if errors:
+            PREDICTION_ERRORS.inc(source, amount=errors)
+        if review:
+            HUMAN_REVIEW.inc(source, amount=review)
+
+    def _explain(self, bundle: ModelBundle, processed_data: np.ndarray, keys: List[Optional[tuple]],
+                 budget_ms: Optional[float] = None) -> List[Optional[Dict[str, Any]]]:
+        """Explain transformed rows within the per-call or configured latency budget"""
+        budget_ms = budget_ms if budget_ms is not None else self.explanation_budget_ms
+        with STAGE_SECONDS.time('explanation'):
+            return bundle.explanations.explain(processed_data, keys, budget_ms)
+
+    def drift_report(self) -> Dict[str, Any]:
+        """Recent traffic compared with the current bundle's training snapshot"""
+        return self.drift.report(self._get_bundle())
+
+    def shadow_report(self, limit: int = 5000) -> Dict[str, Any]:
+        """Shadow scoring counters, and champion vs challengers on the ``limit`` newest labelled predictions"""
+        outcomes = self.feedback_store.recent_outcomes(limit)
+        scores = self.prediction_log.scores_with_shadow(list(outcomes))
+        return dict(self.shadow.stats(), challengers=sorted(self._get_bundle().challengers),
+                    comparison=compare_with_outcomes(scores, outcomes))
+
     def process_feedback(self, feedback_data: Dict[str, Any]) -> None:
-        """Process human feedback to improve the model"""
-        # In a production system, this would store feedback for model retraining
-        # For now, we'll just log it
-        print(f"Feedback received: {feedback_data}")
\ No newline at end of file
+        """Store human feedback for model retraining and count it in the dashboard aggregates.
+
+        The feedback UI and voice notes only send the prediction ID, so the
+        features and score of the prediction being rated are copied into the
+        record; without them it could not be exported as training data.
+        """
+        prediction = None
+        missing = [c for c in self.prediction_log.feature_columns if feedback_data.get(c) is None]
+        if feedback_data.get('prediction_id') and (missing or feedback_data.get('prediction_score') is None):
+            try:
+                prediction = self.prediction_log.get(feedback_data['prediction_id'])
+            except Exception as e:
+                self.logger.error(f"Failed to look up prediction for feedback: {str(e)}")
+        if prediction is not None:
+            feedback_data = dict(prediction['features'],
+                                 **{k: v for k, v in feedback_data.items() if v is not None})
+            feedback_data.setdefault('prediction_score', prediction['score'])
+            if prediction['lead_id'] is not None:
+                feedback_data.setdefault('lead_id', prediction['lead_id'])
+
+        self.feedback_store.add(feedback_data)
+        try:
+            self.aggregates.record_feedback(feedback_data, None, feedback_data.get('prediction_score'))
+        except Exception as e:
+            self.logger.error(f"Failed to update dashboard aggregates: {str(e)}")
+
+    def dashboard_stats(self, resolution: str = 'hour', periods: Optional[int] = None) -> Dict[str, Any]:
+        """Prediction and feedback breakdowns by segment for the last ``periods`` buckets"""
+        return self.aggregates.stats(resolution, periods)
@@ -0,0 +1,237 @@
+import itertools
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, Any, List, Optional, Sequence, Tuple, Union
+import pandas as pd
+from .storage import BatchWriter, ReadConnections
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS predictions (
+        prediction_id TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        model_version TEXT,
+        score REAL,
+        needs_human_review INTEGER,
+        latency_ms REAL,
+        source TEXT,
+        lead_id TEXT,
+        company_name TEXT,
+        features TEXT
+    )""",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_predictions_id ON predictions (prediction_id)",
+    "CREATE INDEX IF NOT EXISTS idx_predictions_created ON predictions (created_at, prediction_id)",
+    "CREATE INDEX IF NOT EXISTS idx_predictions_review ON predictions (needs_human_review, created_at, prediction_id)"
+]
+
+_COLUMNS = ['prediction_id', 'created_at', 'model_version', 'score', 'needs_human_review',
+            'latency_ms', 'source', 'lead_id', 'company_name', 'features']
+
+_INSERT = f"INSERT OR IGNORE INTO predictions ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})"
+
+# Challenger scores of shadow-scored predictions, one row per prediction and challenger
+_SHADOW_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS shadow_scores (
+        prediction_id TEXT NOT NULL,
+        model TEXT NOT NULL,
+        model_version TEXT,
+        score REAL,
+        created_at REAL NOT NULL
+    )""",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_shadow_scores_id ON shadow_scores (prediction_id, model)"
+]
+
+_SHADOW_INSERT = ("INSERT OR IGNORE INTO shadow_scores (prediction_id, model, model_version, score, created_at) "
+                  "VALUES (?, ?, ?, ?, ?)")
+
+_IDS_PER_QUERY = 500  # Prediction IDs bound per IN (...) lookup, well under SQLite's parameter limit
+
+class _PendingRecords:
+    """Scored leads waiting to be serialized on the writer thread"""
+    __slots__ = ('leads', 'results', 'rows', 'created_at', 'latency_ms', 'source')
+
+    def __init__(self, leads, results, rows, created_at, latency_ms, source):
+        self.leads = leads
+        self.results = results
+        self.rows = rows  # Positions of the successfully scored leads
+        self.created_at = created_at
+        self.latency_ms = latency_ms
+        self.source = source
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+class PredictionLog:
+    """Append-only log of every scored lead.
+
+    Request threads only assign a prediction ID and enqueue the scored
+    leads; rows are serialized and group-committed by a non-blocking
+    BatchWriter, which drops and counts entries rather than stalling a
+    request when its queue is full. Features are stored as a compact JSON
+    array in ``feature_columns`` order. A per-process ring buffer keeps the
+    newest records so they are visible before their commit lands, and pages
+    are keyset-paginated on ``(created_at, prediction_id)``, so a page costs
+    the same however large the log grows. Challenger scores from shadow
+    scoring go to a ``shadow_scores`` table through a second writer.
+    """
+
+    def __init__(self, db_path: str = 'data/predictions.db', feature_columns: Optional[List[str]] = None,
+                 ring_size: int = 1000, max_queue: int = 10000):
+        self.db_path = db_path
+        self.feature_columns = feature_columns or ['company_size', 'annual_revenue', 'num_employees',
+                                                   'industry', 'lead_source', 'past_interactions']
+        self._writer = BatchWriter(db_path, _INSERT, _SCHEMA, max_queue=max_queue, prepare=self._to_rows)
+        self._shadow_writer = BatchWriter(db_path, _SHADOW_INSERT, _SHADOW_SCHEMA, max_queue=max_queue)
+        self._reads = ReadConnections(db_path)
+        self._recent: deque = deque(maxlen=ring_size)
+        self._recent_lock = threading.Lock()
+        self._schema_ready = False
+        self._id_pid = None
+        self._id_prefix = None
+        self._id_counter = None
+
+    def new_prediction_id(self) -> str:
+        """Unique ID: a random per-process prefix plus a counter, much cheaper than uuid4 per row"""
+        if self._id_pid != os.getpid():
+            self._id_pid = os.getpid()
+            self._id_prefix = uuid.uuid4().hex[:16]
+            self._id_counter = itertools.count()
+        return f"{self._id_prefix}{next(self._id_counter):08x}"
+
+    @staticmethod
+    def _lead_at(leads: Union[Sequence[Dict[str, Any]], pd.DataFrame], i: int) -> Dict[str, Any]:
+        return leads.iloc[i].to_dict() if isinstance(leads, pd.DataFrame) else leads[i]
+
+    def _make_row(self, lead_data: Dict[str, Any], result: Dict[str, Any], created_at: float,
+                  latency_ms: float, source: str) -> tuple:
+        values = [lead_data.get(column) for column in self.feature_columns]
+        features = json.dumps([None if isinstance(v, float) and math.isnan(v) else v for v in values],
+                              separators=(',', ':'), default=str)
+        return (result['prediction_id'], created_at, result.get('model_version'), result['score'],
+                int(result['needs_human_review']), latency_ms, source,
+                lead_data.get('lead_id'), lead_data.get('company_name'), features)
+
+    def _to_rows(self, pending: _PendingRecords) -> List[tuple]:
+        if isinstance(pending.leads, pd.DataFrame):
+            columns = [c for c in self.feature_columns + ['lead_id', 'company_name'] if c in pending.leads.columns]
+            leads = pending.leads.iloc[pending.rows][columns].to_dict('records')
+        else:
+            leads = [pending.leads[i] for i in pending.rows]
+        return [self._make_row(lead, pending.results[i], pending.created_at, pending.latency_ms, pending.source)
+                for lead, i in zip(leads, pending.rows)]
+
+    def record(self, leads: Union[Sequence[Dict[str, Any]], pd.DataFrame], results: List[Dict[str, Any]],
+               latency_ms: float, source: str = 'single') -> None:
+        """Assign prediction IDs to successful results and queue them for the log"""
+        created_at = time.time()
+        rows = []
+        for i, result in enumerate(results):
+            if 'score' in result:
+                result['prediction_id'] = self.new_prediction_id()
+                rows.append(i)
+        if not rows:
+            return
+
+        pending = _PendingRecords(leads, results, rows, created_at, latency_ms, source)
+        with self._recent_lock:
+            self._recent.extend((pending, i) for i in rows[-self._recent.maxlen:])
+        self._writer.submit_many(pending, block=False)
+
+    def record_shadow(self, rows: List[tuple]) -> None:
+        """Queue ``(prediction_id, model, model_version, score, created_at)`` challenger scores"""
+        self._shadow_writer.submit_many(rows, block=False)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        return self._writer.flush(timeout) and self._shadow_writer.flush(timeout)
+
+    def _buffered_row(self, pending: _PendingRecords, i: int) -> tuple:
+        return self._make_row(self._lead_at(pending.leads, i), pending.results[i], pending.created_at,
+                              pending.latency_ms, pending.source)
+
+    def _row_to_dict(self, row) -> Dict[str, Any]:
+        record = dict(zip(_COLUMNS, row))
+        record['needs_human_review'] = bool(record['needs_human_review'])
+        record['features'] = dict(zip(self.feature_columns, json.loads(record['features'])))
+        return record
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        if not self._schema_ready:
+            self._writer.ensure_schema()
+            self._shadow_writer.ensure_schema()
+            self._schema_ready = True
+        return [tuple(row) for row in self._reads.query(sql, params)]
+
+    def get(self, prediction_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a prediction by ID, including ones not yet committed"""
+        with self._recent_lock:
+            buffered = [(p, i) for p, i in self._recent if p.results[i]['prediction_id'] == prediction_id]
+        if buffered:
+            return self._row_to_dict(self._buffered_row(*buffered[0]))
+        rows = self._query(f"SELECT {', '.join(_COLUMNS)} FROM predictions WHERE prediction_id = ?",
+                           (prediction_id,))
+        return self._row_to_dict(rows[0]) if rows else None
+
+    def recent(self, limit: int = 50, before: Optional[Tuple[float, str]] = None,
+               needs_human_review: Optional[bool] = None) -> Tuple[List[Dict[str, Any]], Optional[Tuple[float, str]]]:
+        """Newest predictions first, plus the cursor for the next page (None when exhausted)"""
+        conditions, params = [], []
+        if needs_human_review is not None:
+            conditions.append("needs_human_review = ?")
+            params.append(int(needs_human_review))
+        if before is not None:
+            conditions.append("(created_at, prediction_id) < (?, ?)")
+            params.extend(before)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        rows = self._query(f"SELECT {', '.join(_COLUMNS)} FROM predictions {where} "
+                           f"ORDER BY created_at DESC, prediction_id DESC LIMIT ?", tuple(params) + (limit,))
+
+        # Merge in this process's newest records, which may not be committed yet
+        with self._recent_lock:
+            buffered = list(self._recent)
+        candidates = []
+        for pending, i in buffered:
+            result = pending.results[i]
+            sort_key = (pending.created_at, result['prediction_id'])
+            if needs_human_review is not None and result['needs_human_review'] != needs_human_review:
+                continue
+            if before is not None and sort_key >= tuple(before):
+                continue
+            candidates.append((sort_key, pending, i))
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        rows.extend(self._buffered_row(pending, i) for _, pending, i in candidates[:limit])
+
+        merged = {row[0]: row for row in rows}
+        page = sorted(merged.values(), key=lambda row: (row[1], row[0]), reverse=True)[:limit]
+        next_cursor = (page[-1][1], page[-1][0]) if len(page) == limit else None
+        return [self._row_to_dict(row) for row in page], next_cursor
+
+    def scores_with_shadow(self, prediction_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Champion version and score plus any challenger scores of committed predictions, by ID"""
+        scores: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(prediction_ids), _IDS_PER_QUERY):
+            batch = tuple(prediction_ids[start:start + _IDS_PER_QUERY])
+            placeholders = ', '.join('?' * len(batch))
+            for prediction_id, model_version, score in self._query(
+                    f"SELECT prediction_id, model_version, score FROM predictions "
+                    f"WHERE prediction_id IN ({placeholders})", batch):
+                scores[prediction_id] = {'model_version': model_version, 'champion': score, 'challengers': {}}
+            for prediction_id, model, score in self._query(
+                    f"SELECT prediction_id, model, score FROM shadow_scores WHERE prediction_id IN ({placeholders})",
+                    batch):
+                if prediction_id in scores:
+                    scores[prediction_id]['challengers'][model] = score
+        return scores
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'queue_depth': self._writer.queue_depth,
+            'written': self._writer.written,
+            'dropped': self._writer.dropped,
+            'buffered': len(self._recent),
+            'shadow_written': self._shadow_writer.written,
+            'shadow_dropped': self._shadow_writer.dropped
+        }
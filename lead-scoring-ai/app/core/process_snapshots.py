@@ -0,0 +1,151 @@
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+def process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class ThreadShards:
+    """Per-thread dicts that are updated without a lock and merged on demand.
+
+    ``local()`` hands each thread a dict of its own. Once a thread has
+    exited, ``fold(retired, shard)`` adds its dict into one process-level
+    dict, so a server that starts a thread per request keeps a dict per
+    live thread rather than per thread it ever ran. ``fold`` must not
+    mutate values already in ``retired`` in place, as readers may hold
+    them. A forked child starts empty: the parent's values are not its own.
+    """
+
+    def __init__(self, fold: Callable[[dict, dict], None], on_new_thread: Optional[Callable[[], None]] = None):
+        self._fold = fold
+        self._on_new_thread = on_new_thread
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, dict]] = []
+        self._retired: dict = {}
+        self._prune_at = 64
+        self._lock = threading.Lock()
+
+    def local(self) -> dict:
+        """The calling thread's dict"""
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+                if len(self._shards) >= self._prune_at:
+                    self._prune()
+                    self._prune_at = max(64, 2 * len(self._shards))
+            if self._on_new_thread is not None:
+                self._on_new_thread()
+        return shard
+
+    def _prune(self) -> None:
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                self._fold(self._retired, shard)
+        self._shards = live
+
+    def shards(self) -> List[dict]:
+        """The retired dict followed by every live thread's dict"""
+        with self._lock:
+            self._prune()
+            return [self._retired] + [shard for _, shard in self._shards]
+
+class SnapshotFiles:
+    """Per-process JSON snapshots, ``<prefix>-<pid>.json`` in a directory shared by the workers.
+
+    Each process replaces its own file atomically, every ``interval``
+    seconds from a flusher thread started on first use in that process,
+    and reads the others' to cover the whole service. Parsed files are
+    cached until they change.
+    """
+
+    def __init__(self, directory: str, prefix: str, flush: Callable[[], None], interval: float):
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.flush = flush
+        self.interval = interval
+        self.logger = logging.getLogger(__name__)
+        self._cache: Dict[Path, Tuple[Tuple[int, int], Any]] = {}
+        self._flusher_pid = None
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self) -> None:
+        self._lock = threading.Lock()
+
+    def path(self, pid: Optional[int] = None) -> Path:
+        return self.directory / f"{self.prefix}-{pid or os.getpid()}.json"
+
+    def paths(self) -> Iterator[Tuple[int, Path]]:
+        """Every snapshot file with the pid that wrote it"""
+        for path in self.directory.glob(f'{self.prefix}-*.json'):
+            yield int(path.stem.rsplit('-', 1)[1]), path
+
+    def write(self, data: Any) -> None:
+        """Replace this process's snapshot"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path()
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def read_others(self, remove_dead: bool = True) -> List[Any]:
+        """The snapshots of every other process; with ``remove_dead`` those of exited processes are deleted"""
+        snapshots, seen = [], set()
+        for pid, path in self.paths():
+            if pid == os.getpid():
+                continue
+            if remove_dead and not process_alive(pid):
+                path.unlink(missing_ok=True)
+                continue
+            try:
+                stat = path.stat()
+                version = (stat.st_mtime_ns, stat.st_size)
+                cached = self._cache.get(path)
+                if cached is None or cached[0] != version:
+                    with open(path) as f:
+                        cached = self._cache[path] = (version, json.load(f))
+            except (OSError, ValueError):
+                continue
+            seen.add(path)
+            snapshots.append(cached[1])
+        for path in set(self._cache) - seen:
+            self._cache.pop(path, None)
+        return snapshots
+
+    def ensure_flusher(self) -> None:
+        """Start this process's flusher thread unless it is already running"""
+        if self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            threading.Thread(target=self._flush_loop, name=f'{self.prefix}-flush', daemon=True).start()
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                self.logger.warning(f"Failed to write {self.prefix} snapshot: {str(e)}")
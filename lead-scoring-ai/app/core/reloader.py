@@ -0,0 +1,99 @@
+import os
+import signal
+import threading
+import logging
+from typing import Optional
+from .prediction import LeadScorer
+
+class ModelReloader:
+    """Hot-swap the serving bundle when the registry's LATEST pointer moves.
+
+    Each worker process polls the pointer (and re-checks it on a signal), so
+    promoting a version through the admin endpoint or publishing a new
+    training run reaches every worker without a restart. The watcher is
+    restarted in processes forked after ``init_app``, e.g. gunicorn workers
+    of a preloaded app.
+    """
+
+    def __init__(self, scorer: LeadScorer):
+        self.scorer = scorer
+        self.poll_seconds = 0.0
+        self.logger = logging.getLogger(__name__)
+        self._requested_version = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._signal_name = None
+        self._fork_hook = False
+
+    def init_app(self, app) -> None:
+        """Start the registry watcher and install the reload signal handler"""
+        self.poll_seconds = app.config.get('MODEL_RELOAD_POLL_SECONDS', 0)
+        if self.poll_seconds > 0:
+            self.start()
+        if not self._fork_hook:
+            os.register_at_fork(after_in_child=self._after_fork)
+            self._fork_hook = True
+
+        self._signal_name = app.config.get('MODEL_RELOAD_SIGNAL')
+        self.install_signal_handler()
+
+    def install_signal_handler(self) -> None:
+        """Re-check the registry on the configured signal; servers that reset signals call this again"""
+        if self._signal_name and threading.current_thread() is threading.main_thread():
+            signal.signal(getattr(signal, self._signal_name), lambda signum, frame: self.check_in_background())
+
+    def _after_fork(self) -> None:
+        # Only the forking thread survives, along with whatever locks other threads held
+        self._lock = threading.Lock()
+        self._requested_version = None
+        self._thread = None
+        if self.poll_seconds > 0 and not self._stop.is_set():
+            self.start()
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name='model-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.check()
+            except Exception as e:
+                self.logger.error(f"Model watcher check failed: {str(e)}")
+
+    def check(self) -> Optional[str]:
+        """Reload if LATEST points at a version that is not being served"""
+        latest = self.scorer.registry.latest_version()
+        if latest is None or latest == self.scorer.model_version:
+            return None
+        return self.request_reload(latest)
+
+    def check_in_background(self) -> None:
+        threading.Thread(target=self.check, name='model-reload-check', daemon=True).start()
+
+    def request_reload(self, version: Optional[str] = None) -> Optional[str]:
+        """Reload the given (or latest) version unless that reload is already running"""
+        version = version or self.scorer.registry.latest_version()
+        with self._lock:
+            if version is None or version == self._requested_version:
+                return None
+            self._requested_version = version
+
+        def run():
+            try:
+                self.scorer.load_model(version)
+            except Exception as e:
+                self.logger.error(f"Model reload to {version} failed: {str(e)}")
+            finally:
+                with self._lock:
+                    if self._requested_version == version:
+                        self._requested_version = None
+
+        threading.Thread(target=run, name='model-reload', daemon=True).start()
+        return version
@@ -0,0 +1,231 @@
+import collections
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+import numpy as np
+from typing import Dict, Any, List, Tuple
+from sklearn.metrics import brier_score_loss, roc_auc_score
+
+def _metrics(outcomes: List[int], scores: List[float]) -> Dict[str, Any]:
+    return {
+        'labelled': len(outcomes),
+        'roc_auc': float(roc_auc_score(outcomes, scores)) if len(set(outcomes)) > 1 else None,
+        'brier': float(brier_score_loss(outcomes, scores)),
+        'mean_score': float(np.mean(scores))
+    }
+
+def compare_with_outcomes(scores: Dict[str, Dict[str, Any]], outcomes: Dict[str, int]) -> Dict[str, Any]:
+    """Champion and challenger ROC-AUC and Brier score per champion version, on the same labelled leads"""
+    by_version: Dict[str, List[Tuple[int, float, Dict[str, float]]]] = {}
+    for prediction_id, record in scores.items():
+        if record['challengers'] and prediction_id in outcomes:
+            by_version.setdefault(record['model_version'], []).append(
+                (int(outcomes[prediction_id]), record['champion'], record['challengers']))
+
+    report = {}
+    for version, rows in by_version.items():
+        challengers = {}
+        for name in sorted(set().union(*(row[2] for row in rows))):
+            scored = [row for row in rows if name in row[2]]
+            labels = [row[0] for row in scored]
+            challengers[name] = dict(_metrics(labels, [row[2][name] for row in scored]),
+                                     champion=_metrics(labels, [row[1] for row in scored]))
+        report[version] = {
+            'champion': _metrics([row[0] for row in rows], [row[1] for row in rows]),
+            'challengers': challengers
+        }
+    return report
+
+class ShadowScorer:
+    """Score a sample of live traffic with the bundle's challengers, off the request path.
+
+    Bundles keep the candidates that lost the selection as
+    ``bundle.challengers``; they take the same transformed features as the
+    champion. Once a request has been scored and logged, ``submit`` keeps
+    ``sample_rate`` of its leads and queues the champion's transformed rows.
+    ``workers`` threads pick them up every ``POLL_INTERVAL`` seconds, score
+    everything queued for a bundle with one call per challenger and write
+    the scores to the prediction log under the champion's prediction IDs.
+    The request only pays for sampling and an append.
+
+    Two limits keep shadow work from slowing the champion down. At most
+    ``max_pending`` leads wait at a time; leads beyond that are dropped and
+    counted. Challenger scoring may also use at most ``max_overhead``
+    seconds per second the champion spends scoring. Requests earn that much
+    credit (up to ``max_credit`` seconds), each queued lead reserves the
+    measured average cost of scoring one, the actual time is settled when
+    it is scored, and leads beyond what the credit covers are dropped.
+    Until the first lead has been scored there is no cost to reserve, so
+    leads are admitted one at a time. Time spent beyond the reservations
+    is carried as a debt of at most ``max_credit`` seconds.
+    ``stats()`` reports the time spent on both sides and the request-path
+    cost of submitting.
+    """
+
+    POLL_INTERVAL = 0.05
+    MAX_BATCH_ROWS = 1000
+
+    def __init__(self, prediction_log=None, sample_rate: float = 0.0, workers: int = 1, max_pending: int = 1000,
+                 max_overhead: float = 0.25, max_credit: float = 0.1):
+        self.prediction_log = prediction_log
+        self.sample_rate = sample_rate
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_overhead = max_overhead
+        self.max_credit = max_credit
+        self.logger = logging.getLogger(__name__)
+        self.submitted = 0
+        self.scored = 0
+        self.failed = 0
+        self.dropped_saturated = 0
+        self.dropped_budget = 0
+        self.champion_seconds = 0.0
+        self.shadow_seconds = 0.0
+        self.submit_seconds = 0.0
+        self.submit_calls = 0
+        self._credit = 0.0
+        self._cost_per_lead = 0.0  # Moving average of challenger seconds per lead, all challengers together
+        self._probing = False  # A lead is queued to measure the first cost
+        self._queue: collections.deque = collections.deque()
+        self._pending = 0
+        self._pid = None
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self) -> None:
+        # The parent's worker threads do not exist here
+        self._lock = threading.Lock()
+        self._queue = collections.deque()
+        self._pending = 0
+        self._probing = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 and self.prediction_log is not None
+
+    def active(self, bundle) -> bool:
+        """Whether requests scored with ``bundle`` should collect their rows for ``submit``"""
+        return self.enabled and bool(bundle.challengers)
+
+    def submit(self, bundle, batches: List[Tuple[np.ndarray, Any]], results: List[Dict[str, Any]],
+               champion_seconds: float) -> None:
+        """Queue a sample of the champion's transformed rows for the challengers; never blocks.
+
+        ``batches`` holds ``(matrix, rows)`` pairs: matrix row ``j`` holds the
+        features of ``results[rows[j]]``, which must carry a prediction ID.
+        """
+        started = time.perf_counter()
+        self._ensure_workers()
+        jobs = []
+        for matrix, rows in batches:
+            if self.sample_rate >= 1:
+                keep = range(len(rows))
+            elif len(rows) <= 64:
+                keep = [j for j in range(len(rows)) if random.random() < self.sample_rate]
+            else:
+                keep = np.flatnonzero(np.random.random(len(rows)) < self.sample_rate).tolist()
+            keep = [j for j in keep if 'prediction_id' in results[rows[j]]]
+            if keep:
+                jobs.append((matrix[keep] if len(keep) < len(matrix) else matrix,
+                             [results[rows[j]]['prediction_id'] for j in keep]))
+
+        created_at = time.time()
+        with self._lock:
+            self.champion_seconds += champion_seconds
+            self._credit = min(self._credit + champion_seconds * self.max_overhead, self.max_credit)
+            for matrix, prediction_ids in jobs:
+                # Keep the leads the credit and the queue have room for
+                n = len(prediction_ids)
+                if self._cost_per_lead > 0:
+                    affordable = max(0, int(self._credit / self._cost_per_lead))
+                else:
+                    affordable = 0 if self._probing else 1
+                room = max(0, self.max_pending - self._pending)
+                taken = min(n, affordable, room)
+                self.dropped_budget += n - min(n, affordable)
+                self.dropped_saturated += min(n, affordable) - taken
+                if taken:
+                    self._probing = self._probing or self._cost_per_lead <= 0
+                    estimate = self._cost_per_lead * taken
+                    self._credit -= estimate
+                    self._pending += taken
+                    self.submitted += taken
+                    self._queue.append((bundle, matrix[:taken], prediction_ids[:taken], created_at, estimate))
+            self.submit_seconds += time.perf_counter() - started
+            self.submit_calls += 1
+
+    def _ensure_workers(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                for i in range(self.workers):
+                    threading.Thread(target=self._run, name=f"shadow-{i}", daemon=True).start()
+
+    def _take(self) -> list:
+        """Queued jobs of one bundle, up to about ``MAX_BATCH_ROWS`` leads"""
+        with self._lock:
+            jobs, n_rows = [], 0
+            while self._queue and n_rows < self.MAX_BATCH_ROWS and \
+                    (not jobs or self._queue[0][0] is jobs[0][0]):
+                jobs.append(self._queue.popleft())
+                n_rows += len(jobs[-1][2])
+            return jobs
+
+    def _run(self) -> None:
+        while True:
+            jobs = self._take()
+            if not jobs:
+                time.sleep(self.POLL_INTERVAL)
+                continue
+            self._score(jobs)
+
+    def _score(self, jobs: list) -> None:
+        bundle = jobs[0][0]
+        matrix = jobs[0][1] if len(jobs) == 1 else np.vstack([job[1] for job in jobs])
+        prediction_ids = [prediction_id for job in jobs for prediction_id in job[2]]
+        created_at = [job[3] for job in jobs for _ in job[2]]
+        started = time.perf_counter()
+        try:
+            rows = []
+            for name, model in bundle.challengers.items():
+                scores = model.predict_proba(matrix)[:, 1]
+                rows.extend(zip(prediction_ids, itertools.repeat(name), itertools.repeat(bundle.version),
+                                scores.tolist(), created_at))
+            self.prediction_log.record_shadow(rows)
+            scored, failed = len(prediction_ids), 0
+        except Exception as e:
+            scored, failed = 0, len(prediction_ids)
+            self.logger.error(f"Shadow scoring of {len(prediction_ids)} leads failed: {str(e)}")
+        seconds = time.perf_counter() - started
+        with self._lock:
+            self._credit = max(self._credit + sum(job[4] for job in jobs) - seconds, -self.max_credit)
+            cost = seconds / len(prediction_ids)
+            self._cost_per_lead = cost if self._probing else self._cost_per_lead + 0.2 * (cost - self._cost_per_lead)
+            self._probing = False
+            self.shadow_seconds += seconds
+            self.scored += scored
+            self.failed += failed
+            self._pending -= len(prediction_ids)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'sample_rate': self.sample_rate,
+                'submitted': self.submitted,
+                'scored': self.scored,
+                'failed': self.failed,
+                'dropped_saturated': self.dropped_saturated,
+                'dropped_budget': self.dropped_budget,
+                'pending': self._pending,
+                'champion_seconds': round(self.champion_seconds, 6),
+                'shadow_seconds': round(self.shadow_seconds, 6),
+                'overhead': self.shadow_seconds / self.champion_seconds if self.champion_seconds else None,
+                'max_overhead': self.max_overhead,
+                'submit_us': self.submit_seconds / self.submit_calls * 1e6 if self.submit_calls else None
+            }
@@ -0,0 +1,180 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+import atexit
+import logging
+from pathlib import Path
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+class StoreOverloadedError(RuntimeError):
+    """Raised when a store's write queue stays full for longer than the put timeout"""
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """Open a SQLite connection tuned for many concurrent appenders"""
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30.0)
+    deadline = time.monotonic() + 30.0
+    while True:
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            break
+        except sqlite3.OperationalError:
+            # Switching a new database to WAL fails at once, without the busy timeout, while another process does
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.01)
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA busy_timeout=30000')
+    return conn
+
+class BatchWriter:
+    """Group-commit rows to SQLite from a background thread.
+
+    Request threads only enqueue tuples; the writer drains up to
+    ``batch_size`` rows per transaction. At most ``max_queue`` rows wait,
+    however they are grouped into entries (a single larger entry is let
+    into an empty queue), and ``submit`` blocks for at most
+    ``put_timeout`` seconds before raising ``StoreOverloadedError``, which
+    pushes back on callers instead of growing memory. Non-blocking submits
+    drop the rows and count them instead. An optional ``prepare`` callable
+    turns each queued entry into rows on the writer thread, keeping
+    serialization off the request path. Each process (e.g. every gunicorn
+    worker) runs its own writer; SQLite's WAL mode and busy timeout
+    serialize them safely.
+    """
+
+    def __init__(self, db_path: str, insert_sql: str, schema: Iterable[str] = (),
+                 max_queue: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 0.05, put_timeout: float = 0.1,
+                 prepare: Optional[Callable[[Any], List[tuple]]] = None):
+        self.db_path = db_path
+        self.prepare = prepare
+        self.insert_sql = insert_sql
+        self.schema = list(schema)
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.logger = logging.getLogger(__name__)
+        self.written = 0
+        self.dropped = 0
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._queued_rows = 0
+        self._space = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        atexit.register(self.flush, 5.0)
+
+    def ensure_schema(self) -> None:
+        conn = connect(self.db_path)
+        try:
+            with conn:
+                for statement in self.schema:
+                    conn.execute(statement)
+        finally:
+            conn.close()
+
+    def submit(self, row: tuple, block: bool = True) -> bool:
+        """Queue a row for the next group commit"""
+        return self.submit_many([row], block)
+
+    def submit_many(self, rows, block: bool = True) -> bool:
+        """Queue rows (or a sized entry for ``prepare``) at once; returns False if dropped"""
+        self._ensure_thread()
+        n_rows = len(rows)
+        with self._space:
+            fits = self._fits(n_rows) or (block and self._space.wait_for(lambda: self._fits(n_rows), self.put_timeout))
+            if not fits:
+                self.dropped += n_rows
+                if block:
+                    raise StoreOverloadedError(f"Write queue for {self.db_path} is full")
+                return False
+            self._queued_rows += n_rows
+        self._queue.put(rows)
+        return True
+
+    def _fits(self, n_rows: int) -> bool:
+        return self._queued_rows == 0 or self._queued_rows + n_rows <= self.max_queue
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until every queued row has been committed"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    @property
+    def queue_depth(self) -> int:
+        """Rows waiting to be committed"""
+        return self._queued_rows
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                if self._pid is not None:  # Forked: the parent's thread and queue are gone
+                    self._queue = queue.Queue()
+                    self._queued_rows = 0
+                    self._space = threading.Condition()
+                self.ensure_schema()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+                self._thread.start()
+
+    def _drain(self) -> List[List[tuple]]:
+        entries = [self._queue.get()]
+        n_rows = len(entries[0])
+        deadline = time.monotonic() + self.flush_interval
+        while n_rows < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                entries.append(self._queue.get(timeout=remaining) if remaining > 0
+                               else self._queue.get_nowait())
+            except queue.Empty:
+                break
+            n_rows += len(entries[-1])
+        return entries
+
+    def _run(self) -> None:
+        conn = connect(self.db_path)
+        while True:
+            entries = self._drain()
+            try:
+                rows = [row for entry in entries
+                        for row in (self.prepare(entry) if self.prepare else entry)]
+                with conn:
+                    conn.executemany(self.insert_sql, rows)
+                self.written += len(rows)
+            except Exception as e:
+                self.logger.error(f"Failed to write {len(entries)} queued entries to {self.db_path}: {str(e)}")
+            finally:
+                with self._space:
+                    self._queued_rows -= sum(len(entry) for entry in entries)
+                    self._space.notify_all()
+                for _ in entries:
+                    self._queue.task_done()
+
+class ReadConnections:
+    """Per-thread, per-process read connections to a SQLite database"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def get(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def query(self, sql: str, params: Tuple = ()) -> List[sqlite3.Row]:
+        return self.get().execute(sql, params).fetchall()
@@ -0,0 +1,218 @@
+import os
+import io
+import json
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+NUMERIC_DTYPE = np.float32  # NaN marks missing values, so numerics cannot be int32
+WIDE_NUMERIC_DTYPE = np.float64  # float32 drops whole units above 2**24 (about 16.7M)
+CODE_DTYPE = np.int16  # Category codes, -1 marks a missing category
+LABEL_DTYPE = np.int8
+
+_PREFIX_BYTES = 64 * 1024  # Fingerprint of the file start, to notice a rewritten CSV
+
+class _BoundedReader(io.RawIOBase):
+    """File reader that stops after ``limit`` bytes, so a half-written last line is never parsed"""
+
+    def __init__(self, f, limit: int):
+        self._f = f
+        self._remaining = limit
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = min(len(buffer), self._remaining)
+        if n <= 0:
+            return 0
+        data = self._f.read(n)
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+class TrainingDataCache:
+    """Columnar, memory-mapped cache of a training CSV.
+
+    Only the feature columns and the label are read, in chunks and with
+    compact dtypes: float32 numerics (float64 for ``wide_columns`` such as
+    revenue, which exceed float32's exact range), int16 category codes and
+    an int8 label. Each column is appended to a raw ``.bin`` file that is
+    memory-mapped on read. The manifest records how many bytes of the CSV
+    have been ingested, so ``refresh`` only parses rows appended since the
+    last run and rebuilds from scratch when the start of the file changed.
+    """
+
+    MANIFEST_FILE = 'manifest.json'
+
+    def __init__(self, csv_path: str, cache_dir: str = 'data/cache', numeric_columns: Optional[List[str]] = None,
+                 categorical_columns: Optional[List[str]] = None, label_column: str = 'converted',
+                 chunk_size: int = 100000, wide_columns: Optional[List[str]] = None):
+        self.csv_path = Path(csv_path)
+        source_id = hashlib.sha256(str(self.csv_path.resolve()).encode()).hexdigest()[:8]
+        self.cache_dir = Path(cache_dir) / f"{self.csv_path.stem}-{source_id}"
+        self.numeric_columns = numeric_columns or ['company_size', 'annual_revenue', 'num_employees',
+                                                   'past_interactions']
+        self.categorical_columns = categorical_columns or ['industry', 'lead_source']
+        self.wide_columns = ['annual_revenue'] if wide_columns is None else wide_columns
+        self.label_column = label_column
+        self.chunk_size = chunk_size
+        self.logger = logging.getLogger(__name__)
+        self.manifest: Optional[Dict[str, Any]] = None
+
+    @property
+    def feature_columns(self) -> List[str]:
+        return self.numeric_columns + self.categorical_columns
+
+    def _dtypes(self) -> Dict[str, Any]:
+        dtypes = {column: WIDE_NUMERIC_DTYPE if column in self.wide_columns else NUMERIC_DTYPE
+                  for column in self.numeric_columns}
+        dtypes.update({column: CODE_DTYPE for column in self.categorical_columns})
+        dtypes[self.label_column] = LABEL_DTYPE
+        return dtypes
+
+    def _column_path(self, column: str) -> Path:
+        return self.cache_dir / f"{column}.bin"
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.cache_dir / self.MANIFEST_FILE) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        tmp_path = self.cache_dir / f".{self.MANIFEST_FILE}.{os.getpid()}"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.cache_dir / self.MANIFEST_FILE)
+        self.manifest = manifest
+
+    def _source_state(self) -> Dict[str, Any]:
+        """Header, prefix fingerprint and the byte offset just past the last complete line"""
+        with open(self.csv_path, 'rb') as f:
+            prefix = f.read(_PREFIX_BYTES)
+            header = prefix.split(b'\n', 1)[0].decode().strip().split(',')
+            size = f.seek(0, io.SEEK_END)
+            end = size
+            while end > 0:
+                block = min(end, _PREFIX_BYTES)
+                f.seek(end - block)
+                newline = f.read(block).rfind(b'\n')
+                if newline != -1:
+                    end = end - block + newline + 1
+                    break
+                end -= block
+        return {'header': header, 'end': end, 'prefix_hash': hashlib.sha256(prefix).hexdigest(),
+                'prefix_length': len(prefix)}
+
+    def _is_prefix_unchanged(self, manifest: Dict[str, Any]) -> bool:
+        with open(self.csv_path, 'rb') as f:
+            prefix = f.read(manifest['prefix_length'])
+        return hashlib.sha256(prefix).hexdigest() == manifest['prefix_hash']
+
+    def refresh(self) -> int:
+        """Ingest rows appended to the CSV since the last refresh; returns the number of new rows"""
+        state = self._source_state()
+        manifest = self._read_manifest()
+        dtypes = {column: np.dtype(dtype).name for column, dtype in self._dtypes().items()}
+        if (manifest is None or manifest['header'] != state['header'] or state['end'] < manifest['offset']
+                or manifest['dtypes'] != dtypes or not self._is_prefix_unchanged(manifest)):
+            missing = set(self.feature_columns + [self.label_column]) - set(state['header'])
+            if missing:
+                raise ValueError(f"Missing required columns: {missing}")
+            self.logger.info(f"Building training data cache for {self.csv_path} in {self.cache_dir}")
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            for column in self._dtypes():
+                self._column_path(column).write_bytes(b'')
+            with open(self.csv_path, 'rb') as f:
+                header_end = len(f.readline())
+            manifest = {
+                'source': str(self.csv_path),
+                'header': state['header'],
+                'offset': header_end,
+                'n_rows': 0,
+                'dtypes': dtypes,
+                'categories': {column: [] for column in self.categorical_columns}
+            }
+        # Drop rows appended by a run that died before updating the manifest
+        for column, dtype in self._dtypes().items():
+            with open(self._column_path(column), 'r+b') as f:
+                f.truncate(manifest['n_rows'] * np.dtype(dtype).itemsize)
+
+        new_rows = 0
+        if state['end'] > manifest['offset']:
+            new_rows = self._ingest(manifest, manifest['offset'], state['end'])
+        manifest.update(offset=state['end'], n_rows=manifest['n_rows'] + new_rows,
+                        prefix_hash=state['prefix_hash'], prefix_length=state['prefix_length'])
+        self._write_manifest(manifest)
+        if new_rows:
+            self.logger.info(f"Ingested {new_rows} new rows from {self.csv_path} ({manifest['n_rows']} cached)")
+        return new_rows
+
+    def _ingest(self, manifest: Dict[str, Any], start: int, end: int) -> int:
+        """Parse CSV bytes [start, end) in chunks and append them to the column files"""
+        usecols = self.feature_columns + [self.label_column]
+        dtypes = self._dtypes()
+        read_dtypes = {column: dtypes[column] for column in self.numeric_columns}
+        read_dtypes.update({column: 'category' for column in self.categorical_columns})
+        read_dtypes[self.label_column] = LABEL_DTYPE
+        vocabularies = {column: {value: code for code, value in enumerate(manifest['categories'][column])}
+                        for column in self.categorical_columns}
+
+        n_rows = 0
+        with open(self.csv_path, 'rb') as raw:
+            raw.seek(start)
+            reader = pd.read_csv(io.BufferedReader(_BoundedReader(raw, end - start)), header=None,
+                                 names=manifest['header'], usecols=usecols, dtype=read_dtypes,
+                                 chunksize=self.chunk_size)
+            for chunk in reader:
+                columns = {column: chunk[column].to_numpy(dtypes[column]) for column in self.numeric_columns}
+                for column in self.categorical_columns:
+                    values = chunk[column].cat
+                    vocabulary = vocabularies[column]
+                    for category in values.categories:
+                        if category not in vocabulary:
+                            vocabulary[category] = len(vocabulary)
+                            manifest['categories'][column].append(category)
+                    # Chunk-local codes -> cache-wide codes, keeping -1 for missing
+                    mapping = np.array([vocabulary[c] for c in values.categories] + [-1], dtype=CODE_DTYPE)
+                    columns[column] = mapping[values.codes]
+                columns[self.label_column] = chunk[self.label_column].to_numpy(LABEL_DTYPE)
+                for column, values in columns.items():
+                    with open(self._column_path(column), 'ab') as f:
+                        f.write(np.ascontiguousarray(values).tobytes())
+                n_rows += len(chunk)
+        return n_rows
+
+    def __len__(self) -> int:
+        manifest = self.manifest or self._read_manifest()
+        return manifest['n_rows'] if manifest else 0
+
+    def column(self, column: str) -> np.ndarray:
+        """Memory-mapped column values (category codes for categorical columns)"""
+        manifest = self.manifest or self._read_manifest()
+        dtype = np.dtype(manifest['dtypes'][column])
+        if manifest['n_rows'] == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._column_path(column), dtype=dtype, mode='r', shape=(manifest['n_rows'],))
+
+    def frame(self, rows=None) -> pd.DataFrame:
+        """Features as a compact DataFrame (compact numerics, categorical strings) for the given rows"""
+        manifest = self.manifest or self._read_manifest()
+        data = {}
+        for column in self.feature_columns:
+            values = self.column(column)
+            values = values[rows] if rows is not None else values
+            if column in self.categorical_columns:
+                data[column] = pd.Categorical.from_codes(values, categories=manifest['categories'][column])
+            else:
+                data[column] = np.asarray(values)
+        return pd.DataFrame(data)
+
+    def labels(self, rows=None) -> pd.Series:
+        values = self.column(self.label_column)
+        return pd.Series(np.asarray(values[rows] if rows is not None else values), name=self.label_column)
@@ -0,0 +1,155 @@
+import io
+import os
+import threading
+import time
+import uuid
+import wave
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+from .storage import StoreOverloadedError, connect
+
+_SCHEMA = """CREATE TABLE IF NOT EXISTS transcription_jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    user_id TEXT,
+    prediction_id TEXT,
+    duration REAL,
+    transcription TEXT,
+    error TEXT
+)"""
+
+class InvalidAudioError(ValueError):
+    """Raised when an upload is not a readable WAV file or is too long"""
+
+def wav_duration(audio: bytes) -> float:
+    """Duration in seconds, read from the WAV header without decoding any samples"""
+    try:
+        with wave.open(io.BytesIO(audio), 'rb') as f:
+            return f.getnframes() / float(f.getframerate())
+    except (wave.Error, EOFError, ZeroDivisionError):
+        raise InvalidAudioError("Upload is not a readable WAV file")
+
+class TranscriptionQueue:
+    """Background transcription of voice feedback.
+
+    Uploads are validated from the WAV header, kept in memory and handed to
+    a small thread pool, so the upload request returns at once with a job
+    ID. Job status lives in SQLite so any worker can answer a status poll.
+    Finished transcriptions are written to the feedback store. The number
+    of queued uploads is bounded; ``submit`` raises StoreOverloadedError
+    when it is reached.
+    """
+
+    def __init__(self, voice_service, scorer, db_path: str = 'data/transcriptions.db',
+                 max_workers: int = 2, max_pending: int = 32, max_duration: float = 30.0):
+        self.voice_service = voice_service
+        self.scorer = scorer
+        self.db_path = db_path
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_duration = max_duration
+        self.logger = logging.getLogger(__name__)
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._schema_ready = False
+
+    def init_app(self, app) -> None:
+        """Configure the queue from the Flask app config"""
+        self.db_path = app.config.get('TRANSCRIPTION_DB_PATH', self.db_path)
+        self.max_workers = app.config.get('TRANSCRIPTION_WORKERS', self.max_workers)
+        self.max_pending = app.config.get('TRANSCRIPTION_MAX_PENDING', self.max_pending)
+        self.max_duration = app.config.get('VOICE_FEEDBACK_MAX_SECONDS', self.max_duration)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            if not self._schema_ready:
+                with conn:
+                    conn.execute(_SCHEMA)
+                self._schema_ready = True
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _ensure_executor(self) -> None:
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix='transcription')
+                    self._pending = 0
+                    self._pid = os.getpid()
+
+    def _update(self, job_id: str, **fields) -> None:
+        fields['updated_at'] = time.time()
+        assignments = ', '.join(f"{column} = ?" for column in fields)
+        with self._conn() as conn:
+            conn.execute(f"UPDATE transcription_jobs SET {assignments} WHERE job_id = ?",
+                         tuple(fields.values()) + (job_id,))
+
+    def submit(self, audio: bytes, prediction_id: str, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Validate an upload and queue it; returns the new job"""
+        duration = wav_duration(audio)
+        if duration > self.max_duration:
+            raise InvalidAudioError(f"Audio is {duration:.1f}s long, the limit is {self.max_duration:.0f}s")
+
+        self._ensure_executor()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise StoreOverloadedError("Transcription queue is full")
+            self._pending += 1
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        try:
+            with self._conn() as conn:
+                conn.execute("INSERT INTO transcription_jobs (job_id, status, created_at, updated_at, user_id, "
+                             "prediction_id, duration) VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                             (job_id, now, now, user_id, prediction_id, duration))
+            self._executor.submit(self._run, job_id, audio, prediction_id, user_id)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        return {'job_id': job_id, 'status': 'queued', 'duration': duration}
+
+    def _run(self, job_id: str, audio: bytes, prediction_id: str, user_id: Optional[str]) -> None:
+        try:
+            self._update(job_id, status='running')
+            text, _ = self.voice_service.speech_to_text(io.BytesIO(audio))
+            if text is None:
+                self._update(job_id, status='failed', error='Speech could not be transcribed')
+                return
+
+            self.scorer.process_feedback({
+                'prediction_id': prediction_id,
+                'feedback_text': text,
+                'user_id': user_id,
+                'transcription_job_id': job_id
+            })
+            self._update(job_id, status='done', transcription=text)
+        except Exception as e:
+            self.logger.error(f"Transcription job {job_id} failed: {str(e)}")
+            try:
+                self._update(job_id, status='failed', error=str(e))
+            except Exception:
+                pass
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM transcription_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {'pending': self._pending, 'max_pending': self.max_pending, 'workers': self.max_workers}
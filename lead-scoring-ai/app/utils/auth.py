@@ -1,11 +1,15 @@
-from flask_jwt_extended import JWTManager, create_access_token, verify_jwt_in_request
+from flask_jwt_extended import JWTManager, create_access_token, verify_jwt_in_request, get_jwt, get_jwt_identity
 from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
-from flask import jsonify
+from datetime import timedelta
+from flask import current_app, jsonify, request
+from typing import Optional
 import os
 
 jwt = JWTManager()
 
+FEEDBACK_SCOPE = "feedback"
+
 # In a real application, this would be in a database
 users = {
     "admin": {
@@ -40,6 +44,34 @@ def analyst_required(fn):
         return fn(*args, **kwargs)
     return wrapper
 
+def create_feedback_token(prediction_id: str) -> str:
+    """Issue a 24-hour token that can only submit feedback on one prediction"""
+    return create_access_token(identity="feedback",
+                               additional_claims={"scope": FEEDBACK_SCOPE, "prediction_id": prediction_id},
+                               expires_delta=timedelta(hours=24))
+
+def accepts_feedback_token(fn):
+    """Let a JWT-protected view also be called with a feedback token"""
+    fn.accepts_feedback_token = True
+    return fn
+
+def feedback_token_prediction_id() -> Optional[str]:
+    """Prediction the current request's feedback token is limited to, or None for a user token"""
+    claims = get_jwt()
+    return claims.get("prediction_id") if claims.get("scope") == FEEDBACK_SCOPE else None
+
+@jwt.token_verification_loader
+def _check_token_scope(jwt_header, jwt_data) -> bool:
+    # Feedback tokens are only good for the views that opt in
+    if jwt_data.get("scope") != FEEDBACK_SCOPE:
+        return True
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, "accepts_feedback_token", False)
+
+@jwt.token_verification_failed_loader
+def _token_scope_failed(jwt_header, jwt_data):
+    return jsonify({"error": "Token not valid for this endpoint"}), 403
+
 def setup_auth(app):
     """Configure authentication for the application"""
     app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET", "super-secret-key")
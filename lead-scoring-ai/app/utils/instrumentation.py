@@ -0,0 +1,88 @@
+import cProfile
+import logging
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+from flask import Response, g, request
+from app.core.metrics import REQUEST_SECONDS, REQUESTS, metrics
+
+class RequestInstrumentation:
+    """Per-endpoint latency metrics, the ``/metrics`` route and sampled profiling.
+
+    Every request's latency and status are recorded against its Flask
+    endpoint. With ``profile_sample_rate`` above zero, that fraction of
+    requests runs under cProfile (one at a time per process, since the
+    profiler is process-wide on newer Pythons) and the profile is written to
+    ``profile_dir`` when the request took at least ``profile_slow_ms``.
+    Load a profile with ``python -m pstats <file>``.
+    """
+
+    def __init__(self, profile_sample_rate: float = 0.0, profile_slow_ms: float = 1000.0,
+                 profile_dir: str = 'logs/profiles'):
+        self.profile_sample_rate = profile_sample_rate
+        self.profile_slow_ms = profile_slow_ms
+        self.profile_dir = Path(profile_dir)
+        self.logger = logging.getLogger(__name__)
+        self._profiling = threading.Lock()
+
+    def init_app(self, app) -> None:
+        metrics.init_app(app)
+        self.profile_sample_rate = app.config.get('PROFILE_SAMPLE_RATE', self.profile_sample_rate)
+        self.profile_slow_ms = app.config.get('PROFILE_SLOW_REQUEST_MS', self.profile_slow_ms)
+        self.profile_dir = Path(app.config.get('PROFILE_DIR', self.profile_dir))
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        if app.config.get('METRICS_ENABLED', True):
+            app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+    @staticmethod
+    def metrics_view() -> Response:
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    def _before_request(self) -> None:
+        g.request_started = time.perf_counter()
+        if self.profile_sample_rate > 0 and random.random() < self.profile_sample_rate \
+                and self._profiling.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # Another profiler is active
+                self._profiling.release()
+                return
+            g.request_profiler = profiler
+
+    def _after_request(self, response: Response) -> Response:
+        started = g.pop('request_started', None)
+        if started is not None:
+            duration = time.perf_counter() - started
+            endpoint = request.endpoint or 'unmatched'
+            REQUEST_SECONDS.observe(duration, endpoint)
+            REQUESTS.inc(endpoint, str(response.status_code))
+            self._finish_profile(duration * 1000, endpoint)
+        return response
+
+    def _teardown_request(self, exc: Optional[BaseException]) -> None:
+        # after_request is skipped when the view raised
+        self._finish_profile(None, request.endpoint or 'unmatched')
+
+    def _finish_profile(self, duration_ms: Optional[float], endpoint: str) -> None:
+        profiler = g.pop('request_profiler', None)
+        if profiler is None:
+            return
+        try:
+            profiler.disable()
+            if duration_ms is not None and duration_ms >= self.profile_slow_ms:
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                path = self.profile_dir / f"{int(time.time() * 1000)}-{endpoint}-{os.getpid()}.prof"
+                profiler.dump_stats(str(path))
+                self.logger.warning(f"Profiled slow request to {endpoint} ({duration_ms:.0f}ms): {path}")
+        except Exception as e:
+            self.logger.warning(f"Failed to save request profile: {str(e)}")
+        finally:
+            self._profiling.release()
+
+request_instrumentation = RequestInstrumentation()
@@ -1,55 +1,194 @@
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from functools import wraps
 from flask import request
+from pathlib import Path
+from typing import Dict, Any, Optional
+import atexit
+import datetime
 import json
+import os
+import queue
+import random
+import threading
 import time
 
+REQUEST_LOGGER = 'lead_scoring.requests'
+PACKAGE_LOGGER = __name__.split('.')[0]
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any structured ``fields`` merged in"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class _PipelineQueueHandler(QueueHandler):
+    """Hands records to the pipeline, only resolving the message on the calling thread"""
+
+    def __init__(self, pipeline: 'LogPipeline'):
+        super().__init__(None)
+        self.pipeline = pipeline
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Tracebacks and message args must be rendered before the record changes threads
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self.pipeline.enqueue(record)
+
+class _PipelineListener(QueueListener):
+    def prepare(self, record):
+        if isinstance(record, tuple):  # Request record: (created, level, fields)
+            created, level, fields = record
+            record = logging.makeLogRecord({'name': REQUEST_LOGGER, 'levelno': level,
+                                            'levelname': logging.getLevelName(level), 'msg': 'request',
+                                            'created': created, 'fields': fields})
+        return record
+
+class LogPipeline:
+    """Queue-backed logging: request threads enqueue, a listener thread formats and writes.
+
+    Records are dropped (and counted) rather than blocking once
+    ``max_queue`` of them are waiting. A QueueListener formats them as JSON
+    lines for the rotating file and the console. Request records skip the
+    ``logging`` machinery entirely: the request thread only enqueues a
+    tuple, and the LogRecord is built on the listener thread. The queue and
+    listener are recreated after a fork.
+    """
+
+    def __init__(self, max_queue: int = 10000):
+        self.max_queue = max_queue
+        self.level = logging.INFO
+        self.request_level = logging.INFO
+        self.sample_rate = 1.0
+        self.slow_request_ms = 1000.0
+        self.log_bodies = False
+        self.body_max_bytes = 1024
+        self.dropped = 0
+        self.handlers = []
+        self._queue = None
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        self.level = logging.getLevelName(app.config.get('LOG_LEVEL', 'INFO'))
+        self.request_level = logging.getLevelName(app.config.get('LOG_REQUEST_LEVEL', 'INFO'))
+        self.sample_rate = app.config.get('LOG_REQUEST_SAMPLE_RATE', self.sample_rate)
+        self.slow_request_ms = app.config.get('LOG_SLOW_REQUEST_MS', self.slow_request_ms)
+        self.log_bodies = app.config.get('LOG_REQUEST_BODIES', self.log_bodies)
+        self.body_max_bytes = app.config.get('LOG_BODY_MAX_BYTES', self.body_max_bytes)
+        self.max_queue = app.config.get('LOG_QUEUE_SIZE', self.max_queue)
+
+        formatter = JsonFormatter()
+        log_file = Path(app.config.get('LOG_FILE', 'logs/lead_scoring.log'))
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        file_handler = RotatingFileHandler(log_file, maxBytes=1000000, backupCount=10)
+        console_handler = logging.StreamHandler()
+        for handler in (file_handler, console_handler):
+            handler.setFormatter(formatter)
+            handler.setLevel(self.level)
+        self.handlers = [file_handler, console_handler]
+
+        # The package logger covers every module logger (app.core.*, app.utils.*) through propagation
+        handler = _PipelineQueueHandler(self)
+        for logger in {app.logger, logging.getLogger(PACKAGE_LOGGER), logging.getLogger(REQUEST_LOGGER)}:
+            logger.handlers = [handler]
+            logger.setLevel(self.level)
+            logger.propagate = False
+        atexit.register(self.stop)
+
+    def _ensure_listener(self) -> None:
+        if self._listener is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener is None or self._pid != os.getpid():
+                self._queue = queue.SimpleQueue()
+                self._listener = _PipelineListener(self._queue, *self.handlers, respect_handler_level=True)
+                self._listener.start()
+                self._pid = os.getpid()
+
+    def enqueue(self, record) -> None:
+        self._ensure_listener()
+        if self._queue.qsize() >= self.max_queue:
+            self.dropped += 1
+        else:
+            self._queue.put(record)
+
+    def should_log(self, status: int, duration_ms: float) -> Optional[int]:
+        """Level to log a request at, or None when it is gated or sampled out"""
+        if status >= 500 or duration_ms >= self.slow_request_ms:
+            level = logging.WARNING
+        elif status >= 400:
+            level = logging.INFO
+        else:
+            if self.request_level > logging.INFO:
+                return None
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return None
+            return logging.INFO
+        return level if level >= self.request_level else None
+
+    def log_request(self, level: int, fields: Dict[str, Any]) -> None:
+        if not self.handlers:  # Not configured, e.g. outside the app factory
+            return
+        self.enqueue((time.time(), level, fields))
+
+    def stop(self) -> None:
+        """Drain the queue and stop the listener thread"""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+
+log_pipeline = LogPipeline()
+
 def configure_logging(app):
     """Configure application logging"""
-    formatter = logging.Formatter(
-        '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-    )
-    
-    # File handler (rotating logs)
-    file_handler = RotatingFileHandler(
-        'logs/lead_scoring.log',
-        maxBytes=1000000,
-        backupCount=10
-    )
-    file_handler.setFormatter(formatter)
-    file_handler.setLevel(logging.INFO)
-    
-    # Console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    console_handler.setLevel(logging.DEBUG)
-    
-    # Add handlers
-    app.logger.addHandler(file_handler)
-    app.logger.addHandler(console_handler)
-    app.logger.setLevel(logging.DEBUG)
+    log_pipeline.init_app(app)
 
 def log_request(f):
     """Decorator to log API requests"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        start_time = time.time()
-        
-        # Log request details
-        app.logger.info(f"Request: {request.method} {request.path}")
-        app.logger.debug(f"Headers: {dict(request.headers)}")
-        app.logger.debug(f"Body: {request.get_json(silent=True) or {}}")
-        
+        start_time = time.perf_counter()
+
         # Process request
         response = f(*args, **kwargs)
-        
-        # Log response details
-        duration = (time.time() - start_time) * 1000
-        app.logger.info(
-            f"Response: {response[1]} ({duration:.2f}ms) "
-            f"Size: {len(response[0].data)} bytes"
-        )
-        
+
+        # Log response details; sampled-out requests cost one comparison
+        duration = (time.perf_counter() - start_time) * 1000
+        body, status = response if isinstance(response, tuple) else (response, response.status_code)
+        level = log_pipeline.should_log(status, duration)
+        if level is not None:
+            environ = request.environ
+            fields = {
+                'method': environ['REQUEST_METHOD'],
+                'path': environ['PATH_INFO'],
+                'status': status,
+                'duration_ms': round(duration, 3),
+                'size': body.content_length
+            }
+            if log_pipeline.log_bodies:
+                fields['body'] = request.get_data(cache=True)[:log_pipeline.body_max_bytes].decode('utf-8', 'replace')
+            log_pipeline.log_request(level, fields)
+
         return response
-    return decorated_function
\ No newline at end of file
+    return decorated_function
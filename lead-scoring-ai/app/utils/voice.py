@@ -1,38 +1,120 @@
+import argparse
 import os
 import requests
-import speech_recognition as sr
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 import hashlib
-from pathlib import Path
-from typing import Optional, Tuple
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
 import wave
 import contextlib
 import tempfile
+from app.core.metrics import STAGE_SECONDS
+from .voice_cache import VoiceCache
 
 load_dotenv()
 
 class VoiceService:
-    def __init__(self):
-        self.api_key = os.getenv('ELEVENLABS_API_KEY')
-        self.voice_id = os.getenv('ELEVENLABS_VOICE_ID', 'default')
-        self.cache_dir = Path('voice_cache')
-        self.cache_dir.mkdir(exist_ok=True)
-        self.recognizer = sr.Recognizer()
-        
-    def text_to_speech(self, text: str, voice_id: str = None) -> Optional[str]:
+    """Shared ElevenLabs client.
+
+    One pooled keep-alive ``requests.Session`` per process, with connect and
+    read timeouts, retries with exponential backoff on connection errors and
+    429/5xx responses, and a semaphore capping concurrent synthesis calls.
+    ``text_to_speech_async`` runs synthesis on a small thread pool and
+    coalesces concurrent requests for the same phrase. Audio is kept in a
+    byte-budgeted VoiceCache shared by every worker.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, api_key: Optional[str] = None, voice_id: Optional[str] = None,
+                 base_url: Optional[str] = None, cache_dir: str = 'voice_cache',
+                 cache_max_bytes: int = 256 * 1024 * 1024,
+                 connect_timeout: float = 3.05, read_timeout: float = 30.0, max_retries: int = 3,
+                 backoff_factor: float = 0.5, max_concurrency: int = 8, max_workers: int = 4):
+        self.api_key = api_key or os.getenv('ELEVENLABS_API_KEY')
+        self.voice_id = voice_id or os.getenv('ELEVENLABS_VOICE_ID', 'default')
+        self.base_url = (base_url or os.getenv('ELEVENLABS_BASE_URL', 'https://api.elevenlabs.io')).rstrip('/')
+        self.cache = VoiceCache(cache_dir, cache_max_bytes)
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_concurrency = max_concurrency
+        self.max_workers = max_workers
+        self.logger = logging.getLogger(__name__)
+        self._recognizer = None
+        self._session = None
+        self._executor = None
+        self._pid = None
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+
+    def init_app(self, app) -> None:
+        """Apply the app's voice settings; connections are opened lazily"""
+        self.base_url = (app.config.get('ELEVENLABS_BASE_URL') or self.base_url).rstrip('/')
+        self.cache = VoiceCache(app.config.get('VOICE_CACHE_DIR', 'voice_cache'),
+                                app.config.get('VOICE_CACHE_MAX_BYTES', self.cache.max_bytes))
+        self.timeout = (app.config.get('VOICE_CONNECT_TIMEOUT_SECONDS', self.timeout[0]),
+                        app.config.get('VOICE_READ_TIMEOUT_SECONDS', self.timeout[1]))
+        self.max_retries = app.config.get('VOICE_MAX_RETRIES', self.max_retries)
+        self.max_concurrency = app.config.get('VOICE_MAX_CONCURRENCY', self.max_concurrency)
+        self.max_workers = app.config.get('VOICE_WORKERS', self.max_workers)
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+        self._session = None
+
+    def _check_process(self) -> None:
+        """Drop the session, pool and in-flight calls inherited from a parent process"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._session = None
+                    self._executor = None
+                    self._inflight = {}
+                    self._pid = os.getpid()
+
+    @property
+    def session(self) -> requests.Session:
+        """Pooled keep-alive session, one per process"""
+        self._check_process()
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    retry = Retry(total=self.max_retries, backoff_factor=self.backoff_factor,
+                                  status_forcelist=self.RETRY_STATUSES, allowed_methods=frozenset(['POST']),
+                                  respect_retry_after_header=True, raise_on_status=False)
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency,
+                                          max_retries=retry)
+                    session = requests.Session()
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    session.headers.update({'xi-api-key': self.api_key or '', 'Content-Type': 'application/json'})
+                    self._session = session
+        return self._session
+
+    @property
+    def recognizer(self):
+        if self._recognizer is None:
+            import speech_recognition as sr
+
+            self._recognizer = sr.Recognizer()
+        return self._recognizer
+
+    def cache_key(self, text: str, voice_id: str = None) -> str:
+        """Cache key of the audio for a phrase"""
+        return hashlib.md5(f"{text}_{voice_id or self.voice_id}".encode()).hexdigest()
+
+    def text_to_speech(self, text: str, voice_id: str = None, pinned: bool = False) -> Optional[str]:
         """Convert text to speech using ElevenLabs API"""
         voice_id = voice_id or self.voice_id
-        cache_key = hashlib.md5(f"{text}_{voice_id}".encode()).hexdigest()
-        cache_file = self.cache_dir / f"{cache_key}.wav"
-        
-        if cache_file.exists():
-            return str(cache_file)
-            
-        url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
-        headers = {
-            "xi-api-key": self.api_key,
-            "Content-Type": "application/json"
-        }
+        return self.cache.get_or_create(self.cache_key(text, voice_id),
+                                        lambda: self._synthesize(text, voice_id), pinned)
+
+    def _synthesize(self, text: str, voice_id: str) -> Optional[bytes]:
+        url = f"{self.base_url}/v1/text-to-speech/{voice_id}"
         data = {
             "text": text,
             "voice_settings": {
@@ -40,62 +122,151 @@ class VoiceService:
                 "similarity_boost": 0.8
             }
         }
-        
+
         try:
-            response = requests.post(url, headers=headers, json=data)
+            with self._semaphore, STAGE_SECONDS.time('tts'):
+                response = self.session.post(url, json=data, timeout=self.timeout)
             response.raise_for_status()
-            
-            with open(cache_file, 'wb') as f:
-                f.write(response.content)
-                
-            return str(cache_file)
+            return response.content
         except Exception as e:
-            print(f"Text-to-speech failed: {e}")
+            self.logger.error(f"Text-to-speech failed: {e}")
             return None
 
-    def speech_to_text(self, audio_path: str) -> Tuple[Optional[str], Optional[float]]:
-        """Convert speech to text using Google Speech Recognition"""
+    def text_to_speech_async(self, text: str, voice_id: str = None, pinned: bool = False) -> Future:
+        """Synthesize on the voice thread pool; concurrent calls for one phrase share a future"""
+        voice_id = voice_id or self.voice_id
+        key = self.cache_key(text, voice_id)
+        cached = self.cache.get(key)
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            return future
+
+        self._check_process()
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='voice')
+            self._mark_pending(key)
+            future = self._executor.submit(self.text_to_speech, text, voice_id, pinned)
+            self._inflight[key] = future
+        future.add_done_callback(lambda _: self._forget(key, future))
+        return future
+
+    def _mark_pending(self, key: str) -> None:
         try:
-            with sr.AudioFile(audio_path) as source:
-                audio = self.recognizer.record(source)
-                duration = self._get_audio_duration(audio_path)
-                
-                if duration > 30:  # Limit to 30 seconds
-                    return None, None
-                    
+            self.cache.mark_pending(key)
+        except Exception as e:
+            self.logger.warning(f"Failed to mark voice response as pending: {str(e)}")
+
+    def _forget(self, key: str, future: Future) -> None:
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        try:
+            self.cache.clear_pending(key)
+        except Exception as e:
+            self.logger.warning(f"Failed to clear pending voice response: {str(e)}")
+
+    def is_pending(self, key: str) -> bool:
+        """Whether a worker in any process is still synthesizing ``key``"""
+        with self._lock:
+            if key in self._inflight:
+                return True
+        return self.cache.is_pending(key)
+
+    def audio_path(self, key: str) -> Optional[str]:
+        """Path of a finished audio file by cache key, or None if it is not (yet) there"""
+        return self.cache.get(key)
+
+    def speech_to_text(self, audio_path) -> Tuple[Optional[str], Optional[float]]:
+        """Convert speech to text using Google Speech Recognition (from a path or a file object)"""
+        import speech_recognition as sr
+
+        try:
+            # Check the length from the header before decoding any audio
+            duration = self._get_audio_duration(audio_path)
+            if duration > 30:  # Limit to 30 seconds
+                return None, None
+            if hasattr(audio_path, 'seek'):
+                audio_path.seek(0)
+
+            with STAGE_SECONDS.time('stt'):
+                with sr.AudioFile(audio_path) as source:
+                    audio = self.recognizer.record(source)
+
                 text = self.recognizer.recognize_google(audio)
-                return text, duration
-                
+            return text, duration
+
         except sr.UnknownValueError:
-            print("Speech recognition could not understand audio")
+            self.logger.warning("Speech recognition could not understand audio")
             return None, None
         except sr.RequestError as e:
-            print(f"Speech recognition service error: {e}")
+            self.logger.error(f"Speech recognition service error: {e}")
             return None, None
         except Exception as e:
-            print(f"Speech-to-text failed: {e}")
+            self.logger.error(f"Speech-to-text failed: {e}")
             return None, None
 
-    def _get_audio_duration(self, file_path: str) -> float:
+    def _get_audio_duration(self, file_path) -> float:
         """Get duration of audio file in seconds"""
         with contextlib.closing(wave.open(file_path, 'r')) as f:
             frames = f.getnframes()
             rate = f.getframerate()
             return frames / float(rate)
 
+voice_service = VoiceService()
+
+def prediction_phrase(prediction: dict) -> str:
+    """Text spoken for a prediction"""
+    if prediction.get('needs_human_review', False):
+        return f"Lead from {prediction.get('company', 'unknown')} scored {prediction['score']:.0%} and requires human review."
+    return f"Confident prediction for {prediction.get('company', 'unknown')}: {prediction['score']:.0%} conversion probability."
+
 def generate_voice_response(prediction: dict) -> Optional[str]:
     """Generate voice response for prediction results"""
-    service = VoiceService()
-    
-    if prediction.get('needs_human_review', False):
-        text = f"Lead from {prediction.get('company', 'unknown')} scored {prediction['score']:.0%} and requires human review."
-    else:
-        text = f"Confident prediction for {prediction.get('company', 'unknown')}: {prediction['score']:.0%} conversion probability."
-        
-    return service.text_to_speech(text)
+    return voice_service.text_to_speech(prediction_phrase(prediction))
+
+def start_voice_response(prediction: dict) -> Tuple[str, Future]:
+    """Start generating the voice response on the voice thread pool; returns its cache key and future"""
+    text = prediction_phrase(prediction)
+    return voice_service.cache_key(text), voice_service.text_to_speech_async(text)
+
+def prewarm_voice_cache(service: Optional[VoiceService] = None) -> int:
+    """Render every templated prediction phrase ahead of time, pinned against eviction.
+
+    Phrases only vary by review status and the whole-number percentage, so
+    this covers every voice response the API can produce.
+    """
+    service = service or voice_service
+    futures = [service.text_to_speech_async(prediction_phrase({'needs_human_review': review, 'score': pct / 100}),
+                                            pinned=True)
+               for review in (True, False) for pct in range(101)]
+    return sum(1 for future in futures if future.result() is not None)
+
+def start_voice_prewarm(service: Optional[VoiceService] = None) -> threading.Thread:
+    """Pre-warm the voice cache on a daemon thread"""
+    def run():
+        rendered = prewarm_voice_cache(service)
+        logging.getLogger(__name__).info(f"Voice cache pre-warmed with {rendered} phrases")
+
+    thread = threading.Thread(target=run, name='voice-prewarm', daemon=True)
+    thread.start()
+    return thread
 
 def process_voice_feedback(audio_path: str) -> Optional[str]:
     """Process voice feedback audio into text"""
-    service = VoiceService()
-    text, _ = service.speech_to_text(audio_path)
+    text, _ = voice_service.speech_to_text(audio_path)
     return text
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Voice cache maintenance')
+    parser.add_argument('--prewarm', action='store_true', help='Render every templated prediction phrase')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.prewarm:
+        print(f"Pre-warmed {prewarm_voice_cache()} phrases")
+    print(voice_service.cache.stats())
@@ -0,0 +1,221 @@
+import os
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Any, Optional
+from app.core.storage import connect
+
+try:
+    import fcntl
+except ImportError:  # Not on POSIX: single-flight only within a process
+    fcntl = None
+
+_SCHEMA = """CREATE TABLE IF NOT EXISTS voice_cache (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL,
+    pinned INTEGER NOT NULL DEFAULT 0
+)"""
+
+# Keys some worker is synthesizing right now, so a poll on any worker can tell "pending" from "missing"
+_PENDING_SCHEMA = """CREATE TABLE IF NOT EXISTS voice_pending (
+    key TEXT PRIMARY KEY,
+    since REAL NOT NULL
+)"""
+
+class VoiceCache:
+    """Byte-budgeted cache of synthesized audio shared by every worker.
+
+    Files live in ``cache_dir`` and an SQLite index records their size and
+    last access, so the least recently used unpinned files are evicted once
+    the total exceeds ``max_bytes``. Files are written to a temporary name
+    and renamed into place. A per-key ``flock`` makes one process synthesize
+    a missing key while the others wait and then read its file. Keys being
+    synthesized in the background are listed in the index too, so every
+    worker can report them as pending; a mark older than ``lock_timeout``
+    is taken to belong to a process that died.
+    """
+
+    INDEX_FILE = 'index.db'
+
+    def __init__(self, cache_dir: str = 'voice_cache', max_bytes: int = 256 * 1024 * 1024,
+                 touch_interval: float = 60.0, lock_timeout: float = 60.0):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval  # Seconds between index updates for a hot key
+        self.lock_timeout = lock_timeout
+        self.logger = logging.getLogger(__name__)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._touched: Dict[str, float] = {}
+        self._local = threading.local()
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+    def _ensure_ready(self) -> None:
+        if self._ready:
+            return
+        with self._ready_lock:
+            if self._ready:
+                return
+            (self.cache_dir / '.locks').mkdir(parents=True, exist_ok=True)
+            conn = self._conn()
+            with conn:
+                conn.execute(_SCHEMA)
+                conn.execute(_PENDING_SCHEMA)
+            self._adopt_existing(conn)
+            self._ready = True
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = connect(str(self.cache_dir / self.INDEX_FILE))
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _adopt_existing(self, conn) -> None:
+        """Index audio files written before the index existed"""
+        now = time.time()
+        rows = [(path.stem, path.stat().st_size, now) for path in self.cache_dir.glob('*.wav')]
+        if rows:
+            with conn:
+                conn.executemany("INSERT OR IGNORE INTO voice_cache (key, size, last_access) VALUES (?, ?, ?)", rows)
+
+    def path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.wav"
+
+    def get(self, key: str) -> Optional[str]:
+        """Path of a cached file, recording the access for LRU eviction"""
+        self._ensure_ready()
+        path = self.path(key)
+        if not path.exists():
+            return None
+        self.hits += 1
+        now = time.time()
+        if now - self._touched.get(key, 0.0) > self.touch_interval:
+            self._touched[key] = now
+            try:
+                with self._conn() as conn:
+                    conn.execute("UPDATE voice_cache SET last_access = ? WHERE key = ?", (now, key))
+            except Exception as e:
+                self.logger.warning(f"Failed to record voice cache access: {str(e)}")
+        return str(path)
+
+    def get_or_create(self, key: str, produce: Callable[[], Optional[bytes]], pinned: bool = False) -> Optional[str]:
+        """Return the cached file for ``key``, producing it under a cross-process lock on a miss"""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        with self._key_lock(key):
+            # Another process may have produced it while we waited for the lock
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+            self.misses += 1
+            content = produce()
+            if content is None:
+                return None
+            return self.put(key, content, pinned)
+
+    def mark_pending(self, key: str) -> None:
+        """Record that this process is producing ``key``"""
+        self._ensure_ready()
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO voice_pending (key, since) VALUES (?, ?)", (key, time.time()))
+
+    def clear_pending(self, key: str) -> None:
+        self._ensure_ready()
+        with self._conn() as conn:
+            conn.execute("DELETE FROM voice_pending WHERE key = ?", (key,))
+
+    def is_pending(self, key: str) -> bool:
+        """Whether any process is producing ``key``"""
+        self._ensure_ready()
+        row = self._conn().execute("SELECT since FROM voice_pending WHERE key = ?", (key,)).fetchone()
+        return row is not None and time.time() - row[0] < self.lock_timeout
+
+    def put(self, key: str, content: bytes, pinned: bool = False) -> str:
+        """Publish a file atomically, index it and evict down to the byte budget"""
+        self._ensure_ready()
+        path = self.path(key)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+        now = time.time()
+        self._touched[key] = now
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO voice_cache (key, size, last_access, pinned) VALUES (?, ?, ?, ?)",
+                         (key, len(content), now, int(pinned)))
+        self._evict()
+        return str(path)
+
+    def _evict(self) -> None:
+        conn = self._conn()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM voice_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM voice_cache WHERE pinned = 0 ORDER BY last_access"):
+            if total <= self.max_bytes:
+                break
+            victims.append(key)
+            total -= size
+        with conn:
+            conn.executemany("DELETE FROM voice_cache WHERE key = ?", [(key,) for key in victims])
+        for key in victims:
+            try:
+                self.path(key).unlink()
+            except FileNotFoundError:
+                pass
+            self._touched.pop(key, None)
+        self.evictions += len(victims)
+
+    def _key_lock(self, key: str) -> '_FileLock':
+        self._ensure_ready()
+        return _FileLock(self.cache_dir / '.locks' / f"{key}.lock", self.lock_timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        self._ensure_ready()
+        entries, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM voice_cache").fetchone()
+        return {
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+class _FileLock:
+    """Exclusive ``flock`` on a lock file; falls back to proceeding unlocked after the timeout"""
+
+    def __init__(self, path: Path, timeout: float):
+        self.path = path
+        self.timeout = timeout
+        self._file = None
+
+    def __enter__(self) -> '_FileLock':
+        if fcntl is None:
+            return self
+        self._file = open(self.path, 'a')
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return self
+            except BlockingIOError:
+                if time.monotonic() > deadline:
+                    logging.getLogger(__name__).warning(f"Timed out waiting for {self.path}, proceeding unlocked")
+                    return self
+                time.sleep(0.01)
+
+    def __exit__(self, *exc) -> None:
+        if self._file is not None:
+            self._file.close()  # Closing releases the lock
+            self._file = None
@@ -0,0 +1,653 @@
+"""Reproducible benchmarks for scoring, shadow scoring, drift, model formats, batch scoring, serving, training and voice.
+
+Inputs come from the synthetic lead generator with a fixed seed and end
+date, so every run scores and trains on the same rows. Run from the
+project root:
+
+    python -m benchmarks.run --sizes 1000,100000,1000000 --output results.json
+    python -m benchmarks.run --sizes 1000,100000 --compare baseline.json
+    python -m benchmarks.run --results results.json --compare baseline.json
+
+``--compare`` exits with status 1 when a metric is worse than the baseline
+by more than ``--threshold``. Results from different machines are not
+comparable; keep a baseline per machine.
+"""
+import argparse
+import http.server
+import io
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS = ('transform', 'predict_lead', 'shadow', 'drift', 'model_format', 'batch_predict', 'serving', 'training', 'voice')
+SEED = 42
+END_DATE = datetime(2024, 1, 1)
+
+class Results:
+    """Flat list of named measurements, each knowing which direction is better"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, name: str, value: float, unit: str, higher_is_better: bool = False) -> None:
+        self.metrics[name] = {'value': round(float(value), 6), 'unit': unit, 'higher_is_better': higher_is_better}
+        print(f"{name:<48} {value:>14.4f} {unit}", flush=True)
+
+    def add_latencies(self, name: str, samples: List[float]) -> None:
+        samples_ms = np.asarray(samples) * 1000
+        self.add(f"{name}.p50_ms", np.percentile(samples_ms, 50), 'ms')
+        self.add(f"{name}.p99_ms", np.percentile(samples_ms, 99), 'ms')
+
+def _environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+def _timed(fn: Callable[[], Any], repeat: int) -> float:
+    """Best wall time of ``repeat`` runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def _leads_csv(workdir: str, size: int) -> str:
+    from data.synthetic_data_generator import write_synthetic_leads
+
+    path = os.path.join(workdir, f"leads-{size}.csv")
+    if not os.path.exists(path):
+        write_synthetic_leads(path, size, seed=SEED, workers=1, end_date=END_DATE)
+    return path
+
+def _train_once(csv_path: str, registry_dir: str, cache_dir: str, workers: int) -> Dict[str, float]:
+    """Train in a fresh process so its peak RSS belongs to this run alone.
+
+    The peak adds the largest pool worker's to the trainer's own, so with
+    ``workers`` above one it is an upper bound.
+    """
+    from app.core.model_registry import ModelRegistry
+    from app.core.model_training import ModelTrainer
+
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    trainer = ModelTrainer(ModelRegistry(registry_dir), max_workers=workers, cache_dir=cache_dir)
+    started = time.perf_counter()
+    X, y = trainer.load_data(csv_path)
+    loaded = time.perf_counter()
+    trainer.train_models(X, y)
+    finished = time.perf_counter()
+    peak_kb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss +
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return {
+        'load_seconds': loaded - started,
+        'train_seconds': finished - loaded,
+        'peak_rss_mb': peak_kb / 1024,
+        'baseline_rss_mb': baseline_kb / 1024
+    }
+
+def _train(csv_path: str, registry_dir: str, cache_dir: str, workers: int) -> Dict[str, float]:
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(_train_once, csv_path, registry_dir, cache_dir, workers).result()
+
+def bench_training(results: Results, args, workdir: str) -> None:
+    for size in args.sizes:
+        csv_path = _leads_csv(workdir, size)
+        # Fresh cache and registry, so loading includes building the columnar cache
+        scratch = tempfile.mkdtemp(prefix=f"train-{size}-", dir=workdir)
+        run = _train(csv_path, os.path.join(scratch, 'registry'), os.path.join(scratch, 'cache'),
+                     args.train_workers)
+        shutil.rmtree(scratch)
+        results.add(f"training.{size}.load_seconds", run['load_seconds'], 's')
+        results.add(f"training.{size}.train_seconds", run['train_seconds'], 's')
+        results.add(f"training.{size}.peak_rss_mb", run['peak_rss_mb'], 'MB')
+        results.add(f"training.{size}.baseline_rss_mb", run['baseline_rss_mb'], 'MB')
+
+def _scoring_registry(args, workdir: str) -> str:
+    """Registry holding the bundle every scoring benchmark uses"""
+    from app.core.compact_model import compile_model
+    from app.core.model_registry import ModelRegistry
+
+    registry_dir = os.path.join(workdir, f"registry-{args.model_rows}")
+    if not os.path.exists(os.path.join(registry_dir, 'LATEST')):
+        _train(_leads_csv(workdir, args.model_rows), registry_dir,
+               os.path.join(workdir, f"cache-{args.model_rows}"), args.train_workers)
+    registry = ModelRegistry(registry_dir)
+    version = registry.latest_version()
+    if not (registry.root / version / registry.CHALLENGERS_DIR).is_dir():  # Bundle from an older workdir
+        _train(_leads_csv(workdir, args.model_rows), registry_dir,
+               os.path.join(workdir, f"cache-{args.model_rows}"), args.train_workers)
+        version = registry.latest_version()
+    if not (registry.root / version / registry.COMPACT_DIR).is_dir():
+        registry.save_compact(version, compile_model(registry.load(version).model))
+    return registry_dir
+
+def _scorer(args, workdir: str):
+    from app.core.feedback_store import FeedbackStore
+    from app.core.model_registry import ModelRegistry
+    from app.core.prediction import LeadScorer
+    from app.core.prediction_log import PredictionLog
+
+    scorer = LeadScorer(ModelRegistry(_scoring_registry(args, workdir)),
+                        FeedbackStore(os.path.join(workdir, 'feedback.db')),
+                        PredictionLog(os.path.join(workdir, 'predictions.db')))
+    scorer.load_model()
+    return scorer
+
+def bench_transform(results: Results, args, workdir: str) -> None:
+    processor = _scorer(args, workdir).data_processor
+    for size in args.sizes:
+        frame = pd.read_csv(_leads_csv(workdir, size))[processor.feature_columns]
+        seconds = _timed(lambda: processor.transform_data(frame), args.repeat)
+        results.add(f"transform_data.{size}.rows_per_sec", size / seconds, 'rows/s', higher_is_better=True)
+
+def bench_predict_lead(results: Results, args, workdir: str) -> None:
+    from app.core.cache import PredictionCache
+    from data.synthetic_data_generator import generate_synthetic_leads
+
+    scorer = _scorer(args, workdir)
+    leads = generate_synthetic_leads(args.iterations, seed=SEED + 1, end_date=END_DATE)
+    leads = leads[scorer.data_processor.feature_columns].to_dict('records')
+
+    def latencies(batch: List[Dict[str, Any]], **kwargs) -> List[float]:
+        samples = []
+        for lead in batch:
+            started = time.perf_counter()
+            scorer.predict_lead(lead, **kwargs)
+            samples.append(time.perf_counter() - started)
+        return samples
+
+    scorer.cache = PredictionCache(0)
+    latencies(leads[:20])
+    results.add_latencies('predict_lead.uncached', latencies(leads))
+    scorer.cache = PredictionCache(len(leads) + 1, ttl_seconds=3600)
+    latencies(leads)
+    results.add_latencies('predict_lead.cached', latencies(leads))
+    explained = leads[:max(1, len(leads) // 10)]
+    results.add_latencies('predict_lead.explained', latencies(explained, explain=True))
+
+def bench_shadow(results: Results, args, workdir: str) -> None:
+    """Champion latency with shadow scoring off and sampled, and the challenger time it used"""
+    from app.core.cache import PredictionCache
+    from app.core.shadow import ShadowScorer
+    from data.synthetic_data_generator import generate_synthetic_leads
+
+    scorer = _scorer(args, workdir)
+    scorer.shadow = ShadowScorer(scorer.prediction_log, 1.0)
+    scorer.load_model()  # Again, now with the challengers
+    scorer.cache = PredictionCache(0)
+    leads = generate_synthetic_leads(args.iterations, seed=SEED + 1, end_date=END_DATE)
+    leads = leads[scorer.data_processor.feature_columns].to_dict('records')
+    shadows = {rate: ShadowScorer(scorer.prediction_log, rate, max_overhead=args.shadow_max_overhead)
+               for rate in args.shadow_rates}
+    samples: Dict[float, List[float]] = {rate: [] for rate in shadows}
+    for lead in leads[:20]:
+        scorer.predict_lead(lead)
+    # Interleaved blocks, so changes in machine load hit every rate alike
+    for start in range(0, len(leads), 100):
+        for rate, shadow in shadows.items():
+            scorer.shadow = shadow
+            for lead in leads[start:start + 100]:
+                started = time.perf_counter()
+                scorer.predict_lead(lead)
+                samples[rate].append(time.perf_counter() - started)
+
+    for rate, shadow in shadows.items():
+        results.add_latencies(f"shadow.{rate:g}.predict_lead", samples[rate])
+        if not rate:
+            continue
+        while shadow.stats()['pending']:
+            time.sleep(0.01)
+        stats = shadow.stats()
+        dropped = stats['dropped_budget'] + stats['dropped_saturated']
+        results.add(f"shadow.{rate:g}.overhead", stats['overhead'] or 0.0, 'ratio')
+        results.add(f"shadow.{rate:g}.submit_us", stats['submit_us'] or 0.0, 'us')
+        results.add(f"shadow.{rate:g}.dropped_fraction", dropped / max(1, dropped + stats['submitted']), 'ratio')
+
+def bench_drift(results: Results, args, workdir: str) -> None:
+    """Drift sketch cost per lead, and their state and report time as traffic grows"""
+    from app.core.drift import DriftMonitor
+
+    bundle = _scorer(args, workdir).bundle
+    rng = np.random.default_rng(SEED)
+    monitor = DriftMonitor()
+    for size in args.sizes:
+        frame = pd.read_csv(_leads_csv(workdir, size))[bundle.data_processor.feature_columns]
+        scored = [{'score': score} for score in rng.random(size)]
+        leads = frame.head(args.iterations).to_dict('records')
+
+        def singles():
+            for lead, result in zip(leads, scored):
+                monitor.observe(bundle, [lead], [result])
+
+        seconds = _timed(singles, args.repeat)
+        results.add(f"drift.{size}.single_us_per_lead", seconds / len(leads) * 1e6, 'us')
+        seconds = _timed(lambda: monitor.observe(bundle, frame, scored), args.repeat)
+        results.add(f"drift.{size}.frame_us_per_lead", seconds / size * 1e6, 'us')
+        # Cumulative over every size so far: the state must not grow with the traffic
+        state = json.dumps([[version, window, sketches.to_dict()]
+                            for (version, window), sketches in monitor.snapshot().items()])
+        results.add(f"drift.{size}.state_kb", len(state) / 1024, 'KB')
+        results.add(f"drift.{size}.report_ms", _timed(lambda: monitor.report(bundle), args.repeat) * 1000, 'ms')
+
+def _candidate_models(args, workdir: str) -> str:
+    """Every training candidate fitted on the scoring bundle's rows, saved as joblib and compact arrays"""
+    import joblib
+    from app.core.compact_model import compile_model, save_compact_model
+    from app.core.model_registry import ModelRegistry
+    from app.core.model_training import _build_models, _fit_candidate
+
+    models_dir = os.path.join(workdir, f"models-{args.model_rows}")
+    if os.path.exists(os.path.join(models_dir, 'rows.npy')):
+        return models_dir
+    bundle = ModelRegistry(_scoring_registry(args, workdir)).load()
+    frame = pd.read_csv(_leads_csv(workdir, args.model_rows))
+    X = bundle.data_processor.transform_data(frame)
+    y = frame['converted'].to_numpy()
+    rows = np.arange(len(y))
+    holdout = max(1, len(rows) // 10)
+    shutil.rmtree(models_dir, ignore_errors=True)
+    os.makedirs(models_dir)
+    for name, model in _build_models().items():
+        _, model, _, _ = _fit_candidate(name, model, X, y, rows[:-holdout], rows[-holdout:], 1)
+        joblib.dump(model, os.path.join(models_dir, f"{name}.joblib"))
+        save_compact_model(compile_model(model), os.path.join(models_dir, f"{name}.compact"))
+    np.save(os.path.join(models_dir, 'rows.npy'), X[-holdout:])
+    return models_dir
+
+def _rss_mb() -> float:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:  # No procfs: fall back to the peak
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _measure_model_once(path: str, rows_path: str, iterations: int, repeat: int) -> Dict[str, Any]:
+    """Load one model format in a fresh process; loading the joblib model includes importing its library"""
+    import joblib
+    from app.core.compact_model import load_compact_model
+
+    X = np.load(rows_path)
+    rss_before = _rss_mb()
+    started = time.perf_counter()
+    model = load_compact_model(path) if os.path.isdir(path) else joblib.load(path)
+    model.predict_proba(X[:1])
+    load_seconds = time.perf_counter() - started
+    rss_mb = _rss_mb() - rss_before
+
+    singles = []
+    for i in range(iterations):
+        row = X[i % len(X)][None, :]
+        started = time.perf_counter()
+        model.predict_proba(row)
+        singles.append(time.perf_counter() - started)
+    return {'load_seconds': load_seconds, 'rss_mb': rss_mb, 'singles': singles,
+            'batch_seconds': _timed(lambda: model.predict_proba(X), repeat), 'batch_rows': len(X)}
+
+def bench_model_format(results: Results, args, workdir: str) -> None:
+    models_dir = _candidate_models(args, workdir)
+    for name in ('xgboost', 'random_forest', 'logistic_regression'):
+        for model_format, suffix in (('full', 'joblib'), ('compact', 'compact')):
+            path = os.path.join(models_dir, f"{name}.{suffix}")
+            files = [os.path.join(path, f) for f in os.listdir(path)] if os.path.isdir(path) else [path]
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                run = pool.submit(_measure_model_once, path, os.path.join(models_dir, 'rows.npy'),
+                                  args.iterations, args.repeat).result()
+            prefix = f"model_format.{name}.{model_format}"
+            results.add(f"{prefix}.disk_mb", sum(os.path.getsize(f) for f in files) / 2**20, 'MB')
+            results.add(f"{prefix}.load_seconds", run['load_seconds'], 's')
+            results.add(f"{prefix}.rss_mb", run['rss_mb'], 'MB')
+            results.add_latencies(f"{prefix}.predict_one", run['singles'])
+            results.add(f"{prefix}.{run['batch_rows']}.rows_per_sec", run['batch_rows'] / run['batch_seconds'],
+                        'rows/s', higher_is_better=True)
+
+def _create_app(workdir: str, registry_dir: str):
+    """The real app factory, pointed at scratch storage"""
+    os.environ.update({
+        'SECRET_KEY': 'benchmark-secret-key-of-at-least-32-bytes',
+        'MODEL_REGISTRY_DIR': registry_dir,
+        'MODEL_RELOAD_POLL_SECONDS': '0',
+        'FEEDBACK_DB_PATH': os.path.join(workdir, 'app-feedback.db'),
+        'PREDICTION_LOG_PATH': os.path.join(workdir, 'app-predictions.db'),
+        'TRANSCRIPTION_DB_PATH': os.path.join(workdir, 'transcriptions.db'),
+        'VOICE_CACHE_DIR': os.path.join(workdir, 'app-voice-cache'),
+        'METRICS_DIR': os.path.join(workdir, 'metrics'),
+        'DRIFT_DIR': os.path.join(workdir, 'drift'),
+        'DASHBOARD_STATS_DIR': os.path.join(workdir, 'dashboard'),
+        'LOG_FILE': os.path.join(workdir, 'logs', 'app.log'),
+        'LOG_REQUEST_LEVEL': 'WARNING'
+    })
+    from app import create_app
+
+    return create_app()
+
+def bench_batch_predict(results: Results, args, workdir: str) -> None:
+    from flask_jwt_extended import create_access_token
+
+    app = _create_app(workdir, _scoring_registry(args, workdir))
+    with app.app_context():
+        headers = {'Authorization': f"Bearer {create_access_token(identity='analyst')}"}
+    client = app.test_client()
+    for size in args.sizes:
+        rows = min(size, args.batch_max_rows)
+        frame = pd.read_csv(_leads_csv(workdir, size), nrows=rows)
+        npz = io.BytesIO()
+        np.savez(npz, **{column: frame[column].to_numpy(dtype=str if frame[column].dtype.kind in 'OT' or
+                                                          pd.api.types.is_string_dtype(frame[column]) else None)
+                         for column in frame.columns})
+        payloads = {
+            'json_rows': (json.dumps({'leads': frame.to_dict('records')}), 'application/json'),
+            'json_columns': (json.dumps({'columns': frame.to_dict('list')}), 'application/json'),
+            'csv': (frame.to_csv(index=False), 'text/csv'),
+            'npz': (npz.getvalue(), 'application/x-npz')
+        }
+        for name, (body, content_type) in payloads.items():
+            def post():
+                response = client.post('/api/batch_predict', data=body, content_type=content_type, headers=headers)
+                response.get_data()  # The body is streamed; scoring happens as it is read
+                if response.status_code != 200:
+                    raise RuntimeError(f"/api/batch_predict returned {response.status_code}: {response.data[:200]}")
+
+            post()
+            seconds = _timed(post, args.repeat)
+            results.add(f"batch_predict.{rows}.{name}.rows_per_sec", rows / seconds, 'rows/s', higher_is_better=True)
+
+SERVING_MODES = {
+    # Master loads the app once and forks; compact model arrays memory-mapped
+    'preload': {'GUNICORN_PRELOAD': 'true', 'COMPACT_MODEL': 'true', 'MODEL_MMAP': 'true'},
+    # Every worker imports the libraries and loads its own full model
+    'per_worker': {'GUNICORN_PRELOAD': 'false', 'COMPACT_MODEL': 'false', 'MODEL_MMAP': 'false'}
+}
+
+def _free_port() -> int:
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _child_pids(pid: int) -> List[int]:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+def _memory_mb(pid: int) -> Dict[str, float]:
+    """Resident, proportional (shared pages split between their users) and private memory"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {'rss': fields['Rss'], 'pss': fields['Pss'],
+            'private': fields['Private_Clean'] + fields['Private_Dirty']}
+
+def _serve(workdir: str, registry_dir: str, mode: str, workers: int, port: int):
+    """Start gunicorn with gunicorn.conf.py and wait until every worker has loaded the app"""
+    log_path = os.path.join(workdir, f"gunicorn-{mode}-{workers}.log")
+    env = dict(os.environ, **SERVING_MODES[mode], **{
+        'GUNICORN_BIND': f"127.0.0.1:{port}",
+        'GUNICORN_WORKERS': str(workers),
+        'SECRET_KEY': 'benchmark-secret-key-of-at-least-32-bytes',
+        'MODEL_REGISTRY_DIR': registry_dir,
+        'MODEL_RELOAD_POLL_SECONDS': '0',
+        'PREDICTION_CACHE_SIZE': '0',
+        'FEEDBACK_DB_PATH': os.path.join(workdir, 'serve-feedback.db'),
+        'PREDICTION_LOG_PATH': os.path.join(workdir, 'serve-predictions.db'),
+        'TRANSCRIPTION_DB_PATH': os.path.join(workdir, 'serve-transcriptions.db'),
+        'VOICE_CACHE_DIR': os.path.join(workdir, 'serve-voice-cache'),
+        'METRICS_DIR': os.path.join(workdir, 'serve-metrics'),
+        'DRIFT_DIR': os.path.join(workdir, 'serve-drift'),
+        'DASHBOARD_STATS_DIR': os.path.join(workdir, 'serve-dashboard'),
+        'LOG_FILE': os.path.join(workdir, 'logs', 'serve.log'),
+        'LOG_REQUEST_LEVEL': 'WARNING'
+    })
+    with open(log_path, 'w') as log:
+        server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                                  cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.time() + 300
+    while time.time() < deadline:
+        with open(log_path) as f:
+            if f.read().count(' ready\n') >= workers:
+                return server
+        if server.poll() is not None:
+            break
+        time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"gunicorn did not start {workers} workers, see {log_path}")
+
+def _load(port: int, token: str, leads: List[Dict[str, Any]], clients: int, seconds: float) -> int:
+    """Keep-alive clients posting /api/predict for ``seconds``; returns the successful requests"""
+    import http.client
+
+    stop = time.perf_counter() + seconds
+    counts = [0] * clients
+
+    def client(index: int) -> None:
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        headers = {'Authorization': f"Bearer {token}", 'Content-Type': 'application/json'}
+        i = index
+        while time.perf_counter() < stop:
+            connection.request('POST', '/api/predict', body=json.dumps(leads[i % len(leads)]), headers=headers)
+            response = connection.getresponse()
+            response.read()
+            counts[index] += response.status == 200
+            i += clients
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts)
+
+def bench_serving(results: Results, args, workdir: str) -> None:
+    """Per-worker memory and /api/predict throughput of gunicorn.conf.py, preloaded or not.
+
+    Client threads run in this process, so on small machines they compete
+    with the workers for CPU; compare modes on the same machine.
+    """
+    from flask import Flask
+    from flask_jwt_extended import JWTManager, create_access_token
+    from data.synthetic_data_generator import generate_synthetic_leads
+
+    registry_dir = _scoring_registry(args, workdir)
+    token_app = Flask('benchmark')
+    token_app.config['SECRET_KEY'] = 'benchmark-secret-key-of-at-least-32-bytes'
+    JWTManager(token_app)
+    with token_app.app_context():
+        token = create_access_token(identity='benchmark')
+    leads = generate_synthetic_leads(1000, seed=SEED + 2, end_date=END_DATE).drop(columns=['converted'])
+    leads = json.loads(leads.to_json(orient='records', date_format='iso'))
+
+    for mode in SERVING_MODES:
+        for workers in args.serving_workers:
+            port = _free_port()
+            server = _serve(workdir, registry_dir, mode, workers, port)
+            try:
+                _load(port, token, leads, args.serving_clients, 1.0)  # Warm every worker
+                memory = [_memory_mb(pid) for pid in _child_pids(server.pid)]
+                master = _memory_mb(server.pid)
+                requests = _load(port, token, leads, args.serving_clients, args.serving_seconds)
+            finally:
+                server.terminate()
+                server.wait(timeout=60)
+            prefix = f"serving.{mode}.{workers}_workers"
+            results.add(f"{prefix}.requests_per_sec", requests / args.serving_seconds, 'req/s',
+                        higher_is_better=True)
+            for key in ('rss', 'pss', 'private'):
+                results.add(f"{prefix}.worker_{key}_mb", np.mean([m[key] for m in memory]), 'MB')
+            results.add(f"{prefix}.total_pss_mb", master['pss'] + sum(m['pss'] for m in memory), 'MB')
+
+def _silence_wav(seconds: float = 0.5, rate: int = 16000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(b'\x00\x00' * int(seconds * rate))
+    return buffer.getvalue()
+
+def _stub_tts_server(latency_ms: float) -> http.server.ThreadingHTTPServer:
+    """Local stand-in for the ElevenLabs API that answers every request with the same audio"""
+    audio = _silence_wav()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True  # Headers and body go out in separate writes
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(latency_ms / 1000)
+            self.send_response(200)
+            self.send_header('Content-Type', 'audio/wav')
+            self.send_header('Content-Length', str(len(audio)))
+            self.end_headers()
+            self.wfile.write(audio)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, name='stub-tts', daemon=True).start()
+    return server
+
+def bench_voice(results: Results, args, workdir: str) -> None:
+    from app.utils.voice import VoiceService
+
+    server = _stub_tts_server(args.tts_latency_ms)
+    cache_dir = tempfile.mkdtemp(prefix='voice-cache-', dir=workdir)  # Empty, so the first calls miss
+    try:
+        service = VoiceService(api_key='benchmark', base_url=f"http://127.0.0.1:{server.server_port}",
+                               cache_dir=cache_dir)
+        phrases = [f"Benchmark phrase {i}" for i in range(args.voice_misses)]
+        misses = []
+        for phrase in phrases:
+            started = time.perf_counter()
+            if service.text_to_speech(phrase) is None:
+                raise RuntimeError("Stub TTS request failed")
+            misses.append(time.perf_counter() - started)
+        hits = []
+        for i in range(args.iterations):
+            started = time.perf_counter()
+            service.text_to_speech(phrases[i % len(phrases)])
+            hits.append(time.perf_counter() - started)
+        results.add_latencies('voice_cache.miss', misses)
+        results.add_latencies('voice_cache.hit', hits)
+    finally:
+        server.shutdown()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Print each shared metric's change and return the names of regressions"""
+    regressions = []
+    print(f"\n{'metric':<48} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, metric in sorted(current['metrics'].items()):
+        reference = baseline['metrics'].get(name)
+        if reference is None or not reference['value']:
+            continue
+        change = (metric['value'] - reference['value']) / reference['value']
+        worse = -change if metric['higher_is_better'] else change
+        flag = ''
+        if worse > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<48} {reference['value']:>12.4f} {metric['value']:>12.4f} {change:>+8.1%}{flag}")
+    return regressions
+
+def run(args) -> Dict[str, Any]:
+    results = Results()
+    workdir = args.workdir or tempfile.mkdtemp(prefix='lead-scoring-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    runners = {'transform': bench_transform, 'predict_lead': bench_predict_lead, 'shadow': bench_shadow,
+               'drift': bench_drift, 'model_format': bench_model_format, 'batch_predict': bench_batch_predict,
+               'serving': bench_serving, 'training': bench_training, 'voice': bench_voice}
+    for name in args.only:
+        print(f"# {name}", flush=True)
+        runners[name](results, args, workdir)
+    return {
+        'environment': _environment(),
+        'parameters': {key: value for key, value in vars(args).items()
+                       if key not in ('output', 'compare', 'results', 'workdir')},
+        'metrics': results.metrics
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Lead scoring benchmarks')
+    parser.add_argument('--sizes', default='1000,100000,1000000',
+                        help='Comma-separated row counts for the transform, batch and training benchmarks')
+    parser.add_argument('--only', default=','.join(BENCHMARKS), help=f"Subset of {','.join(BENCHMARKS)}")
+    parser.add_argument('--model-rows', type=int, default=100000, help='Rows the scoring bundle is trained on')
+    parser.add_argument('--iterations', type=int, default=1000, help='Single-lead calls per latency benchmark')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per throughput benchmark; the best is kept')
+    parser.add_argument('--shadow-rates', default='0,0.1,1', help='Comma-separated shadow sample rates')
+    parser.add_argument('--shadow-max-overhead', type=float, default=0.25,
+                        help='Challenger seconds allowed per champion second')
+    parser.add_argument('--batch-max-rows', type=int, default=100000, help='Largest /batch_predict request')
+    parser.add_argument('--train-workers', type=int, default=1, help='Candidates trained in parallel')
+    parser.add_argument('--serving-workers', default='1,2,4', help='Comma-separated gunicorn worker counts')
+    parser.add_argument('--serving-clients', type=int, default=8, help='Concurrent keep-alive clients')
+    parser.add_argument('--serving-seconds', type=float, default=5.0, help='Load duration per worker count')
+    parser.add_argument('--tts-latency-ms', type=float, default=50.0, help='Stub TTS server response delay')
+    parser.add_argument('--voice-misses', type=int, default=50, help='Distinct phrases synthesized')
+    parser.add_argument('--workdir', help='Scratch directory; generated data and bundles are reused from it')
+    parser.add_argument('--output', help='Write the results JSON here')
+    parser.add_argument('--results', help='Compare an existing results file instead of running')
+    parser.add_argument('--compare', help='Baseline results JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.15, help='Relative change counted as a regression')
+    args = parser.parse_args(argv)
+    args.sizes = [int(size) for size in args.sizes.split(',') if size]
+    args.shadow_rates = [float(rate) for rate in args.shadow_rates.split(',') if rate]
+    args.serving_workers = [int(workers) for workers in args.serving_workers.split(',') if workers]
+    args.only = [name for name in args.only.split(',') if name]
+    unknown = set(args.only) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    logging.basicConfig(level=logging.WARNING)
+    if args.results:
+        with open(args.results) as f:
+            current = json.load(f)
+    else:
+        current = run(args)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(current, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+        print("\nNo regressions")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,4 +3,103 @@ import os
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your_secret_key'
     DEBUG = True
-    # Add other configuration variables as needed
\ No newline at end of file
+
+    # Versioned model bundles; the app loads the latest one on boot
+    MODEL_REGISTRY_DIR = os.environ.get('MODEL_REGISTRY_DIR', 'models/registry')
+    MODEL_TRAINING_DATA = os.environ.get('MODEL_TRAINING_DATA', 'data/leads.csv')
+    MODEL_TRAIN_IF_MISSING = os.environ.get('MODEL_TRAIN_IF_MISSING', 'false').lower() == 'true'
+    # Hot-swap when LATEST changes (0 disables polling) or when the signal is received
+    MODEL_RELOAD_POLL_SECONDS = float(os.environ.get('MODEL_RELOAD_POLL_SECONDS', 10))
+    MODEL_RELOAD_SIGNAL = os.environ.get('MODEL_RELOAD_SIGNAL', 'SIGUSR2')
+    # Score with the bundle's array-backed compact model when it has one
+    COMPACT_MODEL = os.environ.get('COMPACT_MODEL', 'true').lower() == 'true'
+    # Memory-map bundle arrays so worker processes share one copy; n_jobs for models with a thread pool
+    MODEL_MMAP = os.environ.get('MODEL_MMAP', 'true').lower() == 'true'
+    MODEL_THREADS = int(os.environ['MODEL_THREADS']) if os.environ.get('MODEL_THREADS') else None
+
+    # In-process LRU+TTL cache of single-lead predictions (0 disables)
+    PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 10000))
+    PREDICTION_CACHE_TTL_SECONDS = float(os.environ.get('PREDICTION_CACHE_TTL_SECONDS', 300))
+
+    # SHAP explanations: top contributors returned, cache size and default latency budget
+    EXPLANATION_TOP_K = int(os.environ.get('EXPLANATION_TOP_K', 3))
+    EXPLANATION_CACHE_SIZE = int(os.environ.get('EXPLANATION_CACHE_SIZE', 10000))
+    EXPLANATION_BUDGET_MS = float(os.environ['EXPLANATION_BUDGET_MS']) if os.environ.get('EXPLANATION_BUDGET_MS') else None
+
+    # Append-only feedback store (SQLite in WAL mode) and its bounded write queue
+    FEEDBACK_DB_PATH = os.environ.get('FEEDBACK_DB_PATH', 'data/feedback.db')
+    FEEDBACK_QUEUE_SIZE = int(os.environ.get('FEEDBACK_QUEUE_SIZE', 10000))
+
+    # Feature and score drift of the current and previous window against the bundle's training snapshot
+    DRIFT_ENABLED = os.environ.get('DRIFT_ENABLED', 'true').lower() == 'true'
+    DRIFT_WINDOW_SECONDS = float(os.environ.get('DRIFT_WINDOW_SECONDS', 3600))
+    DRIFT_MIN_LEADS = int(os.environ.get('DRIFT_MIN_LEADS', 100))
+    DRIFT_DIR = os.environ.get('DRIFT_DIR', 'data/drift')
+    DRIFT_FLUSH_SECONDS = float(os.environ.get('DRIFT_FLUSH_SECONDS', 5))
+
+    # Append-only log of every prediction, with a ring buffer of the newest per worker
+    PREDICTION_LOG_PATH = os.environ.get('PREDICTION_LOG_PATH', 'data/predictions.db')
+    PREDICTION_LOG_RING_SIZE = int(os.environ.get('PREDICTION_LOG_RING_SIZE', 1000))
+    PREDICTION_LOG_QUEUE_SIZE = int(os.environ.get('PREDICTION_LOG_QUEUE_SIZE', 10000))
+
+    # Shadow-score a sampled fraction of leads with the bundle's challengers (0 disables); challenger
+    # scoring may use at most SHADOW_MAX_OVERHEAD seconds per second of champion scoring
+    SHADOW_SAMPLE_RATE = float(os.environ.get('SHADOW_SAMPLE_RATE', 0))
+    SHADOW_WORKERS = int(os.environ.get('SHADOW_WORKERS', 1))
+    SHADOW_QUEUE_SIZE = int(os.environ.get('SHADOW_QUEUE_SIZE', 1000))
+    SHADOW_MAX_OVERHEAD = float(os.environ.get('SHADOW_MAX_OVERHEAD', 0.25))
+
+    # Dashboard counters per minute, hour and day and per segment; snapshots carry them across restarts
+    DASHBOARD_STATS_DIR = os.environ.get('DASHBOARD_STATS_DIR', 'data/dashboard')
+    DASHBOARD_SNAPSHOT_SECONDS = float(os.environ.get('DASHBOARD_SNAPSHOT_SECONDS', 30))
+
+    # Coalesce concurrent /api/predict calls into micro-batches (opt-in)
+    PREDICT_MICROBATCH_ENABLED = os.environ.get('PREDICT_MICROBATCH_ENABLED', 'false').lower() == 'true'
+    PREDICT_MICROBATCH_MAX_SIZE = int(os.environ.get('PREDICT_MICROBATCH_MAX_SIZE', 64))
+    PREDICT_MICROBATCH_WAIT_MS = float(os.environ.get('PREDICT_MICROBATCH_WAIT_MS', 2.0))
+    PREDICT_MICROBATCH_TIMEOUT_MS = float(os.environ.get('PREDICT_MICROBATCH_TIMEOUT_MS', 50.0))
+
+    # Rows /api/batch_predict validates, scores and streams back per chunk
+    BATCH_PREDICT_CHUNK_ROWS = int(os.environ.get('BATCH_PREDICT_CHUNK_ROWS', 10000))
+
+    # Shared ElevenLabs client: pooled connections, timeouts, retries and a concurrency cap
+    ELEVENLABS_BASE_URL = os.environ.get('ELEVENLABS_BASE_URL', 'https://api.elevenlabs.io')
+    VOICE_CACHE_DIR = os.environ.get('VOICE_CACHE_DIR', 'voice_cache')
+    VOICE_CACHE_MAX_BYTES = int(os.environ.get('VOICE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    # Render every templated prediction phrase in the background on boot
+    VOICE_PREWARM_ON_BOOT = os.environ.get('VOICE_PREWARM_ON_BOOT', 'false').lower() == 'true'
+    VOICE_CONNECT_TIMEOUT_SECONDS = float(os.environ.get('VOICE_CONNECT_TIMEOUT_SECONDS', 3.05))
+    VOICE_READ_TIMEOUT_SECONDS = float(os.environ.get('VOICE_READ_TIMEOUT_SECONDS', 30))
+    VOICE_MAX_RETRIES = int(os.environ.get('VOICE_MAX_RETRIES', 3))
+    VOICE_MAX_CONCURRENCY = int(os.environ.get('VOICE_MAX_CONCURRENCY', 8))
+    VOICE_WORKERS = int(os.environ.get('VOICE_WORKERS', 4))
+    # How long /api/voice/prediction waits before answering 202 with a URL to poll
+    VOICE_RESPONSE_WAIT_SECONDS = float(os.environ.get('VOICE_RESPONSE_WAIT_SECONDS', 2))
+
+    # Background transcription of voice feedback; job status is shared through SQLite
+    TRANSCRIPTION_DB_PATH = os.environ.get('TRANSCRIPTION_DB_PATH', 'data/transcriptions.db')
+    TRANSCRIPTION_WORKERS = int(os.environ.get('TRANSCRIPTION_WORKERS', 2))
+    TRANSCRIPTION_MAX_PENDING = int(os.environ.get('TRANSCRIPTION_MAX_PENDING', 32))
+    VOICE_FEEDBACK_MAX_SECONDS = float(os.environ.get('VOICE_FEEDBACK_MAX_SECONDS', 30))
+    VOICE_FEEDBACK_MAX_BYTES = int(os.environ.get('VOICE_FEEDBACK_MAX_BYTES', 16 * 1024 * 1024))
+
+    # JSON-lines logging through a background queue listener
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_FILE = os.environ.get('LOG_FILE', 'logs/lead_scoring.log')
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    # Successful requests are sampled; errors and slow requests are always logged
+    LOG_REQUEST_LEVEL = os.environ.get('LOG_REQUEST_LEVEL', 'INFO')
+    LOG_REQUEST_SAMPLE_RATE = float(os.environ.get('LOG_REQUEST_SAMPLE_RATE', 1.0))
+    LOG_SLOW_REQUEST_MS = float(os.environ.get('LOG_SLOW_REQUEST_MS', 1000))
+    LOG_REQUEST_BODIES = os.environ.get('LOG_REQUEST_BODIES', 'false').lower() == 'true'
+    LOG_BODY_MAX_BYTES = int(os.environ.get('LOG_BODY_MAX_BYTES', 1024))
+
+    # Prometheus metrics at /metrics; workers share totals through METRICS_DIR
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_DIR = os.environ.get('METRICS_DIR', 'data/metrics')
+    METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 5))
+    # cProfile a sample of requests and keep the profiles of slow ones
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    PROFILE_SLOW_REQUEST_MS = float(os.environ.get('PROFILE_SLOW_REQUEST_MS', 1000))
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', 'logs/profiles')
+    # Add other configuration variables as needed
@@ -1,67 +1,150 @@
+import argparse
+import collections
+import contextlib
+import itertools
+import json
+import os
+import shutil
 import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from faker import Faker
 from datetime import datetime, timedelta
+from typing import Optional
 
-fake = Faker()
+INDUSTRIES = ['logistics', 'manufacturing', 'retail', 'technology', 'finance']
+LEAD_SOURCES = ['web', 'referral', 'trade_show', 'cold_call', 'email']
+COMPANY_POOL_SIZE = 10000
 
-def generate_synthetic_leads(num_records=1000):
-    """Generate synthetic lead data for testing"""
-    
-    # Set random seed for reproducibility
-    np.random.seed(42)
-    
-    # Generate company data
-    industries = ['logistics', 'manufacturing', 'retail', 'technology', 'finance']
-    lead_sources = ['web', 'referral', 'trade_show', 'cold_call', 'email']
-    
-    data = []
-    for _ in range(num_records):
-        # Generate company details
-        company_name = fake.company()
-        industry = np.random.choice(industries)
-        company_size = np.random.randint(10, 10000)
-        annual_revenue = np.random.randint(100000, 1000000000)
-        num_employees = int(company_size * np.random.uniform(0.7, 1.3))
-        lead_source = np.random.choice(lead_sources)
-        past_interactions = np.random.poisson(2)
-        
-        # Generate conversion outcome with industry bias
-        if industry == 'logistics':
-            base_prob = 0.4
-        elif industry == 'technology':
-            base_prob = 0.6
-        else:
-            base_prob = 0.3
-            
-        # Adjust probability based on other factors
-        prob = base_prob
-        prob += 0.1 if lead_source == 'referral' else 0
-        prob += 0.05 * past_interactions
-        prob += 0.0000001 * annual_revenue  # Small effect from revenue
-        
-        # Add some noise
-        prob = np.clip(prob + np.random.normal(0, 0.1), 0, 1)
-        
-        converted = np.random.binomial(1, prob)
-        
-        data.append({
-            'company_name': company_name,
-            'industry': industry,
-            'company_size': company_size,
-            'annual_revenue': annual_revenue,
-            'num_employees': num_employees,
-            'lead_source': lead_source,
-            'past_interactions': past_interactions,
-            'converted': converted,
-            'created_at': fake.date_time_between(start_date='-1y', end_date='now')
-        })
-    
-    df = pd.DataFrame(data)
+_company_pools = {}
+
+def company_pool(seed: int = 42, size: int = COMPANY_POOL_SIZE) -> np.ndarray:
+    """Company names drawn once per process and seed, then sampled by index"""
+    if (seed, size) not in _company_pools:
+        fake = Faker()
+        fake.seed_instance(seed)
+        _company_pools[(seed, size)] = np.array([fake.company() for _ in range(size)], dtype=object)
+    return _company_pools[(seed, size)]
+
+def _generate_columns(num_records: int, rng: np.random.Generator, end_date: datetime) -> dict:
+    """Draw every column at once; codes index INDUSTRIES, LEAD_SOURCES and the company pool"""
+    industry = rng.integers(0, len(INDUSTRIES), num_records, dtype=np.int8)
+    company_size = rng.integers(10, 10000, num_records)
+    annual_revenue = rng.integers(100000, 1000000000, num_records)
+    num_employees = (company_size * rng.uniform(0.7, 1.3, num_records)).astype(np.int64)
+    lead_source = rng.integers(0, len(LEAD_SOURCES), num_records, dtype=np.int8)
+    past_interactions = rng.poisson(2, num_records)
+
+    # Conversion outcome with industry bias
+    base_prob = np.select([industry == INDUSTRIES.index('logistics'), industry == INDUSTRIES.index('technology')],
+                          [0.4, 0.6], default=0.3)
+
+    # Adjust probability based on other factors
+    prob = base_prob
+    prob = prob + np.where(lead_source == LEAD_SOURCES.index('referral'), 0.1, 0)
+    prob = prob + 0.05 * past_interactions
+    prob = prob + 0.0000001 * annual_revenue  # Small effect from revenue
+
+    # Add some noise
+    prob = np.clip(prob + rng.normal(0, 0.1, num_records), 0, 1)
+    converted = rng.binomial(1, prob)
+
+    year_us = int(timedelta(days=365).total_seconds() * 1e6)
+    created_at = (np.datetime64(end_date, 'us') - rng.integers(0, year_us, num_records).astype('timedelta64[us]'))
+
+    return {
+        'company_name': rng.integers(0, COMPANY_POOL_SIZE, num_records, dtype=np.int32),
+        'industry': industry,
+        'company_size': company_size,
+        'annual_revenue': annual_revenue,
+        'num_employees': num_employees,
+        'lead_source': lead_source,
+        'past_interactions': past_interactions,
+        'converted': converted,
+        'created_at': created_at
+    }
+
+def _to_frame(columns: dict, seed: int) -> pd.DataFrame:
+    df = pd.DataFrame(columns)
+    df['company_name'] = company_pool(seed)[columns['company_name']]
+    df['industry'] = np.asarray(INDUSTRIES, dtype=object)[columns['industry']]
+    df['lead_source'] = np.asarray(LEAD_SOURCES, dtype=object)[columns['lead_source']]
     return df
 
+def generate_shard(shard_index: int, num_records: int, seed: int = 42,
+                   end_date: Optional[datetime] = None) -> pd.DataFrame:
+    """Generate one shard; its rows depend only on the seed and the shard index"""
+    rng = np.random.default_rng([seed, shard_index])
+    return _to_frame(_generate_columns(num_records, rng, end_date or datetime.now()), seed)
+
+def generate_synthetic_leads(num_records=1000, seed=42, end_date: Optional[datetime] = None):
+    """Generate synthetic lead data for testing"""
+    return generate_shard(0, num_records, seed, end_date)
+
+def _write_shard(output: str, file_format: str, shard_index: int, num_records: int, seed: int,
+                 end_date: datetime) -> str:
+    """Generate a shard in a pool worker and write it next to the output"""
+    rng = np.random.default_rng([seed, shard_index])
+    columns = _generate_columns(num_records, rng, end_date)
+    if file_format == 'npy':
+        shard_dir = os.path.join(output, f"shard-{shard_index:05d}")
+        os.makedirs(shard_dir, exist_ok=True)
+        for name, values in columns.items():
+            np.save(os.path.join(shard_dir, f"{name}.npy"), values)
+        return shard_dir
+
+    part_path = f"{output}.part-{shard_index:05d}"
+    _to_frame(columns, seed).to_csv(part_path, index=False, header=shard_index == 0)
+    return part_path
+
+def write_synthetic_leads(output: str, num_records: int, file_format: str = 'csv', shard_size: int = 1000000,
+                          seed: int = 42, workers: Optional[int] = None, end_date: Optional[datetime] = None) -> int:
+    """Generate ``num_records`` leads in parallel shards and stream them to disk.
+
+    At most ``workers`` shards are in flight; the next one is submitted once
+    the oldest has finished and been merged. ``csv`` writes one file,
+    appending each shard's part file in order and deleting it, so no more
+    than ``workers`` part files exist at once. ``npy`` writes a directory
+    with one subdirectory of column arrays per shard; company names,
+    industries and lead sources are stored as codes into the vocabularies in
+    ``manifest.json``. Output is identical for the same seed, shard size and
+    end date, whatever the number of workers.
+    """
+    end_date = end_date or datetime.now()
+    shard_sizes = [min(shard_size, num_records - start) for start in range(0, num_records, shard_size)]
+    if file_format == 'npy':
+        os.makedirs(output, exist_ok=True)
+        with open(os.path.join(output, 'manifest.json'), 'w') as f:
+            json.dump({'num_records': num_records, 'shards': len(shard_sizes), 'seed': seed,
+                       'vocabularies': {'company_name': company_pool(seed).tolist(),
+                                        'industry': INDUSTRIES, 'lead_source': LEAD_SOURCES}}, f)
+
+    workers = workers or os.cpu_count() or 1
+    shards = iter(enumerate(shard_sizes))
+    with ProcessPoolExecutor(max_workers=workers) as pool, \
+            (open(output, 'wb') if file_format == 'csv' else contextlib.nullcontext()) as out:
+        in_flight = collections.deque(pool.submit(_write_shard, output, file_format, i, size, seed, end_date)
+                                      for i, size in itertools.islice(shards, workers))
+        while in_flight:
+            part_path = in_flight.popleft().result()
+            if out is not None:
+                with open(part_path, 'rb') as part:
+                    shutil.copyfileobj(part, out, 16 * 1024 * 1024)
+                os.remove(part_path)
+            for i, size in itertools.islice(shards, 1):
+                in_flight.append(pool.submit(_write_shard, output, file_format, i, size, seed, end_date))
+    return num_records
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate synthetic lead data')
+    parser.add_argument('--records', type=int, default=5000, help='Number of leads to generate')
+    parser.add_argument('--output', default='data/leads.csv', help='Output CSV file or npy directory')
+    parser.add_argument('--format', choices=['csv', 'npy'], default='csv')
+    parser.add_argument('--shard-size', type=int, default=1000000, help='Leads generated per shard')
+    parser.add_argument('--workers', type=int, help='Shards generated in parallel (default: one per CPU)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
     # Generate and save synthetic data
-    leads_df = generate_synthetic_leads(5000)
-    leads_df.to_csv('data/leads.csv', index=False)
-    print("Generated synthetic lead data with shape:", leads_df.shape)
\ No newline at end of file
+    write_synthetic_leads(args.output, args.records, args.format, args.shard_size, args.seed, args.workers)
+    print(f"Generated {args.records} synthetic leads in {args.output}")
@@ -0,0 +1,53 @@
+"""Multi-worker serving: load the model once in the master, fork workers that share it.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+With ``preload_app`` the master runs ``create_app()`` once: it imports
+pandas/sklearn, loads the bundle and warms it up, then forks the workers,
+which share those pages copy-on-write instead of each importing and loading
+their own. ``gc.freeze()`` before every fork keeps the collector from
+touching (and so copying) the preloaded objects. The bundle's compact model
+arrays are memory-mapped (``MODEL_MMAP``), so they stay shared page-cache
+pages even when a worker reloads a new version.
+
+Each worker gets ``cpu_count // workers`` native threads (at least one) for
+OpenMP and BLAS, set through ``OMP_NUM_THREADS`` and friends before any
+library is imported, and as ``MODEL_THREADS`` for models with ``n_jobs``.
+GNU OpenMP is not fork-safe once its thread pool has started, so the master
+must not run multi-threaded XGBoost before forking: keep ``COMPACT_MODEL``
+on (the warm-up then never calls XGBoost) or run one native thread per
+worker.
+
+Gunicorn resets SIGUSR2 in workers and uses it in the master for binary
+upgrades, so the reload signal handler is reinstalled in each worker; send
+``MODEL_RELOAD_SIGNAL`` to worker pids only. ``python -m benchmarks.run
+--only serving`` measures per-worker memory and throughput for 1..N workers.
+
+Environment: GUNICORN_BIND, GUNICORN_WORKERS, GUNICORN_THREADS,
+GUNICORN_PRELOAD, GUNICORN_TIMEOUT.
+"""
+import gc
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', os.cpu_count() or 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+
+# Native thread pools sized per worker; libraries read these when they are first imported
+native_threads = max(1, (os.cpu_count() or 1) // workers)
+for variable in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+    os.environ.setdefault(variable, str(native_threads))
+os.environ.setdefault('MODEL_THREADS', str(native_threads))
+
+def pre_fork(server, worker):
+    # Move the preloaded objects out of the collector's reach so workers do not copy their pages
+    gc.freeze()
+
+def post_worker_init(worker):
+    from app.api.routes import model_reloader
+
+    model_reloader.install_signal_handler()
+    worker.log.info(f"Worker {worker.pid} ready")
@@ -0,0 +1,27 @@
+import json
+import subprocess
+import time
+from app.core.aggregates import DashboardAggregates, N_COUNTERS, PREDICTIONS, RESOLUTIONS, SCORE_SUM
+
+def _dead_pid() -> int:
+    process = subprocess.Popen(['true'])
+    process.wait()
+    return process.pid
+
+def test_snapshot_of_an_exited_process_is_adopted_and_counted_once(tmp_path):
+    counters = [0] * N_COUNTERS
+    counters[PREDICTIONS], counters[SCORE_SUM] = 5, 2.0
+    buckets = {name: {str(int(time.time() // width)): {'all': counters, 'industry=Retail': counters}}
+               for name, (width, _) in RESOLUTIONS.items()}
+    orphan = tmp_path / f"aggregates-{_dead_pid()}.json"
+    orphan.write_text(json.dumps({'written_at': time.time(), 'buckets': buckets}))
+
+    aggregates = DashboardAggregates(str(tmp_path))
+    for _ in range(2):
+        stats = aggregates.stats('hour')
+        assert stats['totals']['predictions'] == 5
+        assert stats['totals']['mean_score'] == 0.4
+        assert stats['segments']['industry']['Retail']['predictions'] == 5
+    assert aggregates.stats('day')['totals']['predictions'] == 5
+    assert not orphan.exists()
+    assert [path.name for path in tmp_path.iterdir()] == [f"aggregates-{aggregates._pid}.json"]
@@ -0,0 +1,63 @@
+from flask import Flask, jsonify
+from flask_jwt_extended import create_access_token, jwt_required
+from app.utils.auth import accepts_feedback_token, create_feedback_token, feedback_token_prediction_id, setup_auth
+
+def _app():
+    app = Flask(__name__)
+    setup_auth(app)
+    app.config['JWT_SECRET_KEY'] = 'test-secret-key-of-at-least-32-bytes'
+
+    @app.route('/feedback')
+    @accepts_feedback_token
+    @jwt_required()
+    def feedback():
+        return jsonify({'prediction_id': feedback_token_prediction_id()})
+
+    @app.route('/predictions')
+    @jwt_required()
+    def predictions():
+        return jsonify([])
+
+    return app
+
+def _headers(app, make_token):
+    with app.app_context():
+        return {'Authorization': f"Bearer {make_token()}"}
+
+def test_feedback_token_is_rejected_outside_feedback_views():
+    app = _app()
+    headers = _headers(app, lambda: create_feedback_token('p-1'))
+    client = app.test_client()
+
+    assert client.get('/predictions', headers=headers).status_code == 403
+    response = client.get('/feedback', headers=headers)
+    assert response.status_code == 200 and response.get_json() == {'prediction_id': 'p-1'}
+
+def test_user_token_is_accepted_everywhere():
+    app = _app()
+    headers = _headers(app, lambda: create_access_token(identity='analyst'))
+    client = app.test_client()
+
+    assert client.get('/predictions', headers=headers).status_code == 200
+    response = client.get('/feedback', headers=headers)
+    assert response.status_code == 200 and response.get_json() == {'prediction_id': None}
+
+def test_feedback_tokens_are_minted_only_for_users_and_logged_predictions(tmp_path, monkeypatch):
+    from app.api import routes
+    from app.core.prediction_log import PredictionLog
+
+    log = PredictionLog(str(tmp_path / 'predictions.db'))
+    results = [{'score': 0.8, 'needs_human_review': False, 'model_version': 'v1'}]
+    log.record([{'lead_id': 'lead-1'}], results, latency_ms=1.0)
+    monkeypatch.setattr(routes.lead_scorer, 'prediction_log', log)
+    app = _app()
+    app.register_blueprint(routes.api_blueprint, url_prefix='/api')
+    client = app.test_client()
+    known = f"/api/feedback/token?prediction_id={results[0]['prediction_id']}"
+
+    assert client.get(known).status_code == 401
+    headers = _headers(app, lambda: create_access_token(identity='analyst'))
+    assert client.get('/api/feedback/token?prediction_id=abc', headers=headers).status_code == 404
+    assert client.get(known, headers=headers).status_code == 200
+    feedback_headers = _headers(app, lambda: create_feedback_token(results[0]['prediction_id']))
+    assert client.get(known, headers=feedback_headers).status_code == 403
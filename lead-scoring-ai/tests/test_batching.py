@@ -0,0 +1,60 @@
+import threading
+import time
+from app.core.batching import MicroBatcher
+
+class SlowScorer:
+    """Records every lead it scores; batches take ``batch_seconds``"""
+
+    def __init__(self, batch_seconds: float):
+        self.batch_seconds = batch_seconds
+        self.scored = []
+        self.lock = threading.Lock()
+
+    def predict_leads(self, leads, source='single'):
+        time.sleep(self.batch_seconds)
+        with self.lock:
+            self.scored.extend(lead['lead_id'] for lead in leads)
+        return [{'score': 0.5, 'lead_id': lead['lead_id'], 'via': 'batch'} for lead in leads]
+
+    def predict_lead(self, lead):
+        with self.lock:
+            self.scored.append(lead['lead_id'])
+        return {'score': 0.5, 'lead_id': lead['lead_id'], 'via': 'direct'}
+
+def _batcher(scorer):
+    batcher = MicroBatcher(scorer, max_wait_ms=1.0, result_timeout_ms=20.0)
+    batcher.enabled = True
+    return batcher
+
+def _predict_concurrently(batcher, lead_ids):
+    results = {}
+
+    def call(lead_id):
+        results[lead_id] = batcher.predict_lead({'lead_id': lead_id})
+
+    threads = []
+    for lead_id in lead_ids:
+        threads.append(threading.Thread(target=call, args=(lead_id,)))
+        threads[-1].start()
+        time.sleep(0.005)
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_timed_out_lead_in_a_slow_batch_is_scored_once():
+    scorer = SlowScorer(batch_seconds=0.2)
+    results = _predict_concurrently(_batcher(scorer), ['a'])
+
+    assert results['a']['via'] == 'batch'
+    assert scorer.scored == ['a']
+
+def test_queued_leads_that_time_out_fall_back_and_are_skipped_by_the_batch():
+    scorer = SlowScorer(batch_seconds=0.2)
+    batcher = _batcher(scorer)
+    results = _predict_concurrently(batcher, ['a', 'b', 'c'])
+    time.sleep(0.5)  # Let the batch thread reach the abandoned leads
+
+    assert results['a']['via'] == 'batch'
+    assert {results['b']['via'], results['c']['via']} == {'direct'}
+    assert sorted(scorer.scored) == ['a', 'b', 'c']
+    assert batcher.stats()['fallbacks'] == 2
@@ -0,0 +1,64 @@
+import io
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from app.api.bulk import ArrowWriter, CsvWriter, NpzWriter, RowJsonWriter, read_arrow
+
+def _results(offset, n, errors=None):
+    errors = errors or {}
+    return [{'error': errors[i], 'needs_human_review': True} if i in errors else
+            {'prediction_id': f"p{offset + i}", 'score': 0.25, 'prediction': False,
+             'needs_human_review': False, 'confidence': 0.5} for i in range(n)]
+
+def test_npz_keeps_long_and_multibyte_errors_whole():
+    message = 'industry: Ünternehmen ' * 20
+    writer = NpzWriter('v1', 5)
+    body = writer.start() + writer.write(_results(0, 3, {1: message})) + \
+        writer.write(_results(3, 2, {0: 'short'})) + writer.finish()
+
+    archive = np.load(io.BytesIO(body), allow_pickle=False)
+    assert archive['results'].shape == (5,)
+    assert archive['results']['prediction_id'].tolist() == [b'p0', b'', b'p2', b'', b'p4']
+    assert archive['errors'].tolist() == [(1, message), (3, 'short')]
+
+def test_failure_after_the_first_chunk_is_marked_in_the_body():
+    writer = CsvWriter('v1')
+    body = (writer.start() + writer.write(_results(0, 2)) + writer.fail('Error tokenizing data')).decode()
+    frame = pd.read_csv(io.StringIO(body))
+    assert len(frame) == 3
+    assert frame['prediction_id'].isna().tolist() == [False, False, True]
+    assert frame['error'].iloc[-1] == 'Error tokenizing data'
+
+    writer = RowJsonWriter('v1')
+    body = json.loads(writer.start() + writer.write(_results(0, 2)) + writer.fail('Error tokenizing data'))
+    assert len(body['results']) == 2 and body['error'] == 'Error tokenizing data'
+
+def test_npz_failure_fills_the_declared_rows_and_records_the_error():
+    writer = NpzWriter('v1', 5)
+    body = writer.start() + writer.write(_results(0, 2)) + writer.fail('Error tokenizing data')
+
+    archive = np.load(io.BytesIO(body), allow_pickle=False)
+    results = archive['results']
+    assert results['prediction_id'].tolist() == [b'p0', b'p1', b'', b'', b'']
+    assert results['needs_human_review'].tolist() == [False, False, True, True, True]
+    assert np.isnan(results['score'][2:]).all()
+    assert archive['errors'].tolist() == [(2, 'Error tokenizing data (rows 2 to 4 not scored)')]
+
+def test_arrow_round_trip():
+    pa = pytest.importorskip('pyarrow')
+    leads = pd.DataFrame({'company_size': [10, 250, 4000], 'industry': ['Retail', 'Finance', None]})
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, pa.Schema.from_pandas(leads, preserve_index=False)) as stream:
+        stream.write_table(pa.Table.from_pandas(leads, preserve_index=False), max_chunksize=2)
+    frames = list(read_arrow(io.BytesIO(sink.getvalue())))
+    assert [len(frame) for frame in frames] == [2, 1]
+    pd.testing.assert_frame_equal(pd.concat(frames, ignore_index=True), leads)
+
+    writer = ArrowWriter('v1')
+    body = writer.start() + writer.write(_results(0, 3, {1: 'bad industry'})) + writer.fail('Error tokenizing data')
+    table = pa.ipc.open_stream(body).read_all()
+    assert table.schema.metadata[b'model_version'] == b'v1'
+    assert table.column('prediction_id').to_pylist() == ['p0', None, 'p2', None]
+    assert table.column('error').to_pylist() == [None, 'bad industry', None, 'Error tokenizing data']
+    assert table.column('needs_human_review').to_pylist() == [False, True, False, True]
@@ -0,0 +1,7 @@
+import numpy as np
+from app.core.explanation import ExplanationEngine
+
+def test_engine_shut_down_by_a_reload_explains_nothing_instead_of_raising():
+    engine = ExplanationEngine(None, None, model_loader=lambda: None)
+    engine.shutdown()
+    assert engine.explain(np.zeros((2, 3)), [('v1', 1), ('v1', 2)]) == [None, None]
@@ -0,0 +1,62 @@
+from app.core.feedback_store import FEATURE_COLUMNS, FeedbackStore
+from app.core.prediction import LeadScorer
+from app.core.prediction_log import PredictionLog
+
+LEAD = {
+    'lead_id': 'lead-1',
+    'company_name': 'Acme',
+    'company_size': 250,
+    'annual_revenue': 42000000.0,
+    'num_employees': 250,
+    'industry': 'Technology',
+    'lead_source': 'Website',
+    'past_interactions': 3
+}
+
+def _scorer(tmp_path):
+    return LeadScorer(feedback_store=FeedbackStore(str(tmp_path / 'feedback.db')),
+                      prediction_log=PredictionLog(str(tmp_path / 'predictions.db')))
+
+def _predict(scorer):
+    results = [{'score': 0.8, 'needs_human_review': False, 'model_version': 'v1', 'lead_id': LEAD['lead_id']}]
+    scorer.prediction_log.record([LEAD], results, latency_ms=1.0)
+    return results[0]['prediction_id']
+
+def test_ui_feedback_is_exported_with_the_predictions_features(tmp_path):
+    scorer = _scorer(tmp_path)
+    prediction_id = _predict(scorer)
+
+    # The shape feedback.html posts: no features, only the prediction it rates
+    scorer.process_feedback({'prediction_id': prediction_id, 'actual_outcome': True,
+                             'accuracy_rating': 4, 'feedback_notes': 'Signed', 'user_id': 'admin'})
+    assert scorer.feedback_store.flush()
+
+    frame = scorer.feedback_store.export_training_frame()
+    assert len(frame) == 1
+    assert frame.loc[0, FEATURE_COLUMNS].to_dict() == {column: LEAD[column] for column in FEATURE_COLUMNS}
+    assert frame.loc[0, 'converted'] == 1
+    stored = scorer.feedback_store.get_by_prediction(prediction_id)[0]
+    assert stored['lead_id'] == 'lead-1' and stored['prediction_score'] == 0.8
+
+def test_features_sent_with_the_feedback_take_precedence(tmp_path):
+    scorer = _scorer(tmp_path)
+    prediction_id = _predict(scorer)
+
+    scorer.process_feedback({'prediction_id': prediction_id, 'actual_outcome': 'false', 'past_interactions': 5})
+    assert scorer.feedback_store.flush()
+
+    frame = scorer.feedback_store.export_training_frame()
+    assert frame.loc[0, 'past_interactions'] == 5
+    assert frame.loc[0, 'industry'] == 'Technology'
+    assert frame.loc[0, 'converted'] == 0
+
+def test_resubmitted_feedback_is_exported_once_with_the_newest_label(tmp_path):
+    scorer = _scorer(tmp_path)
+    prediction_id = _predict(scorer)
+
+    for outcome in (True, True, False):
+        scorer.process_feedback({'prediction_id': prediction_id, 'actual_outcome': outcome})
+    assert scorer.feedback_store.flush()
+
+    frame = scorer.feedback_store.export_training_frame()
+    assert frame['converted'].tolist() == [0]
@@ -0,0 +1,31 @@
+import json
+import logging
+import pytest
+from flask import Flask
+from app.utils.logging import PACKAGE_LOGGER, REQUEST_LOGGER, LogPipeline
+
+@pytest.fixture
+def restore_loggers():
+    loggers = [logging.getLogger(name) for name in (PACKAGE_LOGGER, REQUEST_LOGGER)]
+    saved = [(logger.handlers, logger.level, logger.propagate) for logger in loggers]
+    yield
+    for logger, (handlers, level, propagate) in zip(loggers, saved):
+        logger.handlers, logger.propagate = handlers, propagate
+        logger.setLevel(level)
+
+def _read(log_file):
+    return [json.loads(line) for line in log_file.read_text().splitlines()]
+
+def test_module_loggers_reach_the_listener(tmp_path, restore_loggers):
+    app = Flask('lead_scoring_test')
+    app.config.update(LOG_FILE=str(tmp_path / 'app.log'), LOG_LEVEL='INFO')
+    pipeline = LogPipeline()
+    pipeline.init_app(app)
+
+    logging.getLogger('app.core.prediction').info("Scored %d leads", 3)
+    logging.getLogger('app.utils.voice').debug("Below LOG_LEVEL")
+    pipeline.stop()
+
+    entries = _read(tmp_path / 'app.log')
+    assert [(e['logger'], e['level'], e['message']) for e in entries] == \
+        [('app.core.prediction', 'INFO', 'Scored 3 leads')]
@@ -0,0 +1,22 @@
+import threading
+from app.core.metrics import MetricsRegistry
+
+def test_exited_threads_are_folded_into_the_process_totals():
+    registry = MetricsRegistry()
+    requests = registry.counter('requests_total', 'Requests')
+    latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+
+    def work():
+        requests.inc()
+        latency.observe(0.5)
+
+    for _ in range(200):
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+
+    totals = registry.snapshot()
+    assert totals[('requests_total', ())] == 200
+    assert totals[('latency_seconds', ())] == [0, 200, 0, 100.0]
+    assert len(registry._shards.shards()) == 1  # Only the retired totals
+    assert 'requests_total 200' in registry.render()
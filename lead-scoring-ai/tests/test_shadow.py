@@ -0,0 +1,16 @@
+import time
+from app.core.prediction_log import PredictionLog
+
+def test_scores_with_shadow_looks_up_more_ids_than_one_query_binds(tmp_path):
+    log = PredictionLog(str(tmp_path / 'predictions.db'))
+    leads = [{'lead_id': str(i), 'industry': 'retail'} for i in range(1200)]
+    results = [{'score': i / 1200, 'needs_human_review': False, 'model_version': 'v1'} for i in range(1200)]
+    log.record(leads, results, latency_ms=1.0)
+    prediction_ids = [result['prediction_id'] for result in results]
+    log.record_shadow([(prediction_id, 'random_forest', 'v1', 0.5, time.time()) for prediction_id in prediction_ids])
+    assert log.flush()
+
+    scores = log.scores_with_shadow(prediction_ids + ['unknown'])
+    assert len(scores) == 1200
+    assert scores[prediction_ids[-1]] == {'model_version': 'v1', 'champion': 1199 / 1200,
+                                          'challengers': {'random_forest': 0.5}}
@@ -0,0 +1,27 @@
+import threading
+import pytest
+from app.core.storage import BatchWriter, StoreOverloadedError
+
+def test_write_queue_is_bounded_by_rows_not_entries(tmp_path):
+    release = threading.Event()
+
+    def prepare(entry):
+        release.wait(5.0)
+        return entry
+
+    writer = BatchWriter(str(tmp_path / 'rows.db'), 'INSERT INTO t VALUES (?)', ['CREATE TABLE t (x INTEGER)'],
+                         max_queue=5, put_timeout=0.05, prepare=prepare)
+    assert writer.submit_many([(1,), (2,), (3,)])
+    assert writer.submit_many([(4,), (5,)])
+    assert writer.queue_depth == 5
+    assert not writer.submit_many([(6,)], block=False)
+    with pytest.raises(StoreOverloadedError):
+        writer.submit((7,))
+    assert writer.dropped == 2
+
+    release.set()
+    assert writer.flush()
+    assert writer.queue_depth == 0
+    assert writer.submit_many([(i,) for i in range(8)])  # Larger than the bound, but the queue is empty
+    assert writer.flush()
+    assert writer.written == 13
@@ -0,0 +1,74 @@
+import multiprocessing
+import os
+import time
+from app.utils.voice_cache import VoiceCache, _FileLock
+
+def _fetch_in_process(cache_dir, start, key):
+    """One worker asking for ``key``; the stub producer logs every call it gets"""
+    def produce():
+        with open(os.path.join(cache_dir, 'produced.log'), 'a') as f:
+            f.write(f"{os.getpid()}\n")
+        time.sleep(0.2)
+        return b'RIFF' + key.encode()
+
+    start.wait(10)
+    path = VoiceCache(cache_dir).get_or_create(key, produce)
+    with open(path, 'rb') as f:
+        assert f.read() == b'RIFF' + key.encode()
+
+def test_pending_keys_are_visible_to_every_worker(tmp_path):
+    producer = VoiceCache(str(tmp_path), lock_timeout=60.0)
+    poller = VoiceCache(str(tmp_path), lock_timeout=60.0)
+
+    producer.mark_pending('a' * 32)
+    assert poller.is_pending('a' * 32)
+    assert not poller.is_pending('b' * 32)
+
+    producer.put('a' * 32, b'RIFF')
+    producer.clear_pending('a' * 32)
+    assert not poller.is_pending('a' * 32)
+    assert poller.get('a' * 32) is not None
+
+def test_pending_marks_of_dead_producers_expire(tmp_path):
+    cache = VoiceCache(str(tmp_path), lock_timeout=0.05)
+    cache.mark_pending('a' * 32)
+    time.sleep(0.1)
+    assert not cache.is_pending('a' * 32)
+
+def test_a_missing_key_is_produced_once_across_processes(tmp_path):
+    context = multiprocessing.get_context('spawn')
+    start = context.Event()
+    workers = [context.Process(target=_fetch_in_process, args=(str(tmp_path), start, 'a' * 32)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    start.set()
+    for worker in workers:
+        worker.join(60)
+    assert [worker.exitcode for worker in workers] == [0] * 4
+    assert len((tmp_path / 'produced.log').read_text().splitlines()) == 1
+
+def test_file_lock_waits_for_the_holder_then_gives_up_after_its_timeout(tmp_path):
+    path = tmp_path / 'key.lock'
+    with _FileLock(path, 5.0):
+        started = time.monotonic()
+        with _FileLock(path, 0.1):
+            waited = time.monotonic() - started
+    assert waited >= 0.1
+    started = time.monotonic()
+    with _FileLock(path, 5.0):
+        assert time.monotonic() - started < 0.1
+
+def test_eviction_drops_the_least_recently_used_unpinned_files(tmp_path):
+    cache = VoiceCache(str(tmp_path), max_bytes=12, touch_interval=0.0)
+    for key, pinned in (('a', True), ('b', False), ('c', False)):
+        cache.put(key * 32, b'RIFF', pinned)
+        time.sleep(0.01)
+    cache.get('b' * 32)  # Now c is the least recently used
+    time.sleep(0.01)
+
+    cache.put('d' * 32, b'RIFF')
+    assert [cache.path(key * 32).exists() for key in 'abcd'] == [True, True, False, True]
+
+    cache.put('e' * 32, b'RIFFRIFF', pinned=True)
+    assert [cache.path(key * 32).exists() for key in 'abcde'] == [True, False, False, False, True]
+    assert cache.stats()['bytes'] == 12 and cache.evictions == 3